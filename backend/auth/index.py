@@ -1,204 +1,157 @@
 '''
-Business: User authentication - registration, login, session management
+Business: User authentication - registration, login, logout, session management
 Args: event - dict with httpMethod, body (email, password, name)
       context - object with attributes: request_id, function_name
 Returns: HTTP response with auth token or user data
 '''
 
-import json
-import os
-import hashlib
-import secrets
 from typing import Dict, Any
-from datetime import datetime, timedelta
-import psycopg2
-from psycopg2.extras import RealDictCursor
+from datetime import datetime
 
-def get_db_connection():
-    database_url = os.environ.get('DATABASE_URL')
-    return psycopg2.connect(database_url, cursor_factory=RealDictCursor)
+from passwords import hash_password, needs_rehash, verify_dummy, verify_password
+from runtime import HttpError, Request, Router
+from sessions import (
+    SESSION_LIFETIME, create_session_token, enforce_session_cap, revoke, session_cache, session_key,
+    verify_signed_token
+)
+from throttle import AttemptBudget, client_ip, email_budget, ip_budget
 
-def hash_password(password: str, salt: str = None) -> tuple:
-    if not salt:
-        salt = secrets.token_hex(16)
-    pwd_hash = hashlib.pbkdf2_hmac('sha256', password.encode(), salt.encode(), 100000)
-    return pwd_hash.hex(), salt
+router = Router('Content-Type, X-Auth-Token', default_method='POST')
 
-def create_session_token() -> str:
-    return secrets.token_urlsafe(32)
+def too_many_attempts(budget: AttemptBudget, key: str) -> HttpError:
+    return HttpError(429, 'Too many attempts, try again later', {'Retry-After': str(budget.retry_after(key))})
 
-def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
-    method: str = event.get('httpMethod', 'POST')
-    
-    if method == 'OPTIONS':
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type, X-Auth-Token',
-                'Access-Control-Max-Age': '86400'
-            },
-            'body': '',
-            'isBase64Encoded': False
-        }
-    
-    if method == 'POST':
-        body_data = json.loads(event.get('body', '{}'))
-        action = body_data.get('action')
+@router.action('register')
+def register(request: Request) -> Dict[str, Any]:
+    ip = client_ip(request.event) or 'unknown'
+    if not ip_budget.consume(ip):
+        raise too_many_attempts(ip_budget, ip)
+    
+    email = request.body.get('email')
+    password = request.body.get('password')
+    name = request.body.get('name')
+    cursor = request.cursor
+    
+    cursor.execute("SELECT id FROM users WHERE email = %s", (email,))
+    if cursor.fetchone():
+        raise HttpError(400, 'Email already registered')
+    
+    pwd_hash, salt, hash_version = hash_password(password)
+    
+    cursor.execute(
+        "INSERT INTO users (name, email, birth_date, birth_time, birth_city, zodiac_sign) "
+        "VALUES (%s, %s, %s, %s, %s, %s) RETURNING id",
+        (name, email, '2000-01-01', '12:00:00', 'Unknown', 'Неизвестно')
+    )
+    user_id = cursor.fetchone()['id']
+    
+    cursor.execute(
+        "INSERT INTO user_credentials (user_id, password_hash, salt, hash_version) "
+        "VALUES (%s, %s, %s, %s)",
+        (user_id, pwd_hash, salt, hash_version)
+    )
+    
+    expires_at = datetime.now() + SESSION_LIFETIME
+    session_token = create_session_token(user_id, name, email, expires_at)
+    
+    cursor.execute(
+        "INSERT INTO user_sessions (user_id, session_token, expires_at) VALUES (%s, %s, %s)",
+        (user_id, session_key(session_token), expires_at)
+    )
+    
+    request.conn.commit()
+    
+    return {'user_id': user_id, 'name': name, 'email': email, 'session_token': session_token}
+
+@router.action('login')
+def login(request: Request) -> Dict[str, Any]:
+    ip = client_ip(request.event) or 'unknown'
+    if not ip_budget.consume(ip):
+        raise too_many_attempts(ip_budget, ip)
+    
+    email = request.body.get('email')
+    password = request.body.get('password')
+    email_key = (email or '').strip().lower()
+    if not email_budget.allows(email_key):
+        raise too_many_attempts(email_budget, email_key)
+    
+    cursor = request.cursor
+    cursor.execute(
+        "SELECT u.id, u.name, u.email, uc.password_hash, uc.salt, uc.hash_version "
+        "FROM users u JOIN user_credentials uc ON u.id = uc.user_id WHERE u.email = %s",
+        (email,)
+    )
+    user = cursor.fetchone()
+    
+    # Unknown emails still pay for one hash so response time does not reveal them
+    if user:
+        valid = verify_password(password, user['password_hash'], user['salt'], user['hash_version'])
+    else:
+        valid = verify_dummy(password)
+    
+    if not valid:
+        email_budget.consume(email_key)
+        raise HttpError(401, 'Invalid email or password')
+    
+    if needs_rehash(user['hash_version']):
+        pwd_hash, salt, hash_version = hash_password(password)
+        cursor.execute(
+            "UPDATE user_credentials SET password_hash = %s, salt = %s, hash_version = %s "
+            "WHERE user_id = %s",
+            (pwd_hash, salt, hash_version, user['id'])
+        )
+    
+    expires_at = datetime.now() + SESSION_LIFETIME
+    session_token = create_session_token(user['id'], user['name'], user['email'], expires_at)
+    
+    cursor.execute(
+        "INSERT INTO user_sessions (user_id, session_token, expires_at) VALUES (%s, %s, %s)",
+        (user['id'], session_key(session_token), expires_at)
+    )
+    enforce_session_cap(cursor, user['id'])
+    
+    request.conn.commit()
+    
+    return {'user_id': user['id'], 'name': user['name'], 'email': user['email'], 'session_token': session_token}
+
+@router.action('verify_token')
+def verify_token(request: Request) -> Dict[str, Any]:
+    session_token = request.body.get('session_token') or ''
+    
+    # Served from memory when possible; no database connection is opened then
+    session = verify_signed_token(session_token) or session_cache.get(session_token)
+    if not session:
+        cursor = request.cursor
+        cursor.execute(
+            "SELECT u.id, u.name, u.email, us.expires_at "
+            "FROM users u JOIN user_sessions us ON u.id = us.user_id "
+            "WHERE us.session_token = %s",
+            (session_token,)
+        )
+        session = cursor.fetchone()
         
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        if not session:
+            raise HttpError(401, 'Invalid session token')
         
-        try:
-            if action == 'register':
-                email = body_data.get('email')
-                password = body_data.get('password')
-                name = body_data.get('name')
-                
-                cursor.execute("SELECT id FROM users WHERE email = %s", (email,))
-                existing_user = cursor.fetchone()
-                
-                if existing_user:
-                    return {
-                        'statusCode': 400,
-                        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                        'isBase64Encoded': False,
-                        'body': json.dumps({'error': 'Email already registered'})
-                    }
-                
-                pwd_hash, salt = hash_password(password)
-                
-                cursor.execute(
-                    "INSERT INTO users (name, email, birth_date, birth_time, birth_city, zodiac_sign) "
-                    "VALUES (%s, %s, %s, %s, %s, %s) RETURNING id",
-                    (name, email, '2000-01-01', '12:00:00', 'Unknown', 'Неизвестно')
-                )
-                user_id = cursor.fetchone()['id']
-                
-                cursor.execute(
-                    "INSERT INTO user_credentials (user_id, password_hash, salt) VALUES (%s, %s, %s)",
-                    (user_id, pwd_hash, salt)
-                )
-                
-                session_token = create_session_token()
-                expires_at = datetime.now() + timedelta(days=30)
-                
-                cursor.execute(
-                    "INSERT INTO user_sessions (user_id, session_token, expires_at) VALUES (%s, %s, %s)",
-                    (user_id, session_token, expires_at)
-                )
-                
-                conn.commit()
-                
-                return {
-                    'statusCode': 200,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'isBase64Encoded': False,
-                    'body': json.dumps({
-                        'user_id': user_id,
-                        'name': name,
-                        'email': email,
-                        'session_token': session_token
-                    })
-                }
-            
-            elif action == 'login':
-                email = body_data.get('email')
-                password = body_data.get('password')
-                
-                cursor.execute(
-                    "SELECT u.id, u.name, u.email, uc.password_hash, uc.salt "
-                    "FROM users u JOIN user_credentials uc ON u.id = uc.user_id WHERE u.email = %s",
-                    (email,)
-                )
-                user = cursor.fetchone()
-                
-                if not user:
-                    return {
-                        'statusCode': 401,
-                        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                        'isBase64Encoded': False,
-                        'body': json.dumps({'error': 'Invalid email or password'})
-                    }
-                
-                pwd_hash, _ = hash_password(password, user['salt'])
-                
-                if pwd_hash != user['password_hash']:
-                    return {
-                        'statusCode': 401,
-                        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                        'isBase64Encoded': False,
-                        'body': json.dumps({'error': 'Invalid email or password'})
-                    }
-                
-                session_token = create_session_token()
-                expires_at = datetime.now() + timedelta(days=30)
-                
-                cursor.execute(
-                    "INSERT INTO user_sessions (user_id, session_token, expires_at) VALUES (%s, %s, %s)",
-                    (user['id'], session_token, expires_at)
-                )
-                
-                conn.commit()
-                
-                return {
-                    'statusCode': 200,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'isBase64Encoded': False,
-                    'body': json.dumps({
-                        'user_id': user['id'],
-                        'name': user['name'],
-                        'email': user['email'],
-                        'session_token': session_token
-                    })
-                }
-            
-            elif action == 'verify_token':
-                session_token = body_data.get('session_token')
-                
-                cursor.execute(
-                    "SELECT u.id, u.name, u.email, us.expires_at "
-                    "FROM users u JOIN user_sessions us ON u.id = us.user_id "
-                    "WHERE us.session_token = %s",
-                    (session_token,)
-                )
-                session = cursor.fetchone()
-                
-                if not session:
-                    return {
-                        'statusCode': 401,
-                        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                        'isBase64Encoded': False,
-                        'body': json.dumps({'error': 'Invalid session token'})
-                    }
-                
-                if datetime.now() > session['expires_at']:
-                    return {
-                        'statusCode': 401,
-                        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                        'isBase64Encoded': False,
-                        'body': json.dumps({'error': 'Session expired'})
-                    }
-                
-                return {
-                    'statusCode': 200,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'isBase64Encoded': False,
-                    'body': json.dumps({
-                        'user_id': session['id'],
-                        'name': session['name'],
-                        'email': session['email']
-                    })
-                }
+        if datetime.now() > session['expires_at']:
+            raise HttpError(401, 'Session expired')
         
-        finally:
-            cursor.close()
-            conn.close()
-    
-    return {
-        'statusCode': 405,
-        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-        'isBase64Encoded': False,
-        'body': json.dumps({'error': 'Method not allowed'})
-    }
\ No newline at end of file
+        session_cache.put(session_token, session)
+    
+    return {'user_id': session['id'], 'name': session['name'], 'email': session['email']}
+
+@router.action('logout')
+def logout(request: Request) -> Dict[str, Any]:
+    session_token = request.body.get('session_token') or ''
+    
+    request.cursor.execute(
+        "DELETE FROM user_sessions WHERE session_token = %s",
+        (session_key(session_token),)
+    )
+    request.conn.commit()
+    revoke(session_token)
+    
+    return {'status': 'logged_out'}
+
+def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    return router.handle(event, context)
@@ -0,0 +1,131 @@
+'''
+Password hashing: versioned KDF parameters and a bounded worker pool.
+hashlib releases the GIL while deriving keys, so a thread pool runs hashes
+in parallel across cores. At most HASH_WORKERS + HASH_QUEUE_LIMIT hashes
+are in flight per instance; beyond that HashingBusy is raised immediately
+instead of queueing work a login burst would make time out anyway;
+the router turns it into a 503 response.
+'''
+
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from typing import Dict, Tuple
+
+from runtime import HttpError
+
+# Never change an existing entry: stored hashes reference these by version
+HASH_PARAMS = {
+    1: {'algorithm': 'pbkdf2_sha256', 'iterations': 100000},
+    2: {'algorithm': 'scrypt', 'n': 2 ** 14, 'r': 8, 'p': 1},
+}
+CURRENT_VERSION = int(os.environ.get('PASSWORD_HASH_VERSION', '2'))
+
+HASH_WORKERS = int(os.environ.get('HASH_WORKERS', str(os.cpu_count() or 1)))
+HASH_QUEUE_LIMIT = int(os.environ.get('HASH_QUEUE_LIMIT', str(HASH_WORKERS * 4)))
+HASH_TIMEOUT = float(os.environ.get('HASH_TIMEOUT', '5'))
+
+# Compared against when the email is unknown so that path costs the same as a real check
+DUMMY_SALT = secrets.token_hex(16)
+# Weight of the newest derivation in the per-version cost average
+COST_SMOOTHING = 0.2
+
+
+class HashingBusy(HttpError):
+    def __init__(self):
+        super().__init__(503, 'Server busy, try again', {'Retry-After': '1'})
+
+
+_executor = None
+_executor_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(HASH_WORKERS + HASH_QUEUE_LIMIT)
+# Seconds per derivation by version on this instance. Every check is padded to the slowest version, so
+# an unknown email (dummy check) and a legacy PBKDF2 account take as long as a current scrypt one.
+_costs: Dict[int, float] = {}
+
+
+def _pool():
+    # Created on first use: concurrent.futures (and the logging it pulls in) is
+    # not needed by requests that never hash, such as token verification
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                from concurrent.futures import ThreadPoolExecutor
+                _executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix='kdf')
+    return _executor
+
+
+def derive(password: str, salt: str, version: int) -> str:
+    params = HASH_PARAMS[version]
+    if params['algorithm'] == 'scrypt':
+        key = hashlib.scrypt(password.encode(), salt=salt.encode(), n=params['n'], r=params['r'],
+                             p=params['p'], maxmem=256 * params['r'] * params['n'], dklen=32)
+    else:
+        key = hashlib.pbkdf2_hmac('sha256', password.encode(), salt.encode(), params['iterations'])
+    return key.hex()
+
+
+def _timed_derive(password: str, salt: str, version: int) -> str:
+    started = time.perf_counter()
+    key = derive(password, salt, version)
+    elapsed = time.perf_counter() - started
+    previous = _costs.get(version)
+    _costs[version] = elapsed if previous is None else previous + COST_SMOOTHING * (elapsed - previous)
+    return key
+
+
+def _run(password: str, salt: str, version: int) -> str:
+    if not _slots.acquire(blocking=False):
+        raise HashingBusy()
+    try:
+        future = _pool().submit(_timed_derive, password, salt, version)
+    except BaseException:
+        _slots.release()
+        raise
+    future.add_done_callback(lambda _: _slots.release())
+    from concurrent.futures import TimeoutError as FutureTimeout
+    try:
+        return future.result(timeout=HASH_TIMEOUT)
+    except FutureTimeout:
+        raise HashingBusy()
+
+
+def hash_password(password: str) -> Tuple[str, str, int]:
+    salt = secrets.token_hex(16)
+    return _run(password, salt, CURRENT_VERSION), salt, CURRENT_VERSION
+
+
+def _calibrate() -> float:
+    # The first check on an instance times each version once; the pad needs the slowest cost
+    for version in HASH_PARAMS:
+        if version not in _costs:
+            _run(DUMMY_SALT, DUMMY_SALT, version)
+    return time.perf_counter()
+
+
+def _pad(started: float) -> None:
+    remaining = started + max(_costs.values()) - time.perf_counter()
+    if remaining > 0:
+        time.sleep(remaining)
+
+
+def verify_password(password: str, password_hash: str, salt: str, version: int) -> bool:
+    started = _calibrate()
+    valid = hmac.compare_digest(_run(password, salt, version), password_hash)
+    _pad(started)
+    return valid
+
+
+def verify_dummy(password: str) -> bool:
+    started = _calibrate()
+    _run(password, DUMMY_SALT, CURRENT_VERSION)
+    _pad(started)
+    return False
+
+
+def needs_rehash(version: int) -> bool:
+    return version != CURRENT_VERSION
@@ -0,0 +1,136 @@
+'''
+Session tokens: a bounded in-process LRU/TTL cache of validated sessions so
+verify_token is served from memory on warm instances, plus optional signed
+stateless tokens (HMAC-SHA256 over user id, name, email and expiry) that are
+verified without touching the database. Signed tokens are issued only when
+SESSION_SIGNING_KEY is set; rotating the key revokes all of them at once.
+'''
+
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+SESSION_LIFETIME = timedelta(days=30)
+MAX_ACTIVE_SESSIONS = int(os.environ.get('MAX_ACTIVE_SESSIONS', '10'))
+CACHE_SIZE = int(os.environ.get('SESSION_CACHE_SIZE', '10000'))
+# Upper bound on how long a logout on another instance can go unnoticed here
+CACHE_TTL = float(os.environ.get('SESSION_CACHE_TTL', '60'))
+SIGNING_KEY = os.environ.get('SESSION_SIGNING_KEY', '').encode()
+SIGNED_PREFIX = 'v1.'
+
+
+class SessionCache:
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            session, valid_until = entry
+            if time.monotonic() >= valid_until or datetime.now() > session['expires_at']:
+                del self._entries[token]
+                return None
+            self._entries.move_to_end(token)
+            return session
+
+    def put(self, token: str, session: Dict[str, Any]) -> None:
+        remaining = (session['expires_at'] - datetime.now()).total_seconds()
+        if remaining <= 0:
+            return
+        with self._lock:
+            self._entries[token] = (session, time.monotonic() + min(self.ttl, remaining))
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, token: str) -> None:
+        with self._lock:
+            self._entries.pop(token, None)
+
+
+session_cache = SessionCache(CACHE_SIZE, CACHE_TTL)
+# Signed tokens logged out on this instance, kept until they would expire anyway
+revoked_tokens = SessionCache(CACHE_SIZE, SESSION_LIFETIME.total_seconds())
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode()
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + '=' * (-len(data) % 4))
+
+
+def _signature(payload: str) -> str:
+    return _b64encode(hmac.new(SIGNING_KEY, payload.encode(), hashlib.sha256).digest())
+
+
+def is_signed_token(token: str) -> bool:
+    return token.startswith(SIGNED_PREFIX)
+
+
+def session_key(token: str) -> str:
+    # Signed tokens are stored in user_sessions by their signature, which fits the column
+    return token.rsplit('.', 1)[-1] if is_signed_token(token) else token
+
+
+def create_session_token(user_id: int, name: str, email: str, expires_at: datetime) -> str:
+    if not SIGNING_KEY:
+        return secrets.token_urlsafe(32)
+    payload = _b64encode(json.dumps(
+        {'uid': user_id, 'name': name, 'email': email, 'exp': int(expires_at.timestamp())},
+        ensure_ascii=False, separators=(',', ':')
+    ).encode())
+    return f'{SIGNED_PREFIX}{payload}.{_signature(payload)}'
+
+
+def verify_signed_token(token: str) -> Optional[Dict[str, Any]]:
+    if not SIGNING_KEY or not is_signed_token(token):
+        return None
+    try:
+        _, payload, signature = token.split('.')
+        if not hmac.compare_digest(signature, _signature(payload)):
+            return None
+        claims = json.loads(_b64decode(payload))
+    except ValueError:
+        return None
+    expires_at = datetime.fromtimestamp(claims['exp'])
+    if datetime.now() > expires_at or revoked_tokens.get(signature) is not None:
+        return None
+    return {'id': claims['uid'], 'name': claims['name'], 'email': claims['email'], 'expires_at': expires_at}
+
+
+def revoke(token: str) -> None:
+    session_cache.invalidate(token)
+    if is_signed_token(token):
+        revoked_tokens.put(session_key(token), {'expires_at': datetime.now() + SESSION_LIFETIME})
+
+
+def enforce_session_cap(cursor, user_id: int) -> int:
+    '''Deletes the user's oldest sessions beyond MAX_ACTIVE_SESSIONS; returns how many.'''
+    cursor.execute(
+        "DELETE FROM user_sessions WHERE (expires_at, id) IN ("
+        "SELECT expires_at, id FROM user_sessions WHERE user_id = %s "
+        "ORDER BY created_at DESC, id DESC OFFSET %s"
+        ") RETURNING session_token",
+        (user_id, MAX_ACTIVE_SESSIONS)
+    )
+    evicted = cursor.fetchall()
+    for row in evicted:
+        # The stored key is either an opaque token or a signed token's signature
+        session_cache.invalidate(row['session_token'])
+        revoked_tokens.put(row['session_token'], {'expires_at': datetime.now() + SESSION_LIFETIME})
+    return len(evicted)
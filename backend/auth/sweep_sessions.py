@@ -0,0 +1,96 @@
+'''
+Business: Session lifecycle job - keep upcoming user_sessions partitions ready, drop fully expired ones and delete the remaining expired sessions in small batches
+Args: --batch-size rows per delete transaction, --months-ahead partitions to create in advance, --pause seconds between batches
+Returns: Prints a summary; run periodically (e.g. hourly) as: DATABASE_URL=... python sweep_sessions.py
+'''
+
+import argparse
+import os
+import sys
+import time
+from datetime import date, datetime
+from typing import List
+
+import psycopg2
+from psycopg2.extras import RealDictCursor
+
+# Fail fast instead of queueing behind (and in front of) live session queries
+LOCK_TIMEOUT = '2s'
+# Catches sessions outside the monthly partitions; never dropped, its expired rows are deleted in batches
+DEFAULT_PARTITION = 'user_sessions_default'
+
+DELETE_EXPIRED = (
+    "DELETE FROM user_sessions WHERE (expires_at, id) IN ("
+    "SELECT expires_at, id FROM user_sessions WHERE expires_at < CURRENT_TIMESTAMP "
+    "ORDER BY expires_at LIMIT %s"
+    ")"
+)
+
+
+def add_months(day: date, months: int) -> date:
+    month_index = day.year * 12 + day.month - 1 + months
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def ensure_partitions(cursor, months_ahead: int) -> List[str]:
+    today = date.today()
+    names = []
+    for offset in range(months_ahead + 1):
+        cursor.execute("SELECT create_user_sessions_partition(%s) AS name", (add_months(today, offset),))
+        names.append(cursor.fetchone()['name'])
+    return names
+
+
+def drop_expired_partitions(cursor) -> List[str]:
+    cursor.execute(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = 'user_sessions'::regclass AND c.relname != %s ORDER BY c.relname",
+        (DEFAULT_PARTITION,)
+    )
+    dropped = []
+    for row in cursor.fetchall():
+        year, month = row['relname'].rsplit('_', 2)[-2:]
+        # Partition user_sessions_YYYY_MM holds sessions expiring within that month
+        if datetime.combine(add_months(date(int(year), int(month), 1), 1), datetime.min.time()) <= datetime.now():
+            cursor.execute(f'DROP TABLE IF EXISTS "{row["relname"]}"')
+            dropped.append(row['relname'])
+    return dropped
+
+
+def delete_expired(conn, cursor, batch_size: int, pause: float) -> int:
+    total = 0
+    while True:
+        cursor.execute(DELETE_EXPIRED, (batch_size,))
+        deleted = cursor.rowcount
+        conn.commit()
+        total += deleted
+        if deleted < batch_size:
+            return total
+        time.sleep(pause)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--months-ahead', type=int, default=2)
+    parser.add_argument('--pause', type=float, default=0.05)
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(os.environ.get('DATABASE_URL'), cursor_factory=RealDictCursor)
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"SET lock_timeout = '{LOCK_TIMEOUT}'")
+        created = ensure_partitions(cursor, args.months_ahead)
+        conn.commit()
+        dropped = drop_expired_partitions(cursor)
+        conn.commit()
+        deleted = delete_expired(conn, cursor, args.batch_size, args.pause)
+        print(f'partitions_ready={",".join(created)} dropped={",".join(dropped) or "-"} deleted={deleted}', flush=True)
+    finally:
+        cursor.close()
+        conn.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
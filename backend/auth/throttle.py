@@ -0,0 +1,67 @@
+'''
+Login attempt budgets: in-process token buckets keyed by client IP and by
+email, refilled continuously. Checked before any password hashing so a
+credential-stuffing burst is rejected without spending KDF time on it.
+'''
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+MAX_TRACKED_KEYS = int(os.environ.get('LOGIN_BUDGET_KEYS', '50000'))
+
+
+class AttemptBudget:
+    def __init__(self, attempts: int, per_seconds: float, max_keys: int = MAX_TRACKED_KEYS):
+        self.capacity = float(attempts)
+        self.refill_rate = attempts / per_seconds
+        self.max_keys = max_keys
+        self._buckets: 'OrderedDict[str, list]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _tokens(self, key: str, now: float) -> list:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [self.capacity, now]
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            bucket[0] = min(self.capacity, bucket[0] + (now - bucket[1]) * self.refill_rate)
+            bucket[1] = now
+            self._buckets.move_to_end(key)
+        return bucket
+
+    def allows(self, key: str) -> bool:
+        with self._lock:
+            return self._tokens(key, time.monotonic())[0] >= 1
+
+    def consume(self, key: str) -> bool:
+        with self._lock:
+            bucket = self._tokens(key, time.monotonic())
+            if bucket[0] < 1:
+                return False
+            bucket[0] -= 1
+            return True
+
+    def retry_after(self, key: str) -> int:
+        with self._lock:
+            missing = 1 - self._tokens(key, time.monotonic())[0]
+        return max(1, int(missing / self.refill_rate) + 1)
+
+
+# Every attempt from an IP counts; only failed attempts count against an email,
+# so a victim's address cannot be locked out by someone else's correct logins
+ip_budget = AttemptBudget(int(os.environ.get('LOGIN_IP_ATTEMPTS', '30')), 60)
+email_budget = AttemptBudget(int(os.environ.get('LOGIN_EMAIL_FAILURES', '10')), 600)
+
+
+def client_ip(event: Dict[str, Any]) -> Optional[str]:
+    # The gateway-reported address cannot be forged by the client, unlike X-Forwarded-For
+    source_ip = ((event.get('requestContext') or {}).get('identity') or {}).get('sourceIp')
+    if source_ip:
+        return source_ip
+    headers = {key.lower(): value for key, value in (event.get('headers') or {}).items()}
+    forwarded = headers.get('x-forwarded-for')
+    return forwarded.split(',')[0].strip() if forwarded else None
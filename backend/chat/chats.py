@@ -0,0 +1,27 @@
+'''
+Chat creation shared by the chat function (create_chat) and the search
+function (a mutual like opens a chat). A pair has at most one chat,
+whichever order its users were given in.
+'''
+
+from typing import Any
+
+
+def get_or_create_chat(cursor, user1_id: Any, user2_id: Any) -> int:
+    '''Returns the pair's chat id, creating the chat if needed; runs in the caller's transaction.'''
+    cursor.execute(
+        "INSERT INTO chats (user1_id, user2_id) SELECT %s, %s WHERE NOT EXISTS ("
+        "SELECT 1 FROM chats WHERE user1_id = %s AND user2_id = %s) "
+        "ON CONFLICT (user1_id, user2_id) DO NOTHING RETURNING id",
+        (user1_id, user2_id, user2_id, user1_id)
+    )
+    result = cursor.fetchone()
+    if result:
+        return result['id']
+
+    cursor.execute(
+        "SELECT id FROM chats WHERE "
+        "(user1_id = %s AND user2_id = %s) OR (user1_id = %s AND user2_id = %s)",
+        (user1_id, user2_id, user2_id, user1_id)
+    )
+    return cursor.fetchone()['id']
@@ -1,181 +1,226 @@
 '''
 Business: Manage chat messages between users
-Args: event - dict with httpMethod, body (chat operations), queryStringParameters (user_id)
+Args: event - dict with httpMethod, body (chat operations), queryStringParameters (user_id);
+             lists take optional fields and format (see runtime.list_view)
       context - object with attributes: request_id, function_name
 Returns: HTTP response with chat messages or operation status
 '''
 
-import json
-import os
-from typing import Dict, Any
-from datetime import datetime
-import psycopg2
-from psycopg2.extras import RealDictCursor
+import math
+import select
+import time
+from typing import Dict, Any, List, Optional, Tuple
 
-def get_db_connection():
-    database_url = os.environ.get('DATABASE_URL')
-    return psycopg2.connect(database_url, cursor_factory=RealDictCursor)
+from chats import get_or_create_chat
+from runtime import HttpError, Request, Router, list_view, parse_int
 
-def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
-    method: str = event.get('httpMethod', 'GET')
-    
-    if method == 'OPTIONS':
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type, X-User-Id',
-                'Access-Control-Max-Age': '86400'
-            },
-            'body': '',
-            'isBase64Encoded': False
-        }
-    
-    conn = get_db_connection()
-    cursor = conn.cursor()
+MAX_MESSAGES_PAGE = 200
+MAX_WAIT_SECONDS = 25
+# Selectable with fields=...; format=columns returns one array per field
+CHAT_FIELDS = ('chat_id', 'other_user_id', 'other_user_name', 'other_user_sign', 'last_message',
+               'last_message_time', 'unread_count')
+MESSAGE_FIELDS = ('id', 'sender_id', 'message_text', 'created_at', 'sender_name')
+
+router = Router('Content-Type, X-User-Id')
+
+def fetch_messages(cursor, chat_id: int, limit: int, before_id: Optional[int] = None,
+                   after_id: Optional[int] = None) -> Tuple[List[Dict[str, Any]], bool]:
+    query = (
+        "SELECT m.id, m.sender_id, m.message_text, m.created_at, u.name as sender_name "
+        "FROM messages m JOIN users u ON m.sender_id = u.id "
+        "WHERE m.chat_id = %s "
+    )
+    if after_id:
+        query += (
+            "AND (m.created_at, m.id) > (SELECT created_at, id FROM messages WHERE id = %s) "
+            "ORDER BY m.created_at, m.id LIMIT %s"
+        )
+        query_params = (chat_id, after_id, limit + 1)
+    elif before_id:
+        query += (
+            "AND (m.created_at, m.id) < (SELECT created_at, id FROM messages WHERE id = %s) "
+            "ORDER BY m.created_at DESC, m.id DESC LIMIT %s"
+        )
+        query_params = (chat_id, before_id, limit + 1)
+    else:
+        query += "ORDER BY m.created_at DESC, m.id DESC LIMIT %s"
+        query_params = (chat_id, limit + 1)
     
-    try:
-        if method == 'GET':
-            params = event.get('queryStringParameters', {})
-            user_id = params.get('user_id')
-            
-            if not user_id:
-                return {
-                    'statusCode': 400,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'isBase64Encoded': False,
-                    'body': json.dumps({'error': 'user_id required'})
-                }
-            
-            cursor.execute(
-                "SELECT c.id as chat_id, c.user1_id, c.user2_id, "
-                "CASE WHEN c.user1_id = %s THEN u2.name ELSE u1.name END as other_user_name, "
-                "CASE WHEN c.user1_id = %s THEN u2.id ELSE u1.id END as other_user_id, "
-                "CASE WHEN c.user1_id = %s THEN u2.zodiac_sign ELSE u1.zodiac_sign END as other_user_sign "
-                "FROM chats c "
-                "JOIN users u1 ON c.user1_id = u1.id "
-                "JOIN users u2 ON c.user2_id = u2.id "
-                "WHERE c.user1_id = %s OR c.user2_id = %s",
-                (user_id, user_id, user_id, user_id, user_id)
-            )
-            chats = cursor.fetchall()
-            
-            chat_list = []
-            for chat in chats:
-                cursor.execute(
-                    "SELECT message_text, created_at, sender_id FROM messages "
-                    "WHERE chat_id = %s ORDER BY created_at DESC LIMIT 1",
-                    (chat['chat_id'],)
-                )
-                last_message = cursor.fetchone()
-                
-                cursor.execute(
-                    "SELECT COUNT(*) as unread_count FROM messages "
-                    "WHERE chat_id = %s AND sender_id = %s AND is_read = FALSE",
-                    (chat['chat_id'], chat['other_user_id'])
-                )
-                unread = cursor.fetchone()
-                
-                chat_list.append({
-                    'chat_id': chat['chat_id'],
-                    'other_user_id': chat['other_user_id'],
-                    'other_user_name': chat['other_user_name'],
-                    'other_user_sign': chat['other_user_sign'],
-                    'last_message': last_message['message_text'] if last_message else '',
-                    'last_message_time': str(last_message['created_at']) if last_message else '',
-                    'unread_count': unread['unread_count']
-                })
-            
-            return {
-                'statusCode': 200,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'isBase64Encoded': False,
-                'body': json.dumps({'chats': chat_list})
-            }
-        
-        elif method == 'POST':
-            body_data = json.loads(event.get('body', '{}'))
-            action = body_data.get('action')
-            
-            if action == 'create_chat':
-                user1_id = body_data.get('user1_id')
-                user2_id = body_data.get('user2_id')
-                
-                cursor.execute(
-                    "INSERT INTO chats (user1_id, user2_id) VALUES (%s, %s) "
-                    "ON CONFLICT (user1_id, user2_id) DO NOTHING RETURNING id",
-                    (user1_id, user2_id)
-                )
-                result = cursor.fetchone()
-                
-                if result:
-                    chat_id = result['id']
-                else:
-                    cursor.execute(
-                        "SELECT id FROM chats WHERE "
-                        "(user1_id = %s AND user2_id = %s) OR (user1_id = %s AND user2_id = %s)",
-                        (user1_id, user2_id, user2_id, user1_id)
-                    )
-                    chat_id = cursor.fetchone()['id']
-                
-                conn.commit()
-                
-                return {
-                    'statusCode': 200,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'isBase64Encoded': False,
-                    'body': json.dumps({'chat_id': chat_id})
-                }
-            
-            elif action == 'send_message':
-                chat_id = body_data.get('chat_id')
-                sender_id = body_data.get('sender_id')
-                message_text = body_data.get('message_text')
-                
-                cursor.execute(
-                    "INSERT INTO messages (chat_id, sender_id, message_text) VALUES (%s, %s, %s) RETURNING id",
-                    (chat_id, sender_id, message_text)
-                )
-                message_id = cursor.fetchone()['id']
-                conn.commit()
-                
-                return {
-                    'statusCode': 200,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'isBase64Encoded': False,
-                    'body': json.dumps({'message_id': message_id, 'status': 'sent'})
-                }
-            
-            elif action == 'get_messages':
-                chat_id = body_data.get('chat_id')
-                limit = body_data.get('limit', 50)
-                
-                cursor.execute(
-                    "SELECT m.id, m.sender_id, m.message_text, m.created_at, u.name as sender_name "
-                    "FROM messages m JOIN users u ON m.sender_id = u.id "
-                    "WHERE m.chat_id = %s ORDER BY m.created_at DESC LIMIT %s",
-                    (chat_id, limit)
-                )
-                messages = cursor.fetchall()
-                
-                messages_list = [dict(msg) for msg in messages]
-                messages_list.reverse()
-                
-                return {
-                    'statusCode': 200,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'isBase64Encoded': False,
-                    'body': json.dumps({'messages': messages_list})
-                }
+    cursor.execute(query, query_params)
+    messages = cursor.fetchall()
     
+    has_more = len(messages) > limit
+    messages_list = messages[:limit]
+    if not after_id:
+        messages_list.reverse()
+    return messages_list, has_more
+
+def wait_for_messages(conn, cursor, chat_id: int, after_id: Optional[int],
+                      timeout: float) -> Tuple[List[Dict[str, Any]], bool, Optional[int]]:
+    '''(messages after after_id, has_more, the after_id to wait from next time)'''
+    channel = f'chat_{chat_id}'
+    # LISTEN before the first read so a message inserted in between still wakes us up
+    cursor.execute(f'LISTEN {channel}')
+    conn.commit()
+    try:
+        if after_id is None:
+            # No cursor: wait for messages newer than the chat's latest one, not return the latest page at once.
+            # A chat without messages keeps after_id None, and then anything that arrives is new.
+            cursor.execute("SELECT last_message_id FROM chats WHERE id = %s", (chat_id,))
+            chat = cursor.fetchone()
+            if chat is None:
+                raise HttpError(404, 'Chat not found')
+            after_id = chat['last_message_id']
+        deadline = time.monotonic() + timeout
+        while True:
+            messages_list, has_more = fetch_messages(cursor, chat_id, MAX_MESSAGES_PAGE, after_id=after_id)
+            conn.commit()
+            remaining = deadline - time.monotonic()
+            if messages_list or remaining <= 0:
+                return messages_list, has_more, messages_list[-1]['id'] if messages_list else after_id
+            # A notification delivered while the read ran is already off the socket, buffered by libpq where
+            # select() cannot see it: poll() moves it to conn.notifies, and then read again instead of waiting
+            conn.poll()
+            if conn.notifies:
+                conn.notifies.clear()
+                continue
+            if select.select([conn], [], [], remaining) != ([], [], []):
+                conn.poll()
+                conn.notifies.clear()
     finally:
-        cursor.close()
-        conn.close()
+        cursor.execute(f'UNLISTEN {channel}')
+        conn.commit()
+        conn.notifies.clear()
+
+@router.get()
+def list_chats(request: Request) -> Dict[str, Any]:
+    user_id = request.params.get('user_id')
+    
+    if not user_id:
+        raise HttpError(400, 'user_id required')
+    
+    cursor = request.cursor
+    cursor.execute(
+        "SELECT c.id as chat_id, u.id as other_user_id, u.name as other_user_name, "
+        "u.zodiac_sign as other_user_sign, c.last_message_text, c.last_message_at, "
+        "CASE WHEN c.user1_id = %s THEN c.user1_unread ELSE c.user2_unread END as unread_count "
+        "FROM chats c "
+        "JOIN users u ON u.id = CASE WHEN c.user1_id = %s THEN c.user2_id ELSE c.user1_id END "
+        "WHERE c.user1_id = %s OR c.user2_id = %s "
+        "ORDER BY c.last_message_at DESC NULLS LAST, c.id DESC",
+        (user_id, user_id, user_id, user_id)
+    )
+    chats = cursor.fetchall()
+    
+    chat_list = [{
+        'chat_id': chat['chat_id'],
+        'other_user_id': chat['other_user_id'],
+        'other_user_name': chat['other_user_name'],
+        'other_user_sign': chat['other_user_sign'],
+        'last_message': chat['last_message_text'] or '',
+        'last_message_time': str(chat['last_message_at']) if chat['last_message_at'] else '',
+        'unread_count': chat['unread_count']
+    } for chat in chats]
+    
+    return {'chats': list_view(chat_list, request.params, CHAT_FIELDS)}
+
+@router.action('create_chat')
+def create_chat(request: Request) -> Dict[str, Any]:
+    user1_id = request.body.get('user1_id')
+    user2_id = request.body.get('user2_id')
+    chat_id = get_or_create_chat(request.cursor, user1_id, user2_id)
+    
+    request.conn.commit()
+    
+    return {'chat_id': chat_id}
+
+@router.action('send_message')
+def send_message(request: Request) -> Dict[str, Any]:
+    chat_id = request.body.get('chat_id')
+    sender_id = request.body.get('sender_id')
+    message_text = request.body.get('message_text')
+    cursor = request.cursor
+    
+    cursor.execute(
+        "WITH m AS ("
+        "INSERT INTO messages (chat_id, sender_id, message_text) VALUES (%s, %s, %s) "
+        "RETURNING id, chat_id, sender_id, message_text, created_at"
+        ") "
+        "UPDATE chats c SET last_message_id = m.id, last_message_text = m.message_text, "
+        "last_message_at = m.created_at, last_sender_id = m.sender_id, "
+        "user1_unread = c.user1_unread + CASE WHEN c.user1_id = m.sender_id THEN 0 ELSE 1 END, "
+        "user2_unread = c.user2_unread + CASE WHEN c.user2_id = m.sender_id THEN 0 ELSE 1 END "
+        "FROM m WHERE c.id = m.chat_id RETURNING m.id",
+        (chat_id, sender_id, message_text)
+    )
+    message_id = cursor.fetchone()['id']
+    request.conn.commit()
+    
+    return {'message_id': message_id, 'status': 'sent'}
+
+@router.action('get_messages')
+def get_messages(request: Request) -> Dict[str, Any]:
+    if request.body.get('chat_id') is None:
+        raise HttpError(400, 'chat_id required')
+    chat_id = parse_int(request.body['chat_id'], 'chat_id', 1)
+    limit = min(parse_int(request.body.get('limit', 50), 'limit', 1), MAX_MESSAGES_PAGE)
+    before_id, after_id = (
+        parse_int(request.body[name], name, 1) if request.body.get(name) is not None else None
+        for name in ('before_id', 'after_id')
+    )
+    
+    messages_list, has_more = fetch_messages(request.cursor, chat_id, limit, before_id, after_id)
+    
+    return {'messages': list_view(messages_list, request.body, MESSAGE_FIELDS), 'has_more': has_more}
+
+# Long poll: holds the request up to the wait timeout and re-reads on every notification
+@router.action('wait_for_messages', budget_ms=(MAX_WAIT_SECONDS + 5) * 1000, budget_queries=100)
+def wait_for_new_messages(request: Request) -> Dict[str, Any]:
+    if request.body.get('chat_id') is None:
+        raise HttpError(400, 'chat_id required')
+    chat_id = parse_int(request.body['chat_id'], 'chat_id', 1)
+    after_id = request.body.get('after_id')
+    if after_id is not None:
+        after_id = parse_int(after_id, 'after_id', 1)
+    try:
+        timeout = float(request.body.get('timeout', 20))
+    except (TypeError, ValueError):
+        raise HttpError(400, 'timeout must be a number of seconds')
+    if not math.isfinite(timeout):
+        raise HttpError(400, 'timeout must be a number of seconds')
+    timeout = min(max(timeout, 0.0), MAX_WAIT_SECONDS)
+    
+    messages_list, has_more, after_id = wait_for_messages(request.conn, request.cursor, chat_id, after_id, timeout)
     
     return {
-        'statusCode': 405,
-        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-        'isBase64Encoded': False,
-        'body': json.dumps({'error': 'Method not allowed'})
+        'messages': list_view(messages_list, request.body, MESSAGE_FIELDS),
+        'has_more': has_more,
+        'after_id': after_id
     }
+
+@router.action('mark_read')
+def mark_read(request: Request) -> Dict[str, Any]:
+    chat_id = request.body.get('chat_id')
+    user_id = request.body.get('user_id')
+    cursor = request.cursor
+    
+    # Reset the counter first: the chat row lock orders this against concurrent send_message
+    cursor.execute(
+        "UPDATE chats SET "
+        "user1_unread = CASE WHEN user1_id = %s THEN 0 ELSE user1_unread END, "
+        "user2_unread = CASE WHEN user2_id = %s THEN 0 ELSE user2_unread END "
+        "WHERE id = %s",
+        (user_id, user_id, chat_id)
+    )
+    cursor.execute(
+        "UPDATE messages SET is_read = TRUE "
+        "WHERE chat_id = %s AND sender_id != %s AND is_read = FALSE",
+        (chat_id, user_id)
+    )
+    marked = cursor.rowcount
+    request.conn.commit()
+    
+    return {'marked_read': marked}
+
+def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    return router.handle(event, context)
@@ -0,0 +1,312 @@
+'''
+Request runtime shared by the function handlers: a router with O(1)
+dispatch on (method, action), precomputed CORS/JSON headers, a compact JSON
+encoder that understands dates, times and Decimals, a request body size
+limit and a lazily opened database connection per request. Every
+invocation is traced (queries, database time, rows, wall time) and logged
+as one JSON line; actions over their time or query budget are flagged.
+Larger responses are gzipped for clients that accept it, and list
+endpoints can return only the requested fields, optionally as columns.
+'''
+
+import base64
+import json
+import os
+import sys
+from datetime import date, time
+from decimal import Decimal
+from time import perf_counter
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from db import get_db_connection, release_db_connection
+
+MAX_BODY_SIZE = int(os.environ.get('MAX_BODY_SIZE', str(64 * 1024)))
+# Default per-action budgets; actions with known heavier work declare their own
+BUDGET_MS = float(os.environ.get('REQUEST_BUDGET_MS', '200'))
+BUDGET_QUERIES = int(os.environ.get('REQUEST_BUDGET_QUERIES', '10'))
+# Bodies below this many characters are sent as is: gzip would not win back its own overhead
+COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', '1024'))
+
+JSON_HEADERS = {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'}
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, (date, time)):
+        return str(value)
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+encode_json = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'), default=_default).encode
+
+
+class Response(dict):
+    pass
+
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str, headers: Optional[Dict[str, str]] = None):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.headers = headers
+
+
+def json_response(status: int, payload: Any, headers: Optional[Dict[str, str]] = None) -> Response:
+    return Response(
+        statusCode=status,
+        headers={**JSON_HEADERS, **headers} if headers else JSON_HEADERS,
+        isBase64Encoded=False,
+        body=encode_json(payload)
+    )
+
+
+METHOD_NOT_ALLOWED = json_response(405, {'error': 'Method not allowed'})
+
+
+def parse_body(event: Dict[str, Any], max_size: int) -> Dict[str, Any]:
+    body = event.get('body') or '{}'
+    if len(body) > max_size:
+        raise HttpError(413, 'Request body too large')
+    try:
+        if event.get('isBase64Encoded'):
+            body = base64.b64decode(body)
+        data = json.loads(body)
+    except ValueError:
+        raise HttpError(400, 'Invalid JSON body')
+    if not isinstance(data, dict):
+        raise HttpError(400, 'JSON object expected')
+    return data
+
+
+def parse_int(value: Any, name: str, minimum: int = 0, maximum: Optional[int] = None) -> int:
+    '''An integer request parameter; HttpError 400 if it is not one or is out of range.'''
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        raise HttpError(400, f'{name} must be an integer')
+    if number < minimum or (maximum is not None and number > maximum):
+        raise HttpError(400, f'{name} out of range')
+    return number
+
+
+def get_header(event: Dict[str, Any], name: str) -> Optional[str]:
+    name = name.lower()
+    for key, value in (event.get('headers') or {}).items():
+        if key.lower() == name:
+            return value
+    return None
+
+
+def accepts_gzip(event: Dict[str, Any]) -> bool:
+    for coding in (get_header(event, 'Accept-Encoding') or '').split(','):
+        name, _, params = coding.partition(';')
+        if name.strip().lower() in ('gzip', '*'):
+            quality = params.strip().lower()
+            try:
+                return not quality.startswith('q=') or float(quality[2:]) > 0
+            except ValueError:
+                return False
+    return False
+
+
+def compress(response: Response) -> Response:
+    # gzip is imported here so cold starts that never compress do not pay for it
+    import gzip
+
+    body = gzip.compress(response['body'].encode('utf-8'), compresslevel=5)
+    return Response(
+        statusCode=response['statusCode'],
+        headers={**response['headers'], 'Content-Encoding': 'gzip', 'Vary': 'Accept-Encoding'},
+        isBase64Encoded=True,
+        body=base64.b64encode(body).decode('ascii')
+    )
+
+
+def list_view(rows: List[Dict[str, Any]], options: Dict[str, Any], available: Sequence[str]) -> Any:
+    '''
+    Rows shaped as the client asked in options: fields (comma-separated or a
+    list) keeps only those keys, format=columns turns the list into one array
+    per field ({'id': [...], 'name': [...]}) so keys are not repeated per row.
+    '''
+    fields = options.get('fields')
+    if fields:
+        names = fields.split(',') if isinstance(fields, str) else fields
+        if not isinstance(names, list) or any(name not in available for name in names):
+            raise HttpError(400, f'fields must be a subset of: {", ".join(available)}')
+    else:
+        names = available
+    if options.get('format') == 'columns':
+        return {name: [row[name] for row in rows] for name in names}
+    if fields:
+        return [{name: row[name] for name in names} for row in rows]
+    return rows
+
+
+class Trace:
+    __slots__ = ('key', 'queries', 'db_seconds', 'rows')
+
+    def __init__(self, key: tuple):
+        # (method, action); the action is filled in once the body is parsed
+        self.key = key
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.rows = 0
+
+    def record(self, seconds: float, rows: int) -> None:
+        self.queries += 1
+        self.db_seconds += seconds
+        self.rows += max(rows, 0)
+
+
+def write_log(record: Dict[str, Any]) -> None:
+    sys.stdout.write(encode_json(record) + '\n')
+    sys.stdout.flush()
+
+
+# Receives one record per invocation; replace it to collect traces elsewhere (e.g. in benchmarks)
+trace_sink: Callable[[Dict[str, Any]], None] = write_log
+
+
+class Request:
+    __slots__ = ('event', 'body', 'params', 'trace', '_conn', '_cursor')
+
+    def __init__(self, event: Dict[str, Any], body: Dict[str, Any], trace: Trace):
+        self.event = event
+        self.body = body
+        self.params = event.get('queryStringParameters') or {}
+        self.trace = trace
+        self._conn = None
+        self._cursor = None
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            self._conn = get_db_connection()
+            # Every cursor of this connection reports its queries to the request trace
+            self._conn.trace = self.trace
+        return self._conn
+
+    @property
+    def cursor(self):
+        if self._cursor is None:
+            self._cursor = self.conn.cursor()
+        return self._cursor
+
+    def header(self, name: str) -> Optional[str]:
+        return get_header(self.event, name)
+
+    def close(self) -> None:
+        if self._cursor is not None:
+            self._cursor.close()
+        if self._conn is not None:
+            self._conn.trace = None
+            release_db_connection(self._conn)
+
+
+Handler = Callable[[Request], Any]
+
+
+class Router:
+    def __init__(self, allow_headers: str, default_method: str = 'GET', max_body_size: int = MAX_BODY_SIZE):
+        self.default_method = default_method
+        self.max_body_size = max_body_size
+        self.routes: Dict[tuple, Handler] = {}
+        # Per-action overrides; bodies are parsed under the largest limit, then checked per action
+        self.body_limits: Dict[tuple, int] = {}
+        self.parse_limit = max_body_size
+        # (milliseconds, queries) per route; exceeding either is flagged in the request log
+        self.budgets: Dict[tuple, Tuple[float, int]] = {}
+        self.preflight = Response(
+            statusCode=200,
+            headers={
+                'Access-Control-Allow-Origin': '*',
+                'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
+                'Access-Control-Allow-Headers': allow_headers,
+                'Access-Control-Max-Age': '86400'
+            },
+            body='',
+            isBase64Encoded=False
+        )
+
+    def route(self, method: str, action: Optional[str] = None, max_body_size: Optional[int] = None,
+              budget_ms: Optional[float] = None, budget_queries: Optional[int] = None) -> Callable[[Handler], Handler]:
+        def register(fn: Handler) -> Handler:
+            self.routes[(method, action)] = fn
+            if max_body_size is not None:
+                self.body_limits[(method, action)] = max_body_size
+                self.parse_limit = max(self.parse_limit, max_body_size)
+            self.budgets[(method, action)] = (budget_ms or BUDGET_MS, budget_queries or BUDGET_QUERIES)
+            return fn
+        return register
+
+    def get(self, budget_ms: Optional[float] = None,
+            budget_queries: Optional[int] = None) -> Callable[[Handler], Handler]:
+        return self.route('GET', budget_ms=budget_ms, budget_queries=budget_queries)
+
+    def action(self, name: str, max_body_size: Optional[int] = None, budget_ms: Optional[float] = None,
+               budget_queries: Optional[int] = None) -> Callable[[Handler], Handler]:
+        return self.route('POST', name, max_body_size, budget_ms, budget_queries)
+
+    def dispatch(self, event: Dict[str, Any], method: str, trace: Trace) -> Response:
+        try:
+            if method == 'POST':
+                body = parse_body(event, self.parse_limit)
+                action = body.get('action')
+                if action is not None and not isinstance(action, str):
+                    raise HttpError(400, 'action must be a string')
+                trace.key = (method, action)
+                limit = self.body_limits.get(trace.key, self.max_body_size)
+                if limit < self.parse_limit and len(event.get('body') or '') > limit:
+                    raise HttpError(413, 'Request body too large')
+            else:
+                body = {}
+            fn = self.routes.get(trace.key)
+            if fn is None:
+                return METHOD_NOT_ALLOWED
+            request = Request(event, body, trace)
+            try:
+                result = fn(request)
+            finally:
+                request.close()
+        except HttpError as error:
+            return json_response(error.status, {'error': error.message}, error.headers)
+        return result if isinstance(result, Response) else json_response(200, result)
+
+    def log(self, context: Any, trace: Trace, status: int, elapsed_ms: float) -> None:
+        method, action = trace.key
+        record = {
+            'function': getattr(context, 'function_name', None),
+            'request_id': getattr(context, 'request_id', None),
+            'action': action or method,
+            'status': status,
+            'ms': round(elapsed_ms, 2),
+            'queries': trace.queries,
+            'db_ms': round(trace.db_seconds * 1000, 2),
+            'rows': trace.rows,
+        }
+        budget_ms, budget_queries = self.budgets.get(trace.key, (BUDGET_MS, BUDGET_QUERIES))
+        over_budget = [name for name, value, limit in (('ms', elapsed_ms, budget_ms),
+                                                       ('queries', trace.queries, budget_queries)) if value > limit]
+        if over_budget:
+            record['over_budget'] = over_budget
+        trace_sink(record)
+
+    def handle(self, event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+        method = event.get('httpMethod', self.default_method)
+        if method == 'OPTIONS':
+            return self.preflight
+        started = perf_counter()
+        trace = Trace((method, None))
+        # Anything that escapes dispatch becomes a 500 on the platform side
+        status = 500
+        try:
+            response = self.dispatch(event, method, trace)
+            status = response['statusCode']
+            if len(response['body']) >= COMPRESS_MIN_SIZE and not response['isBase64Encoded'] \
+                    and accepts_gzip(event):
+                response = compress(response)
+            return response
+        finally:
+            self.log(context, trace, status, (perf_counter() - started) * 1000)
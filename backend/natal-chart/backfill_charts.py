@@ -0,0 +1,104 @@
+'''
+Business: Backfill natal_charts (Moon, Ascendant, Mercury..Saturn, chart_data) for all existing users, resolving missing birth coordinates and timezones from birth_city with the offline gazetteer
+Args: --chunk-size rows per transaction, --start-id to resume an interrupted run
+Returns: Prints progress per chunk; run as: DATABASE_URL=... python backfill_charts.py
+'''
+
+import argparse
+import os
+import sys
+import time
+
+import psycopg2
+from psycopg2.extras import Json, RealDictCursor, execute_values
+
+from chart import calculate_charts
+from compatibility import SIGN_CODES
+from gazetteer import locate, utc_offset
+
+SELECT_USERS = (
+    "SELECT id, birth_date, birth_time, birth_city, birth_latitude, birth_longitude, birth_timezone, "
+    "zodiac_sign FROM users "
+    "WHERE id > %s ORDER BY id LIMIT %s"
+)
+UPSERT_CHARTS = (
+    "INSERT INTO natal_charts (user_id, sun_sign, moon_sign, ascendant, mercury, venus, mars, jupiter, "
+    "saturn, chart_data) VALUES %s "
+    "ON CONFLICT (user_id) DO UPDATE SET sun_sign = EXCLUDED.sun_sign, moon_sign = EXCLUDED.moon_sign, "
+    "ascendant = EXCLUDED.ascendant, mercury = EXCLUDED.mercury, venus = EXCLUDED.venus, "
+    "mars = EXCLUDED.mars, jupiter = EXCLUDED.jupiter, saturn = EXCLUDED.saturn, "
+    "chart_data = EXCLUDED.chart_data"
+)
+UPDATE_USERS = (
+    "UPDATE users u SET moon_sign = v.moon_sign, ascendant_sign = v.ascendant_sign, "
+    "birth_latitude = v.birth_latitude::float8, birth_longitude = v.birth_longitude::float8, "
+    "birth_timezone = v.birth_timezone "
+    "FROM (VALUES %s) AS v(id, moon_sign, ascendant_sign, birth_latitude, birth_longitude, birth_timezone) "
+    "WHERE u.id = v.id"
+)
+
+
+def backfill(conn, chunk_size: int, start_id: int = 0) -> int:
+    cursor = conn.cursor()
+    last_id = start_id
+    total = 0
+    started = time.monotonic()
+    try:
+        while True:
+            cursor.execute(SELECT_USERS, (last_id, chunk_size))
+            users = cursor.fetchall()
+            if not users:
+                break
+            last_id = users[-1]['id']
+
+            # Accounts registered without birth data carry a placeholder sign
+            users = [user for user in users if user['zodiac_sign'] in SIGN_CODES]
+            for user in users:
+                if user['birth_latitude'] is None or user['birth_timezone'] is None:
+                    user['birth_latitude'], user['birth_longitude'], user['birth_timezone'] = locate(
+                        user['birth_city'], user['birth_latitude'], user['birth_longitude']
+                    )
+            charts = calculate_charts([
+                (user['birth_date'], user['birth_time'], user['birth_latitude'], user['birth_longitude'])
+                for user in users
+            ], [utc_offset(user['birth_timezone'], user['birth_date'], user['birth_time']) for user in users])
+
+            chart_rows = []
+            user_rows = []
+            for user, chart in zip(users, charts):
+                ascendant = chart['ascendant'] or user['zodiac_sign']
+                chart_rows.append((
+                    user['id'], user['zodiac_sign'], chart['moon_sign'], ascendant, chart['mercury'],
+                    chart['venus'], chart['mars'], chart['jupiter'], chart['saturn'], Json(chart['chart_data'])
+                ))
+                user_rows.append((user['id'], chart['moon_sign'], ascendant, user['birth_latitude'],
+                                  user['birth_longitude'], user['birth_timezone']))
+
+            if chart_rows:
+                execute_values(cursor, UPSERT_CHARTS, chart_rows, page_size=len(chart_rows))
+                execute_values(cursor, UPDATE_USERS, user_rows, page_size=len(user_rows))
+            conn.commit()
+
+            total += len(chart_rows)
+            print(f'charts={total} last_id={last_id} elapsed={time.monotonic() - started:.1f}s', flush=True)
+    finally:
+        cursor.close()
+    return total
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--chunk-size', type=int, default=5000)
+    parser.add_argument('--start-id', type=int, default=0)
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(os.environ.get('DATABASE_URL'), cursor_factory=RealDictCursor)
+    try:
+        backfill(conn, args.chunk_size, args.start_id)
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
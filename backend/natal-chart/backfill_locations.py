@@ -0,0 +1,79 @@
+'''
+Business: Set the current location and search cell of users that have none yet (one-off after migration V0014), starting from their birth place
+Args: --chunk-size users per transaction, --start-id to resume an interrupted run
+Returns: Prints progress per chunk; run as: DATABASE_URL=... python backfill_locations.py
+'''
+
+import argparse
+import os
+import sys
+import time
+
+import psycopg2
+from psycopg2.extras import RealDictCursor, execute_values
+
+from gazetteer import locate
+from geo import geohash
+
+SELECT_USERS = (
+    "SELECT id, birth_city, birth_latitude, birth_longitude, latitude, longitude FROM users "
+    "WHERE id > %s AND geo_cell IS NULL ORDER BY id LIMIT %s"
+)
+UPDATE_USERS = (
+    "UPDATE users u SET latitude = v.latitude, longitude = v.longitude, geo_cell = v.geo_cell "
+    "FROM (VALUES %s) AS v(id, latitude, longitude, geo_cell) WHERE u.id = v.id"
+)
+
+
+def backfill(conn, chunk_size: int, start_id: int = 0) -> int:
+    cursor = conn.cursor()
+    last_id = start_id
+    total = 0
+    started = time.monotonic()
+    try:
+        while True:
+            cursor.execute(SELECT_USERS, (last_id, chunk_size))
+            users = cursor.fetchall()
+            if not users:
+                break
+            last_id = users[-1]['id']
+
+            rows = []
+            for user in users:
+                latitude, longitude = user['latitude'], user['longitude']
+                if latitude is None or longitude is None:
+                    latitude, longitude, _ = locate(
+                        user['birth_city'], user['birth_latitude'], user['birth_longitude']
+                    )
+                # Users whose birth place is unknown stay out of location-filtered search
+                if latitude is not None:
+                    rows.append((user['id'], latitude, longitude, geohash(latitude, longitude)))
+
+            if rows:
+                execute_values(cursor, UPDATE_USERS, rows, template='(%s, %s::float8, %s::float8, %s)',
+                               page_size=len(rows))
+            conn.commit()
+
+            total += len(rows)
+            print(f'located={total} last_id={last_id} elapsed={time.monotonic() - started:.1f}s', flush=True)
+    finally:
+        cursor.close()
+    return total
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--chunk-size', type=int, default=5000)
+    parser.add_argument('--start-id', type=int, default=0)
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(os.environ.get('DATABASE_URL'), cursor_factory=RealDictCursor)
+    try:
+        backfill(conn, args.chunk_size, args.start_id)
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
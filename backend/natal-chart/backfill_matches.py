@@ -0,0 +1,65 @@
+'''
+Business: Build user_matches lists for users that do not have one yet (after migration V0008, and after bulk imports past their inline refresh)
+Args: --chunk-size users per transaction, --start-id to resume an interrupted run
+Returns: Prints progress per chunk; run as: DATABASE_URL=... python backfill_matches.py
+'''
+
+import argparse
+import os
+import sys
+import time
+
+import psycopg2
+from psycopg2.extras import RealDictCursor
+
+from compatibility import SIGN_CODES
+from matches import refresh_user_matches
+
+SELECT_USERS = (
+    "SELECT u.id, u.zodiac_sign, nc.chart_data FROM users u "
+    "LEFT JOIN natal_charts nc ON nc.user_id = u.id "
+    "WHERE u.id > %s AND NOT EXISTS (SELECT 1 FROM user_matches um WHERE um.user_id = u.id) "
+    "ORDER BY u.id LIMIT %s"
+)
+
+
+def backfill(conn, chunk_size: int, start_id: int = 0) -> int:
+    cursor = conn.cursor()
+    last_id = start_id
+    total = 0
+    started = time.monotonic()
+    try:
+        while True:
+            cursor.execute(SELECT_USERS, (last_id, chunk_size))
+            users = cursor.fetchall()
+            if not users:
+                break
+            last_id = users[-1]['id']
+
+            for user in users:
+                if user['zodiac_sign'] in SIGN_CODES:
+                    refresh_user_matches(cursor, user['id'], user['zodiac_sign'], user['chart_data'])
+                    total += 1
+            conn.commit()
+            print(f'lists={total} last_id={last_id} elapsed={time.monotonic() - started:.1f}s', flush=True)
+    finally:
+        cursor.close()
+    return total
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--chunk-size', type=int, default=100)
+    parser.add_argument('--start-id', type=int, default=0)
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(os.environ.get('DATABASE_URL'), cursor_factory=RealDictCursor)
+    try:
+        backfill(conn, args.chunk_size, args.start_id)
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,143 @@
+'''
+Business: Build the offline city gazetteer (cities.bin) read by gazetteer.py
+Args: GeoNames city dumps in the geonamescache JSON format: --cities for the whole world (cities15000.json), --regional for denser coverage of --countries (cities5000.json), --output path
+Returns: Writes the gazetteer file and prints its size; run as: python build_gazetteer.py --cities cities15000.json --regional cities5000.json
+'''
+
+import argparse
+import json
+import os
+import struct
+import sys
+from collections import defaultdict
+from typing import Any, Dict, List
+
+from gazetteer import (
+    CITY, COORDINATE_SCALE, GAZETTEER_PATH, HEADER, MAGIC, encode_postings, normalize, trigrams
+)
+
+# Former USSR: most users are born there, so smaller towns and Latin transliterations are kept
+REGIONAL_COUNTRIES = 'RU,UA,BY,KZ,UZ,KG,TJ,TM,AZ,AM,GE,MD,LT,LV,EE'
+# Elsewhere Latin alternates (New York for New York City, Frankfurt for Frankfurt am Main) are kept
+# for cities at least this large; for every small town they would mostly add homonyms
+LATIN_ALTERNATES_MIN_POPULATION = 100000
+
+
+def is_cyrillic(name: str) -> bool:
+    return any('Ѐ' <= char <= 'ӿ' for char in name)
+
+
+def is_latin(name: str) -> bool:
+    # Basic Latin through Latin Extended-B: English and transliterated names, with or without diacritics
+    return all(ord(char) < 0x250 for char in name)
+
+
+def name_keys(city: Dict[str, Any], regional: bool) -> List[str]:
+    names = [city['name']]
+    latin = regional or city['population'] >= LATIN_ALTERNATES_MIN_POPULATION
+    for alternate in city.get('alternatenames') or ():
+        # Short all-caps alternates are codes (IATA, abbreviations), not names
+        if alternate.isupper() and len(alternate) <= 4:
+            continue
+        if is_cyrillic(alternate) or (latin and is_latin(alternate)):
+            names.append(alternate)
+    keys = {normalize(name) for name in names}
+    return sorted(key for key in keys if len(key) > 2)
+
+
+def load_cities(world_path: str, regional_path: str, countries: set) -> List[Dict[str, Any]]:
+    with open(world_path, encoding='utf-8') as f:
+        cities = json.load(f)
+    if regional_path:
+        with open(regional_path, encoding='utf-8') as f:
+            for geoname_id, city in json.load(f).items():
+                if city['countrycode'] in countries:
+                    cities.setdefault(geoname_id, city)
+    return sorted(cities.values(), key=lambda city: -city['population'])
+
+
+def build(cities: List[Dict[str, Any]], countries: set, path: str) -> None:
+    strings = bytearray()
+
+    def add_string(text: str) -> int:
+        offset = len(strings)
+        strings.extend(text.encode('utf-8'))
+        return offset
+
+    timezones = sorted({city['timezone'] for city in cities})
+    tz_index = {timezone: index for index, timezone in enumerate(timezones)}
+
+    city_records = bytearray()
+    city_names = []
+    names = []
+    for city_id, city in enumerate(cities):
+        city_records += CITY.pack(
+            round(city['latitude'] * COORDINATE_SCALE), round(city['longitude'] * COORDINATE_SCALE),
+            city['population'], tz_index[city['timezone']], city['countrycode'].encode()
+        )
+        city_names.append(add_string(city['name']))
+        for key in name_keys(city, city['countrycode'] in countries):
+            names.append((key, city_id))
+    city_names.append(len(strings))
+    # Cities are ordered by population, so equal keys end up most populous first
+    names.sort()
+
+    name_keys_offsets = [add_string(key) for key, _ in names]
+    name_keys_offsets.append(len(strings))
+    tz_offsets = [add_string(timezone) for timezone in timezones]
+    tz_offsets.append(len(strings))
+
+    postings: Dict[int, List[int]] = defaultdict(list)
+    for name_id, (key, _) in enumerate(names):
+        for code in trigrams(key):
+            postings[code].append(name_id)
+    codes = sorted(postings)
+    posting_blob = bytearray()
+    posting_offsets = []
+    for code in codes:
+        posting_offsets.append(len(posting_blob))
+        posting_blob += encode_postings(postings[code])
+    posting_offsets.append(len(posting_blob))
+
+    sections = [
+        bytes(city_records),
+        struct.pack(f'<{len(city_names)}I', *city_names),
+        struct.pack(f'<{len(name_keys_offsets)}I', *name_keys_offsets),
+        struct.pack(f'<{len(names)}I', *(city_id for _, city_id in names)),
+        struct.pack(f'<{len(tz_offsets)}I', *tz_offsets),
+        struct.pack(f'<{len(codes)}Q', *codes),
+        struct.pack(f'<{len(posting_offsets)}I', *posting_offsets) + bytes(posting_blob),
+        bytes(strings),
+    ]
+    offsets = []
+    position = HEADER.size
+    for section in sections:
+        # uint64 codes are read through memoryview.cast and need 8-byte alignment
+        position += -position % 8
+        offsets.append(position)
+        position += len(section)
+
+    with open(path, 'wb') as out:
+        out.write(HEADER.pack(MAGIC, len(cities), len(names), len(codes), len(timezones), *offsets))
+        for offset, section in zip(offsets, sections):
+            out.write(b'\0' * (offset - out.tell()))
+            out.write(section)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--cities', required=True)
+    parser.add_argument('--regional')
+    parser.add_argument('--countries', default=REGIONAL_COUNTRIES)
+    parser.add_argument('--output', default=GAZETTEER_PATH)
+    args = parser.parse_args()
+
+    countries = set(args.countries.split(','))
+    cities = load_cities(args.cities, args.regional, countries)
+    build(cities, countries, args.output)
+    print(f'{args.output}: {len(cities)} cities, {os.path.getsize(args.output)} bytes')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
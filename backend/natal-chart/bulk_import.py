@@ -0,0 +1,221 @@
+'''
+Bulk profile import: NDJSON or CSV records are validated, charted with one
+calculate_charts call per chunk and written with multi-row inserts, one
+transaction per chunk. Rows that fail validation or the insert are reported
+by line number and do not stop the rest of the import.
+'''
+
+import csv
+import json
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from astro_dates import calculate_zodiac_signs
+from chart import calculate_charts
+from gazetteer import locate, utc_offset
+from geo import geohash
+
+CHUNK_SIZE = 1000
+FORMATS = ('ndjson', 'csv')
+GENDERS = ('male', 'female', 'other')
+DEFAULT_BIRTH_TIME = '12:00:00'
+DEFAULT_BIRTH_CITY = 'Unknown'
+
+INSERT_USERS = (
+    "INSERT INTO users (name, email, birth_date, birth_time, birth_city, birth_latitude, birth_longitude, "
+    "birth_timezone, zodiac_sign, moon_sign, ascendant_sign, gender, latitude, longitude, geo_cell) VALUES %s "
+    "ON CONFLICT (email) DO NOTHING RETURNING id, email"
+)
+INSERT_CHARTS = (
+    "INSERT INTO natal_charts (user_id, sun_sign, moon_sign, ascendant, mercury, venus, mars, jupiter, "
+    "saturn, chart_data) VALUES %s"
+)
+
+# (line number, record or None, parse error or None)
+Record = Tuple[int, Optional[Dict[str, Any]], Optional[str]]
+
+
+def read_records(lines: Iterable[str], fmt: str) -> Iterator[Record]:
+    '''Streams records from NDJSON (one object per line) or CSV with a header row.'''
+    if fmt == 'csv':
+        reader = csv.DictReader(lines)
+        for row in reader:
+            yield reader.line_num, {key: value for key, value in row.items() if value not in ('', None)}, None
+        return
+    for line_number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as error:
+            yield line_number, None, f'invalid JSON: {error}'
+            continue
+        if isinstance(record, dict):
+            yield line_number, record, None
+        else:
+            yield line_number, None, 'JSON object expected'
+
+
+def _coordinate(value: Any, name: str, limit: float) -> Optional[float]:
+    if value is None:
+        return None
+    number = float(value)
+    if not -limit <= number <= limit:
+        raise ValueError(f'{name} out of range')
+    return number
+
+
+def _time(value: Any) -> str:
+    text = str(value or DEFAULT_BIRTH_TIME)
+    return datetime.strptime(text, '%H:%M:%S' if text.count(':') == 2 else '%H:%M').time().isoformat()
+
+
+def validate_profile(record: Dict[str, Any]) -> Dict[str, Any]:
+    name = str(record.get('name') or '').strip()
+    email = str(record.get('email') or '').strip()
+    if not name or len(name) > 100:
+        raise ValueError('name is required (up to 100 characters)')
+    if '@' not in email or len(email) > 255:
+        raise ValueError('valid email is required')
+
+    birth_date = date.fromisoformat(str(record.get('birth_date') or '')).isoformat()
+    birth_time = _time(record.get('birth_time'))
+    birth_city = str(record.get('birth_city') or DEFAULT_BIRTH_CITY).strip()
+    if len(birth_city) > 100:
+        raise ValueError('birth_city is longer than 100 characters')
+
+    if '\x00' in name + email + birth_city:
+        raise ValueError('NUL characters are not allowed')
+
+    latitude = _coordinate(record.get('birth_latitude'), 'birth_latitude', 90)
+    longitude = _coordinate(record.get('birth_longitude'), 'birth_longitude', 180)
+    if (latitude is None) != (longitude is None):
+        raise ValueError('birth_latitude and birth_longitude go together')
+    latitude, longitude, timezone = locate(birth_city, latitude, longitude)
+
+    gender = record.get('gender') or None
+    if gender is not None and gender not in GENDERS:
+        raise ValueError(f'gender must be one of {", ".join(GENDERS)}')
+
+    return {
+        'name': name, 'email': email, 'birth_date': birth_date, 'birth_time': birth_time,
+        'birth_city': birth_city, 'birth_latitude': latitude, 'birth_longitude': longitude,
+        'birth_timezone': timezone, 'gender': gender
+    }
+
+
+def _add_charts(profiles: List[Dict[str, Any]]) -> None:
+    charts = calculate_charts([
+        (p['birth_date'], p['birth_time'], p['birth_latitude'], p['birth_longitude']) for p in profiles
+    ], [utc_offset(p['birth_timezone'], p['birth_date'], p['birth_time']) for p in profiles])
+    signs = calculate_zodiac_signs([p['birth_date'] for p in profiles])
+    for profile, chart, sign in zip(profiles, charts, signs):
+        profile['zodiac_sign'] = sign
+        chart['ascendant'] = chart['ascendant'] or profile['zodiac_sign']
+        profile['chart'] = chart
+
+
+def _user_row(p: Dict[str, Any]) -> tuple:
+    return (p['name'], p['email'], p['birth_date'], p['birth_time'], p['birth_city'], p['birth_latitude'],
+            p['birth_longitude'], p['birth_timezone'], p['zodiac_sign'], p['chart']['moon_sign'],
+            p['chart']['ascendant'], p['gender'], p['birth_latitude'], p['birth_longitude'],
+            geohash(p['birth_latitude'], p['birth_longitude']) if p['birth_latitude'] is not None else None)
+
+
+def _chart_row(user_id: int, p: Dict[str, Any]) -> tuple:
+    chart = p['chart']
+    return (user_id, p['zodiac_sign'], chart['moon_sign'], chart['ascendant'], chart['mercury'], chart['venus'],
+            chart['mars'], chart['jupiter'], chart['saturn'], json.dumps(chart['chart_data']))
+
+
+def _write(cursor, rows: List[Tuple[int, Dict[str, Any]]]) -> Tuple[List[int], List[Dict[str, Any]]]:
+    from psycopg2.extras import execute_values
+
+    returned = execute_values(cursor, INSERT_USERS, [_user_row(p) for _, p in rows],
+                              page_size=len(rows), fetch=True)
+    ids = {row['email']: row['id'] for row in returned}
+    created = [(ids[p['email']], p) for _, p in rows if p['email'] in ids]
+    if created:
+        execute_values(cursor, INSERT_CHARTS, [_chart_row(user_id, p) for user_id, p in created],
+                       page_size=len(created))
+    errors = [{'line': line, 'email': p['email'], 'error': 'email already registered'}
+              for line, p in rows if p['email'] not in ids]
+    return [user_id for user_id, _ in created], errors
+
+
+def _write_chunk(conn, cursor, rows: List[Tuple[int, Dict[str, Any]]]) -> Tuple[List[int], List[Dict[str, Any]]]:
+    from psycopg2 import Error
+
+    try:
+        result = _write(cursor, rows)
+        conn.commit()
+        return result
+    except Error:
+        conn.rollback()
+
+    # Something in the chunk was rejected by the database: retry row by row to isolate it
+    user_ids, errors = [], []
+    for row in rows:
+        cursor.execute('SAVEPOINT bulk_row')
+        try:
+            created, row_errors = _write(cursor, [row])
+            cursor.execute('RELEASE SAVEPOINT bulk_row')
+            user_ids += created
+            errors += row_errors
+        except Error as error:
+            cursor.execute('ROLLBACK TO SAVEPOINT bulk_row')
+            errors.append({'line': row[0], 'email': row[1]['email'], 'error': str(error).strip()})
+    conn.commit()
+    return user_ids, errors
+
+
+def import_profiles(conn, records: Iterable[Record], chunk_size: int = CHUNK_SIZE,
+                    on_chunk=None) -> Dict[str, Any]:
+    '''
+    Imports records chunk by chunk, committing each chunk. Returns counts, the
+    created user ids and per-row errors ({'line', 'email', 'error'}).
+    '''
+    cursor = conn.cursor()
+    seen_emails = set()
+    user_ids: List[int] = []
+    errors: List[Dict[str, Any]] = []
+    processed = 0
+
+    def flush(chunk: List[Tuple[int, Dict[str, Any]]]) -> None:
+        if not chunk:
+            return
+        _add_charts([p for _, p in chunk])
+        created, chunk_errors = _write_chunk(conn, cursor, chunk)
+        user_ids.extend(created)
+        errors.extend(chunk_errors)
+        if on_chunk:
+            on_chunk(processed, len(user_ids), len(errors))
+
+    try:
+        chunk: List[Tuple[int, Dict[str, Any]]] = []
+        for line_number, record, parse_error in records:
+            processed += 1
+            if parse_error:
+                errors.append({'line': line_number, 'email': None, 'error': parse_error})
+                continue
+            try:
+                profile = validate_profile(record)
+            except (TypeError, ValueError) as error:
+                errors.append({'line': line_number, 'email': record.get('email'), 'error': str(error)})
+                continue
+            # Exact match, like the UNIQUE constraint on users.email that decides 'email already registered'
+            if profile['email'] in seen_emails:
+                errors.append({'line': line_number, 'email': profile['email'], 'error': 'duplicate email in input'})
+                continue
+            seen_emails.add(profile['email'])
+            chunk.append((line_number, profile))
+            if len(chunk) >= chunk_size:
+                flush(chunk)
+                chunk = []
+        flush(chunk)
+    finally:
+        cursor.close()
+
+    errors.sort(key=lambda error: error['line'])
+    return {'processed': processed, 'created': len(user_ids), 'failed': len(errors),
+            'user_ids': user_ids, 'errors': errors}
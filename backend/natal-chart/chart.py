@@ -0,0 +1,40 @@
+'''
+Natal chart assembly: Moon, Ascendant and Mercury..Saturn signs plus the
+chart_data JSON with raw longitudes, computed for a batch of births at once
+'''
+
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from ephemeris import ascendant_longitude, julian_day, moon_longitude, sign_of
+from planets import PLANETS, planet_longitudes
+
+Birth = Tuple[Any, Any, Optional[float], Optional[float]]
+
+
+def calculate_charts(births: Sequence[Birth],
+                     utc_offsets: Optional[Sequence[Optional[float]]] = None) -> List[Dict[str, Any]]:
+    '''
+    births: (birth_date, birth_time, latitude, longitude) tuples; utc_offsets,
+    if given, the local UTC offset in hours per birth (None: local mean time).
+    Returns one dict per birth with moon_sign, ascendant (None without
+    coordinates), mercury..saturn signs and chart_data longitudes.
+    '''
+    offsets = utc_offsets or [None] * len(births)
+    jds = [julian_day(birth_date, birth_time, utc_offset=offset, longitude=longitude)
+           for (birth_date, birth_time, _, longitude), offset in zip(births, offsets)]
+    positions = planet_longitudes(jds)
+
+    charts = []
+    for index, (jd, (_, _, latitude, longitude)) in enumerate(zip(jds, births)):
+        bodies = {name: positions[name][index] for name in PLANETS}
+        chart = {name: sign_of(value) for name, value in bodies.items()}
+        bodies['sun'] = positions['sun'][index]
+        bodies['moon'] = moon_longitude(jd)
+        chart['moon_sign'] = sign_of(bodies['moon'])
+        chart['ascendant'] = None
+        if latitude is not None and longitude is not None:
+            bodies['ascendant'] = ascendant_longitude(jd, latitude, longitude)
+            chart['ascendant'] = sign_of(bodies['ascendant'])
+        chart['chart_data'] = {name: round(value, 2) for name, value in bodies.items()}
+        charts.append(chart)
+    return charts
@@ -0,0 +1,147 @@
+'''
+Database access: a module-level connection pool that survives between warm
+invocations of the function, so cheap requests skip the TCP/TLS/auth
+handshake. Connections are health-checked on checkout, recycled after
+DB_POOL_MAX_LIFETIME seconds and capped at DB_POOL_MAX_SIZE per instance;
+when the pool is full a one-off connection is opened and closed on release.
+psycopg2 is imported on the first checkout, so requests that never touch
+the database (preflights, cached sessions) do not pay for it on a cold start.
+Every cursor reports each execute (duration and rows returned) to the trace
+attached to its connection, if any; the runtime attaches one per request.
+'''
+
+import os
+import threading
+import time
+from typing import Any, List
+
+POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX_SIZE', '4'))
+MAX_LIFETIME = float(os.environ.get('DB_POOL_MAX_LIFETIME', '300'))
+IDLE_CHECK_AFTER = float(os.environ.get('DB_POOL_IDLE_CHECK', '30'))
+
+
+# Connection objects are instances of PooledConnection, a psycopg2 connection
+# subclass with created_at, last_used, pooled and trace attributes
+PooledConnection = Any
+
+_psycopg2 = None
+_connection_class = None
+_cursor_class = None
+_idle: List[PooledConnection] = []
+_open_count = 0
+_lock = threading.Lock()
+
+
+def _driver():
+    global _psycopg2, _connection_class, _cursor_class
+    if _psycopg2 is None:
+        import psycopg2
+        import psycopg2.extensions
+        import psycopg2.extras
+
+        class _PooledConnection(psycopg2.extensions.connection):
+            created_at = 0.0
+            last_used = 0.0
+            pooled = False
+            # Anything with record(seconds, rows); set by the runtime for the current request
+            trace = None
+
+        class _TracedCursor(psycopg2.extras.RealDictCursor):
+            def execute(self, query, vars=None):
+                trace = self.connection.trace
+                if trace is None:
+                    return super().execute(query, vars)
+                started = time.perf_counter()
+                try:
+                    return super().execute(query, vars)
+                finally:
+                    trace.record(time.perf_counter() - started,
+                                 self.rowcount if self.description is not None else 0)
+
+        _connection_class = _PooledConnection
+        _cursor_class = _TracedCursor
+        _psycopg2 = psycopg2
+    return _psycopg2
+
+
+def _connect() -> PooledConnection:
+    psycopg2 = _driver()
+    conn = psycopg2.connect(
+        os.environ.get('DATABASE_URL'),
+        connection_factory=_connection_class,
+        cursor_factory=_cursor_class
+    )
+    conn.created_at = conn.last_used = time.monotonic()
+    return conn
+
+
+def _discard(conn: PooledConnection) -> None:
+    global _open_count
+    if conn.pooled:
+        with _lock:
+            _open_count -= 1
+        conn.pooled = False
+    try:
+        conn.close()
+    except _psycopg2.Error:
+        pass
+
+
+def _is_usable(conn: PooledConnection, now: float) -> bool:
+    if conn.closed or now - conn.created_at > MAX_LIFETIME:
+        return False
+    if now - conn.last_used > IDLE_CHECK_AFTER:
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            conn.rollback()
+        except _psycopg2.Error:
+            return False
+    return True
+
+
+def get_db_connection() -> PooledConnection:
+    global _open_count
+    now = time.monotonic()
+    while True:
+        with _lock:
+            conn = _idle.pop() if _idle else None
+        if conn is None:
+            break
+        if _is_usable(conn, now):
+            conn.last_used = now
+            return conn
+        _discard(conn)
+
+    with _lock:
+        pooled = _open_count < POOL_MAX_SIZE
+        if pooled:
+            _open_count += 1
+    try:
+        conn = _connect()
+    except Exception:
+        if pooled:
+            with _lock:
+                _open_count -= 1
+        raise
+    conn.pooled = pooled
+    return conn
+
+
+def release_db_connection(conn: PooledConnection) -> None:
+    if not conn.pooled or conn.closed:
+        _discard(conn)
+        return
+    try:
+        if conn.info.transaction_status != _psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            conn.rollback()
+    except _psycopg2.Error:
+        _discard(conn)
+        return
+    if time.monotonic() - conn.created_at > MAX_LIFETIME:
+        _discard(conn)
+        return
+    conn.last_used = time.monotonic()
+    conn.trace = None
+    with _lock:
+        _idle.append(conn)
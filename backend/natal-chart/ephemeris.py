@@ -0,0 +1,148 @@
+'''
+Moon and Ascendant positions for natal charts.
+Moon longitude is read from a precomputed memory-mapped table (moon_longitude.bin,
+one uint16 sample per day at 00:00 UT for 1920-2030, linearly interpolated),
+the Ascendant is computed from local sidereal time, latitude and obliquity.
+Regenerate the table with: python ephemeris.py
+'''
+
+import math
+import mmap
+import os
+import struct
+from datetime import date, time
+from typing import Optional, Union
+
+from compatibility import SIGNS
+
+TABLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'moon_longitude.bin')
+TABLE_START = date(1920, 1, 1)
+TABLE_END = date(2031, 1, 1)
+TABLE_START_JD = 2422324.5
+TABLE_DAYS = (TABLE_END - TABLE_START).days + 1
+SAMPLE_SCALE = 65536 / 360.0
+J2000 = 2451545.0
+
+_SAMPLE = struct.Struct('<HH')
+_table: Optional[mmap.mmap] = None
+
+# Meeus, Astronomical Algorithms, table 47.A: multiples of D, M, M', F and
+# the longitude coefficient in 1e-6 degrees.
+MOON_LONGITUDE_TERMS = (
+    (0, 0, 1, 0, 6288774), (2, 0, -1, 0, 1274027), (2, 0, 0, 0, 658314),
+    (0, 0, 2, 0, 213618), (0, 1, 0, 0, -185116), (0, 0, 0, 2, -114332),
+    (2, 0, -2, 0, 58793), (2, -1, -1, 0, 57066), (2, 0, 1, 0, 53322),
+    (2, -1, 0, 0, 45758), (0, 1, -1, 0, -40923), (1, 0, 0, 0, -34720),
+    (0, 1, 1, 0, -30383), (2, 0, 0, -2, 15327), (0, 0, 1, 2, -12528),
+    (0, 0, 1, -2, 10980), (4, 0, -1, 0, 10675), (0, 0, 3, 0, 10034),
+    (4, 0, -2, 0, 8548), (2, 1, -1, 0, -7888), (2, 1, 0, 0, -6766),
+    (1, 0, -1, 0, -5163), (1, 1, 0, 0, 4987), (2, -1, 1, 0, 4036),
+    (2, 0, 2, 0, 3994), (4, 0, 0, 0, 3861), (2, 0, -3, 0, 3665),
+    (0, 1, -2, 0, -2689), (2, 0, -1, 2, -2602), (2, -1, -2, 0, 2390),
+    (1, 0, 1, 0, -2348), (2, -2, 0, 0, 2236), (0, 1, 2, 0, -2120),
+    (0, 2, 0, 0, -2069), (2, -2, -1, 0, 2048), (2, 0, 1, -2, -1773),
+    (2, 0, 0, 2, -1595), (4, -1, -1, 0, 1215), (0, 0, 2, 2, -1110),
+    (3, 0, -1, 0, -892), (2, 1, 1, 0, -810), (4, -1, -2, 0, 759),
+    (0, 2, -1, 0, -713), (2, 2, -1, 0, -700), (2, 1, -2, 0, 691),
+    (2, -1, 0, -2, 596), (4, 0, 1, 0, 549), (0, 0, 4, 0, 537),
+    (4, -1, 0, 0, 520), (1, 0, -2, 0, -487), (2, 1, 0, -2, -399),
+    (0, 0, 2, -2, -381), (1, 1, 1, 0, 351), (3, 0, -2, 0, -340),
+    (4, 0, -3, 0, 330), (2, -1, 2, 0, 327), (0, 2, 1, 0, -323),
+    (1, 1, -1, 0, 299), (2, 0, 3, 0, 294),
+)
+
+
+def julian_day(birth_date: Union[str, date], birth_time: Union[str, time, None] = None,
+               utc_offset: Optional[float] = None, longitude: Optional[float] = None) -> float:
+    '''
+    Julian day (UT) of a local birth moment. Without a known UTC offset the
+    local mean time of the birth longitude is used; without either, UT.
+    '''
+    if isinstance(birth_date, str):
+        birth_date = date.fromisoformat(birth_date[:10])
+    if isinstance(birth_time, str):
+        birth_time = time.fromisoformat(birth_time) if birth_time else None
+    hours = 12.0
+    if birth_time is not None:
+        hours = birth_time.hour + birth_time.minute / 60.0 + birth_time.second / 3600.0
+    if utc_offset is not None:
+        hours -= utc_offset
+    elif longitude is not None:
+        hours -= float(longitude) / 15.0
+    return TABLE_START_JD + (birth_date - TABLE_START).days + hours / 24.0
+
+
+def sign_of(longitude: float) -> str:
+    return SIGNS[int(longitude % 360.0 // 30.0)]
+
+
+def compute_moon_longitude(jd: float) -> float:
+    t = (jd - J2000) / 36525.0
+    lp = 218.3164477 + 481267.88123421 * t - 0.0015786 * t * t + t ** 3 / 538841.0 - t ** 4 / 65194000.0
+    d = math.radians(297.8501921 + 445267.1114034 * t - 0.0018819 * t * t + t ** 3 / 545868.0 - t ** 4 / 113065000.0)
+    m = math.radians(357.5291092 + 35999.0502909 * t - 0.0001536 * t * t + t ** 3 / 24490000.0)
+    mp = math.radians(134.9633964 + 477198.8675055 * t + 0.0087414 * t * t + t ** 3 / 69699.0 - t ** 4 / 14712000.0)
+    f = math.radians(93.2720950 + 483202.0175233 * t - 0.0036539 * t * t - t ** 3 / 3526000.0 + t ** 4 / 863310000.0)
+    e = 1.0 - 0.002516 * t - 0.0000074 * t * t
+    eccentricity = (1.0, e, e * e)
+
+    total = 0.0
+    for kd, km, kmp, kf, coefficient in MOON_LONGITUDE_TERMS:
+        total += coefficient * eccentricity[abs(km)] * math.sin(kd * d + km * m + kmp * mp + kf * f)
+    a1 = math.radians(119.75 + 131.849 * t)
+    a2 = math.radians(53.09 + 479264.290 * t)
+    total += 3958 * math.sin(a1) + 1962 * math.sin(math.radians(lp) - f) + 318 * math.sin(a2)
+    return (lp + total / 1e6) % 360.0
+
+
+def _load_table() -> Optional[mmap.mmap]:
+    global _table
+    if _table is None and os.path.exists(TABLE_PATH):
+        with open(TABLE_PATH, 'rb') as table_file:
+            _table = mmap.mmap(table_file.fileno(), 0, access=mmap.ACCESS_READ)
+    return _table
+
+
+def moon_longitude(jd: float) -> float:
+    offset = jd - TABLE_START_JD
+    day = int(offset // 1)
+    table = _load_table()
+    if table is None or day < 0 or day >= TABLE_DAYS - 1:
+        return compute_moon_longitude(jd)
+    first, second = _SAMPLE.unpack_from(table, day * 2)
+    step = (second - first) % 65536
+    return ((first + step * (offset - day)) / SAMPLE_SCALE) % 360.0
+
+
+def moon_sign(jd: float) -> str:
+    return sign_of(moon_longitude(jd))
+
+
+def ascendant_longitude(jd: float, latitude: float, longitude: float) -> float:
+    t = (jd - J2000) / 36525.0
+    sidereal = 280.46061837 + 360.98564736629 * (jd - J2000) + 0.000387933 * t * t - t ** 3 / 38710000.0
+    ramc = math.radians((sidereal + float(longitude)) % 360.0)
+    obliquity = math.radians(23.4392911 - 0.0130042 * t)
+    asc = math.atan2(
+        math.cos(ramc),
+        -(math.sin(ramc) * math.cos(obliquity) + math.tan(math.radians(float(latitude))) * math.sin(obliquity))
+    )
+    return math.degrees(asc) % 360.0
+
+
+def ascendant_sign(jd: float, latitude: Optional[float], longitude: Optional[float]) -> Optional[str]:
+    if latitude is None or longitude is None:
+        return None
+    return sign_of(ascendant_longitude(jd, latitude, longitude))
+
+
+def build_moon_table(path: str = TABLE_PATH) -> None:
+    with open(path, 'wb') as table_file:
+        for day in range(TABLE_DAYS):
+            sample = int(round(compute_moon_longitude(TABLE_START_JD + day) * SAMPLE_SCALE)) % 65536
+            table_file.write(struct.pack('<H', sample))
+
+
+if __name__ == '__main__':
+    build_moon_table()
+    print(f'{TABLE_PATH}: {TABLE_DAYS} daily samples, {TABLE_START} .. {TABLE_END}')
@@ -0,0 +1,282 @@
+'''
+Offline city gazetteer: birth city name -> coordinates and IANA timezone,
+read from the bundled memory-mapped cities.bin (built by build_gazetteer.py
+from GeoNames data, CC BY 4.0). Names in Cyrillic and Latin script are
+matched exactly through a sorted name table (most populous city first),
+then within a typo or two (trigram index candidates, edit distance), then
+by an unambiguous prefix. No network access is involved.
+
+File layout (little-endian): a header with section offsets, then
+  cities      per city: lat, lon (int32, 1e-5 deg), population (uint32),
+              timezone index (uint16), country code (2 bytes)
+  city names  uint32 offsets into the string blob, one per city (+1)
+  names       normalized name keys sorted by (key, -population): uint32
+              key offsets (+1) and uint32 city ids
+  timezones   uint32 offsets into the string blob (+1)
+  trigrams    sorted uint64 trigram codes, uint32 offsets (+1) into
+              postings of delta-varint encoded name ids
+  strings     UTF-8 blob
+'''
+
+import mmap
+import os
+import re
+import struct
+import unicodedata
+from bisect import bisect_left
+from collections import Counter
+from datetime import date, datetime, time
+from typing import Dict, List, NamedTuple, Optional, Tuple, Union
+
+GAZETTEER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cities.bin')
+MAGIC = b'GZT1'
+HEADER = struct.Struct('<4s12I')
+CITY = struct.Struct('<iiIH2s')
+COORDINATE_SCALE = 100000
+PREFIX_SCAN = 64
+# lookup() guesses only from keys at least this long: shorter ones match too many names, and an
+# unresolved city falls back to local mean time instead of a wrong place
+MIN_PREFIX_LENGTH = 4
+# Fuzzy matches allow one typo (insertion, deletion or substitution) per this many characters,
+# so keys shorter than this are never fuzzy-matched
+CHARS_PER_TYPO = 5
+# Fuzzy candidates taken from the trigram index, by shared trigrams, before edit distances are computed
+FUZZY_CANDIDATES = 200
+# A supplied city's timezone is trusted only if the city lies this close (degrees) to the given coordinates
+MAX_TIMEZONE_DISTANCE = 3.0
+# Placeholders written at registration before birth data is known
+PLACEHOLDER_CITIES = ('unknown', 'неизвестно')
+
+_NON_WORD = re.compile(r'[\W_]+')
+# "г. Москва", "город Москва", "Moscow, Russia" -> "москва" / "moscow"
+_CITY_PREFIX = re.compile(r'^(г|гор|город|пос|пгт|с|село|дер|деревня|city of)\s+')
+
+
+class Place(NamedTuple):
+    name: str
+    country: str
+    latitude: float
+    longitude: float
+    timezone: str
+    population: int
+
+
+def normalize(name: str) -> str:
+    decomposed = unicodedata.normalize('NFKD', name)
+    folded = ''.join(char for char in decomposed if not unicodedata.combining(char)).casefold()
+    return ' '.join(_NON_WORD.sub(' ', folded).split())
+
+
+def query_key(name: str) -> str:
+    return _CITY_PREFIX.sub('', normalize(name.split(',')[0]))
+
+
+def trigrams(key: str) -> List[int]:
+    padded = '  ' + key + ' '
+    return sorted({
+        (ord(padded[i]) << 42) | (ord(padded[i + 1]) << 21) | ord(padded[i + 2])
+        for i in range(len(padded) - 2)
+    })
+
+
+def edit_distance(first: str, second: str, limit: int) -> int:
+    '''Levenshtein distance, or limit + 1 as soon as it is known to exceed limit.'''
+    previous = list(range(len(second) + 1))
+    for i, char in enumerate(first, 1):
+        current = [i]
+        for j, other in enumerate(second, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char != other)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+def encode_postings(ids: List[int]) -> bytes:
+    out = bytearray()
+    previous = 0
+    for value in ids:
+        delta = value - previous
+        previous = value
+        while delta >= 0x80:
+            out.append((delta & 0x7F) | 0x80)
+            delta >>= 7
+        out.append(delta)
+    return bytes(out)
+
+
+def decode_postings(data: memoryview) -> List[int]:
+    ids = []
+    value = shift = delta = 0
+    for byte in data:
+        delta |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+        value += delta
+        ids.append(value)
+        delta = shift = 0
+    return ids
+
+
+class Gazetteer:
+    def __init__(self, path: str = GAZETTEER_PATH):
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._map)
+        (magic, self.city_count, self.name_count, self.trigram_count, tz_count, cities, city_names,
+         name_keys, name_cities, timezones, trigram_codes, trigram_offsets, strings) = HEADER.unpack_from(view)
+        if magic != MAGIC:
+            raise ValueError(f'{path} is not a gazetteer file')
+        self._cities = view[cities:cities + CITY.size * self.city_count]
+        self._city_names = view[city_names:city_names + 4 * (self.city_count + 1)].cast('I')
+        self._name_keys = view[name_keys:name_keys + 4 * (self.name_count + 1)].cast('I')
+        self._name_cities = view[name_cities:name_cities + 4 * self.name_count].cast('I')
+        self._trigram_codes = view[trigram_codes:trigram_codes + 8 * self.trigram_count].cast('Q')
+        self._trigram_offsets = view[trigram_offsets:trigram_offsets + 4 * (self.trigram_count + 1)].cast('I')
+        self._postings_start = trigram_offsets + 4 * (self.trigram_count + 1)
+        self._strings = view[strings:]
+        tz_offsets = view[timezones:timezones + 4 * (tz_count + 1)].cast('I')
+        self._timezones = [self._string(tz_offsets[i], tz_offsets[i + 1]) for i in range(tz_count)]
+        self._view = view
+
+    def _string(self, start: int, end: int) -> str:
+        return str(self._strings[start:end], 'utf-8')
+
+    def _key(self, name_id: int) -> str:
+        return self._string(self._name_keys[name_id], self._name_keys[name_id + 1])
+
+    def place(self, city_id: int) -> Place:
+        lat, lon, population, tz_index, country = CITY.unpack_from(self._cities, CITY.size * city_id)
+        return Place(
+            self._string(self._city_names[city_id], self._city_names[city_id + 1]), country.decode(),
+            lat / COORDINATE_SCALE, lon / COORDINATE_SCALE, self._timezones[tz_index], population
+        )
+
+    def _population(self, city_id: int) -> int:
+        return CITY.unpack_from(self._cities, CITY.size * city_id)[2]
+
+    def _lower_bound(self, key: str) -> int:
+        low, high = 0, self.name_count
+        while low < high:
+            middle = (low + high) // 2
+            if self._key(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def search(self, prefix: str, limit: int = 10) -> List[Place]:
+        '''Autocomplete: cities whose name starts with prefix, most populous first.'''
+        key = query_key(prefix)
+        if not key:
+            return []
+        city_ids: Dict[int, int] = {}
+        name_id = self._lower_bound(key)
+        while name_id < self.name_count and len(city_ids) < PREFIX_SCAN and self._key(name_id).startswith(key):
+            city_id = self._name_cities[name_id]
+            city_ids.setdefault(city_id, self._population(city_id))
+            name_id += 1
+        best = sorted(city_ids, key=lambda city_id: -city_ids[city_id])[:limit]
+        return [self.place(city_id) for city_id in best]
+
+    def _fuzzy(self, key: str) -> Optional[int]:
+        '''Most populous city with a name within the typo allowance of key, fewest edits first.'''
+        max_edits = len(key) // CHARS_PER_TYPO
+        if max_edits == 0:
+            return None
+        query = trigrams(key)
+        counts: Counter = Counter()
+        for code in query:
+            index = bisect_left(self._trigram_codes, code)
+            if index < self.trigram_count and self._trigram_codes[index] == code:
+                start = self._postings_start + self._trigram_offsets[index]
+                end = self._postings_start + self._trigram_offsets[index + 1]
+                counts.update(decode_postings(self._view[start:end]))
+        # Each edit changes at most three trigrams
+        min_common = len(query) - 3 * max_edits
+        best, best_rank = None, None
+        for name_id, common in counts.most_common(FUZZY_CANDIDATES):
+            if common < min_common:
+                break
+            name = self._key(name_id)
+            if abs(len(name) - len(key)) > max_edits:
+                continue
+            edits = edit_distance(key, name, max_edits)
+            if edits > max_edits:
+                continue
+            city_id = self._name_cities[name_id]
+            rank = (-edits, self._population(city_id))
+            if best_rank is None or rank > best_rank:
+                best, best_rank = city_id, rank
+        return best
+
+    def lookup(self, name: str) -> Optional[Place]:
+        '''Best match for a free-text city name: exact, then a typo away, then an unambiguous prefix; else None.'''
+        key = query_key(name or '')
+        if not key:
+            return None
+        name_id = self._lower_bound(key)
+        if name_id < self.name_count and self._key(name_id) == key:
+            # Equal keys are stored most populous first
+            return self.place(self._name_cities[name_id])
+        # A typo of a full name ("Самра") beats a longer name it happens to be a prefix of (Samraong)
+        city_id = self._fuzzy(key)
+        if city_id is not None:
+            return self.place(city_id)
+        if len(key) >= MIN_PREFIX_LENGTH:
+            matches = self.search(key, 2)
+            # Only a prefix that names a single city; "Ново" is not a place
+            if len(matches) == 1:
+                return matches[0]
+        return None
+
+
+_gazetteer: Optional[Gazetteer] = None
+
+
+def get_gazetteer() -> Gazetteer:
+    global _gazetteer
+    if _gazetteer is None:
+        _gazetteer = Gazetteer()
+    return _gazetteer
+
+
+def locate(birth_city: Optional[str], latitude: Optional[float],
+           longitude: Optional[float]) -> Tuple[Optional[float], Optional[float], Optional[str]]:
+    '''
+    (latitude, longitude, timezone) for a birth place. Missing coordinates are
+    filled in from birth_city; given coordinates are kept and only pick up the
+    city's timezone when they agree with it. Unresolved parts stay None.
+    '''
+    if not birth_city or query_key(birth_city) in PLACEHOLDER_CITIES:
+        return latitude, longitude, None
+    place = get_gazetteer().lookup(birth_city)
+    if place is None:
+        return latitude, longitude, None
+    if latitude is None or longitude is None:
+        return place.latitude, place.longitude, place.timezone
+    longitude_distance = abs((float(longitude) - place.longitude + 180) % 360 - 180)
+    if abs(float(latitude) - place.latitude) <= MAX_TIMEZONE_DISTANCE and longitude_distance <= MAX_TIMEZONE_DISTANCE:
+        return latitude, longitude, place.timezone
+    return latitude, longitude, None
+
+
+def utc_offset(timezone: Optional[str], birth_date: Union[str, date], birth_time: Union[str, time, None]) -> Optional[float]:
+    '''UTC offset in hours at the local birth moment, from the IANA zone history; None if unknown.'''
+    if not timezone:
+        return None
+    try:
+        from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+    except ImportError:
+        return None
+    if isinstance(birth_date, str):
+        birth_date = date.fromisoformat(birth_date)
+    if isinstance(birth_time, str):
+        birth_time = time.fromisoformat(birth_time)
+    try:
+        zone = ZoneInfo(timezone)
+    except (ZoneInfoNotFoundError, ValueError):
+        return None
+    offset = datetime.combine(birth_date, birth_time or time(12, 0), tzinfo=zone).utcoffset()
+    return offset.total_seconds() / 3600 if offset is not None else None
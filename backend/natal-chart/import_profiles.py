@@ -0,0 +1,52 @@
+'''
+Business: Import partner profiles (users + natal_charts) from an NDJSON or CSV file in chunked transactions
+Args: path to the file ('-' for stdin), --format ndjson|csv (by default from the extension), --chunk-size rows per transaction, --errors file to write per-row errors to as NDJSON
+Returns: Prints progress per chunk and a summary; run as: DATABASE_URL=... python import_profiles.py profiles.ndjson, then backfill_matches.py to build match lists
+'''
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import psycopg2
+from psycopg2.extras import RealDictCursor
+
+from bulk_import import CHUNK_SIZE, FORMATS, import_profiles, read_records
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('path')
+    parser.add_argument('--format', choices=FORMATS)
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    parser.add_argument('--errors')
+    args = parser.parse_args()
+
+    fmt = args.format or ('csv' if args.path.endswith('.csv') else 'ndjson')
+    source = sys.stdin if args.path == '-' else open(args.path, encoding='utf-8', newline='')
+    started = time.monotonic()
+
+    def progress(processed: int, created: int, failed: int) -> None:
+        print(f'processed={processed} created={created} failed={failed} '
+              f'elapsed={time.monotonic() - started:.1f}s', flush=True)
+
+    conn = psycopg2.connect(os.environ.get('DATABASE_URL'), cursor_factory=RealDictCursor)
+    try:
+        summary = import_profiles(conn, read_records(source, fmt), args.chunk_size, on_chunk=progress)
+    finally:
+        conn.close()
+        if source is not sys.stdin:
+            source.close()
+
+    if args.errors:
+        with open(args.errors, 'w', encoding='utf-8') as errors_file:
+            for error in summary['errors']:
+                errors_file.write(json.dumps(error, ensure_ascii=False) + '\n')
+    print(f"done: processed={summary['processed']} created={summary['created']} failed={summary['failed']}")
+    return 0 if not summary['failed'] else 2
+
+
+if __name__ == '__main__':
+    sys.exit(main())
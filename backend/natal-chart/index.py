@@ -5,258 +5,374 @@ Args: event - dict with httpMethod, body (birth data), queryStringParameters
 Returns: HTTP response with natal chart data or compatibility score
 '''
 
-import json
+import hmac
 import os
-from datetime import datetime
-from typing import Dict, Any, Optional
-import psycopg2
-from psycopg2.extras import RealDictCursor
+from typing import Dict, Any, List, Optional
 
-def get_db_connection():
-    database_url = os.environ.get('DATABASE_URL')
-    return psycopg2.connect(database_url, cursor_factory=RealDictCursor)
+from astro_dates import calculate_zodiac_sign
+from bulk_import import FORMATS, import_profiles, read_records
+from chart import calculate_charts
+from compat_cache import get_many, invalidate_user, pair_key, put_many
+from compatibility import SIGN_CODES, encode_signs, score_batch, sign_code
+from gazetteer import locate, utc_offset
+from geo import geohash, parse_location
+from matches import refresh_user_matches
+from runtime import HttpError, Request, Router, encode_json, parse_int
+from synastry import aspect_score, combine_scores, raw_synastry_batch, synastry
 
-def calculate_zodiac_sign(birth_date: str) -> str:
-    date = datetime.strptime(birth_date, '%Y-%m-%d')
-    month = date.month
-    day = date.day
+router = Router('Content-Type, X-User-Id, X-Admin-Secret')
+
+BULK_MAX_BODY_SIZE = int(os.environ.get('BULK_MAX_BODY_SIZE', str(5 * 1024 * 1024)))
+BULK_MAX_PROFILES = 5000
+# Bulk import is an admin action: callers send this in X-Admin-Secret; unset disables it
+BULK_IMPORT_SECRET = os.environ.get('BULK_IMPORT_SECRET', '')
+# Match lists refreshed inline per import (~50 ms each); the rest are left to backfill_matches.py
+BULK_MATCH_REFRESH_MAX = int(os.environ.get('BULK_MATCH_REFRESH_MAX', '200'))
+COMPATIBILITY_BATCH_MAX = 500
+
+def calculate_natal_chart(birth_date: str, birth_time: Optional[str], latitude: Optional[float],
+                          longitude: Optional[float], timezone: Optional[str] = None) -> Dict[str, Any]:
+    offset = utc_offset(timezone, birth_date, birth_time)
+    chart = calculate_charts([(birth_date, birth_time, latitude, longitude)], [offset])[0]
+    chart['zodiac_sign'] = calculate_zodiac_sign(birth_date)
+    chart['ascendant'] = chart['ascendant'] or chart['zodiac_sign']
+    return chart
+
+@router.action('create_profile')
+def create_profile(request: Request) -> Dict[str, Any]:
+    body_data = request.body
+    name = body_data.get('name')
+    email = body_data.get('email')
+    birth_date = body_data.get('birth_date')
+    birth_time = body_data.get('birth_time')
+    birth_city = body_data.get('birth_city')
+    birth_latitude, birth_longitude, birth_timezone = locate(
+        birth_city, body_data.get('birth_latitude'), body_data.get('birth_longitude')
+    )
+    try:
+        location = parse_location(body_data.get('latitude'), body_data.get('longitude'))
+    except ValueError as error:
+        raise HttpError(400, str(error))
+    # Until the app reports where the user is, search places them at their birth place
+    if location is None and birth_latitude is not None:
+        location = (birth_latitude, birth_longitude)
+    latitude, longitude = location or (None, None)
+    
+    chart = calculate_natal_chart(birth_date, birth_time, birth_latitude, birth_longitude, birth_timezone)
+    zodiac_sign = chart['zodiac_sign']
+    moon_sign = chart['moon_sign']
+    ascendant_sign = chart['ascendant']
     
-    zodiac_signs = [
-        ('Козерог', 1, 1, 1, 19), ('Водолей', 1, 20, 2, 18),
-        ('Рыбы', 2, 19, 3, 20), ('Овен', 3, 21, 4, 19),
-        ('Телец', 4, 20, 5, 20), ('Близнецы', 5, 21, 6, 20),
-        ('Рак', 6, 21, 7, 22), ('Лев', 7, 23, 8, 22),
-        ('Дева', 8, 23, 9, 22), ('Весы', 9, 23, 10, 22),
-        ('Скорпион', 10, 23, 11, 21), ('Стрелец', 11, 22, 12, 21),
-        ('Козерог', 12, 22, 12, 31)
-    ]
+    cursor = request.cursor
+    cursor.execute(
+        "INSERT INTO users (name, email, birth_date, birth_time, birth_city, birth_latitude, birth_longitude, "
+        "birth_timezone, zodiac_sign, moon_sign, ascendant_sign, latitude, longitude, geo_cell) "
+        "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s) RETURNING id",
+        (name, email, birth_date, birth_time, birth_city, birth_latitude, birth_longitude, birth_timezone,
+         zodiac_sign, moon_sign, ascendant_sign, latitude, longitude,
+         geohash(latitude, longitude) if location else None)
+    )
+    user_id = cursor.fetchone()['id']
     
-    for sign, start_month, start_day, end_month, end_day in zodiac_signs:
-        if (month == start_month and day >= start_day) or (month == end_month and day <= end_day):
-            return sign
-    return 'Козерог'
+    cursor.execute(
+        "INSERT INTO natal_charts (user_id, sun_sign, moon_sign, ascendant, mercury, venus, mars, jupiter, "
+        "saturn, chart_data) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)",
+        (user_id, zodiac_sign, moon_sign, ascendant_sign, chart['mercury'], chart['venus'],
+         chart['mars'], chart['jupiter'], chart['saturn'], encode_json(chart['chart_data']))
+    )
+    refresh_user_matches(cursor, user_id, zodiac_sign, chart['chart_data'])
+    
+    request.conn.commit()
+    
+    return {
+        'user_id': user_id,
+        'zodiac_sign': zodiac_sign,
+        'moon_sign': moon_sign,
+        'ascendant': ascendant_sign,
+        'birth_latitude': birth_latitude,
+        'birth_longitude': birth_longitude,
+        'birth_timezone': birth_timezone
+    }
 
-def calculate_compatibility(sign1: str, sign2: str) -> int:
-    compatibility_matrix = {
-        'Овен': {'Овен': 75, 'Телец': 65, 'Близнецы': 85, 'Рак': 60, 'Лев': 90, 'Дева': 70, 
-                 'Весы': 80, 'Скорпион': 65, 'Стрелец': 95, 'Козерог': 60, 'Водолей': 85, 'Рыбы': 70},
-        'Телец': {'Овен': 65, 'Телец': 80, 'Близнецы': 70, 'Рак': 90, 'Лев': 75, 'Дева': 95, 
-                  'Весы': 85, 'Скорпион': 88, 'Стрелец': 65, 'Козерог': 92, 'Водолей': 70, 'Рыбы': 85},
-        'Близнецы': {'Овен': 85, 'Телец': 70, 'Близнецы': 82, 'Рак': 68, 'Лев': 88, 'Дева': 78, 
-                     'Весы': 94, 'Скорпион': 72, 'Стрелец': 90, 'Козерог': 65, 'Водолей': 92, 'Рыбы': 75},
-        'Рак': {'Овен': 60, 'Телец': 90, 'Близнецы': 68, 'Рак': 85, 'Лев': 70, 'Дева': 88, 
-                'Весы': 75, 'Скорпион': 94, 'Стрелец': 62, 'Козерог': 85, 'Водолей': 68, 'Рыбы': 95},
-        'Лев': {'Овен': 90, 'Телец': 75, 'Близнецы': 88, 'Рак': 70, 'Лев': 82, 'Дева': 72, 
-                'Весы': 85, 'Скорпион': 75, 'Стрелец': 93, 'Козерог': 68, 'Водолей': 88, 'Рыбы': 73},
-        'Дева': {'Овен': 70, 'Телец': 95, 'Близнецы': 78, 'Рак': 88, 'Лев': 72, 'Дева': 85, 
-                 'Весы': 80, 'Скорпион': 90, 'Стрелец': 68, 'Козерог': 94, 'Водолей': 75, 'Рыбы': 82},
-        'Весы': {'Овен': 80, 'Телец': 85, 'Близнецы': 94, 'Рак': 75, 'Лев': 85, 'Дева': 80, 
-                 'Весы': 83, 'Скорпион': 78, 'Стрелец': 88, 'Козерог': 72, 'Водолей': 95, 'Рыбы': 78},
-        'Скорпион': {'Овен': 65, 'Телец': 88, 'Близнецы': 72, 'Рак': 94, 'Лев': 75, 'Дева': 90, 
-                     'Весы': 78, 'Скорпион': 86, 'Стрелец': 70, 'Козерог': 92, 'Водолей': 73, 'Рыбы': 93},
-        'Стрелец': {'Овен': 95, 'Телец': 65, 'Близнецы': 90, 'Рак': 62, 'Лев': 93, 'Дева': 68, 
-                    'Весы': 88, 'Скорпион': 70, 'Стрелец': 84, 'Козерог': 67, 'Водолей': 91, 'Рыбы': 72},
-        'Козерог': {'Овен': 60, 'Телец': 92, 'Близнецы': 65, 'Рак': 85, 'Лев': 68, 'Дева': 94, 
-                    'Весы': 72, 'Скорпион': 92, 'Стрелец': 67, 'Козерог': 87, 'Водолей': 70, 'Рыбы': 83},
-        'Водолей': {'Овен': 85, 'Телец': 70, 'Близнецы': 92, 'Рак': 68, 'Лев': 88, 'Дева': 75, 
-                    'Весы': 95, 'Скорпион': 73, 'Стрелец': 91, 'Козерог': 70, 'Водолей': 84, 'Рыбы': 77},
-        'Рыбы': {'Овен': 70, 'Телец': 85, 'Близнецы': 75, 'Рак': 95, 'Лев': 73, 'Дева': 82, 
-                 'Весы': 78, 'Скорпион': 93, 'Стрелец': 72, 'Козерог': 83, 'Водолей': 77, 'Рыбы': 88}
+@router.action('update_birth_data')
+def update_birth_data(request: Request) -> Dict[str, Any]:
+    body_data = request.body
+    user_id = body_data.get('user_id')
+    birth_date = body_data.get('birth_date')
+    birth_time = body_data.get('birth_time')
+    birth_city = body_data.get('birth_city')
+    gender = body_data.get('gender')
+    birth_latitude, birth_longitude, birth_timezone = locate(
+        birth_city, body_data.get('birth_latitude'), body_data.get('birth_longitude')
+    )
+    
+    chart = calculate_natal_chart(birth_date, birth_time, birth_latitude, birth_longitude, birth_timezone)
+    zodiac_sign = chart['zodiac_sign']
+    
+    cursor = request.cursor
+    cursor.execute(
+        "UPDATE users SET birth_date = %s, birth_time = %s, birth_city = %s, birth_latitude = %s, "
+        "birth_longitude = %s, birth_timezone = %s, zodiac_sign = %s, moon_sign = %s, ascendant_sign = %s, "
+        "gender = %s WHERE id = %s",
+        (birth_date, birth_time, birth_city, birth_latitude, birth_longitude, birth_timezone,
+         zodiac_sign, chart['moon_sign'], chart['ascendant'], gender, user_id)
+    )
+    
+    cursor.execute(
+        "INSERT INTO natal_charts (user_id, sun_sign, moon_sign, ascendant, mercury, venus, mars, jupiter, "
+        "saturn, chart_data) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s) "
+        "ON CONFLICT (user_id) DO UPDATE SET sun_sign = EXCLUDED.sun_sign, moon_sign = EXCLUDED.moon_sign, "
+        "ascendant = EXCLUDED.ascendant, mercury = EXCLUDED.mercury, venus = EXCLUDED.venus, "
+        "mars = EXCLUDED.mars, jupiter = EXCLUDED.jupiter, saturn = EXCLUDED.saturn, "
+        "chart_data = EXCLUDED.chart_data",
+        (user_id, zodiac_sign, chart['moon_sign'], chart['ascendant'], chart['mercury'], chart['venus'],
+         chart['mars'], chart['jupiter'], chart['saturn'], encode_json(chart['chart_data']))
+    )
+    refresh_user_matches(cursor, user_id, zodiac_sign, chart['chart_data'])
+    invalidate_user(cursor, user_id)
+    
+    request.conn.commit()
+    
+    return {
+        'success': True,
+        'zodiac_sign': zodiac_sign,
+        'moon_sign': chart['moon_sign'],
+        'ascendant': chart['ascendant'],
+        'birth_latitude': birth_latitude,
+        'birth_longitude': birth_longitude,
+        'birth_timezone': birth_timezone
     }
+
+@router.action('update_location')
+def update_location(request: Request) -> Dict[str, Any]:
+    user_id = request.body.get('user_id')
+    try:
+        location = parse_location(request.body.get('latitude'), request.body.get('longitude'))
+    except ValueError as error:
+        raise HttpError(400, str(error))
+    
+    if not user_id or location is None:
+        raise HttpError(400, 'user_id, latitude and longitude required')
     
-    return compatibility_matrix.get(sign1, {}).get(sign2, 70)
+    latitude, longitude = location
+    geo_cell = geohash(latitude, longitude)
+    request.cursor.execute(
+        "UPDATE users SET latitude = %s, longitude = %s, geo_cell = %s WHERE id = %s",
+        (latitude, longitude, geo_cell, user_id)
+    )
+    if request.cursor.rowcount == 0:
+        raise HttpError(404, 'User not found')
+    request.conn.commit()
+    
+    return {'success': True, 'geo_cell': geo_cell}
 
-def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
-    method: str = event.get('httpMethod', 'GET')
+def refresh_imported_matches(request: Request, user_ids: List[int]) -> int:
+    '''Builds match lists for the first BULK_MATCH_REFRESH_MAX imported users, one transaction each.'''
+    if not user_ids or BULK_MATCH_REFRESH_MAX <= 0:
+        return 0
+    cursor = request.cursor
+    cursor.execute(
+        "SELECT u.id, u.zodiac_sign, nc.chart_data FROM users u LEFT JOIN natal_charts nc ON nc.user_id = u.id "
+        "WHERE u.id = ANY(%s) ORDER BY u.id LIMIT %s",
+        (user_ids, BULK_MATCH_REFRESH_MAX)
+    )
+    refreshed = 0
+    for user in cursor.fetchall():
+        if user['zodiac_sign'] in SIGN_CODES:
+            refresh_user_matches(cursor, user['id'], user['zodiac_sign'], user['chart_data'])
+            request.conn.commit()
+            refreshed += 1
+    return refreshed
+
+# A chunk is two multi-row inserts, or one insert per row when the database rejects something in it;
+# each inline match list refresh is up to five more
+@router.action('bulk_create_profiles', max_body_size=BULK_MAX_BODY_SIZE, budget_ms=45000,
+               budget_queries=3 * BULK_MAX_PROFILES + 5 * BULK_MATCH_REFRESH_MAX + 1)
+def bulk_create_profiles(request: Request) -> Dict[str, Any]:
+    secret = request.header('X-Admin-Secret') or ''
+    if not BULK_IMPORT_SECRET or not hmac.compare_digest(secret.encode(), BULK_IMPORT_SECRET.encode()):
+        raise HttpError(403, 'Admin secret required')
     
-    if method == 'OPTIONS':
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type, X-User-Id',
-                'Access-Control-Max-Age': '86400'
-            },
-            'body': '',
-            'isBase64Encoded': False
-        }
+    profiles = request.body.get('profiles')
+    if profiles is not None:
+        if not isinstance(profiles, list):
+            raise HttpError(400, 'profiles must be a list')
+        records = [
+            (number, profile, None) if isinstance(profile, dict) else (number, None, 'JSON object expected')
+            for number, profile in enumerate(profiles, 1)
+        ]
+    else:
+        data = request.body.get('data') or ''
+        fmt = request.body.get('format', 'ndjson')
+        if not isinstance(data, str):
+            raise HttpError(400, 'data must be a string')
+        if fmt not in FORMATS:
+            raise HttpError(400, f'format must be one of: {", ".join(FORMATS)}')
+        records = list(read_records(data.splitlines(), fmt))
     
-    if method == 'POST':
-        body_data = json.loads(event.get('body', '{}'))
-        action = body_data.get('action')
-        
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        try:
-            if action == 'create_profile':
-                name = body_data.get('name')
-                email = body_data.get('email')
-                birth_date = body_data.get('birth_date')
-                birth_time = body_data.get('birth_time')
-                birth_city = body_data.get('birth_city')
-                
-                zodiac_sign = calculate_zodiac_sign(birth_date)
-                moon_sign = calculate_zodiac_sign(birth_date)
-                ascendant_sign = calculate_zodiac_sign(birth_date)
-                
-                cursor.execute(
-                    "INSERT INTO users (name, email, birth_date, birth_time, birth_city, zodiac_sign, moon_sign, ascendant_sign) "
-                    "VALUES (%s, %s, %s, %s, %s, %s, %s, %s) RETURNING id",
-                    (name, email, birth_date, birth_time, birth_city, zodiac_sign, moon_sign, ascendant_sign)
-                )
-                user_id = cursor.fetchone()['id']
-                
-                cursor.execute(
-                    "INSERT INTO natal_charts (user_id, sun_sign, moon_sign, ascendant) VALUES (%s, %s, %s, %s)",
-                    (user_id, zodiac_sign, moon_sign, ascendant_sign)
-                )
-                
-                conn.commit()
-                
-                return {
-                    'statusCode': 200,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'isBase64Encoded': False,
-                    'body': json.dumps({
-                        'user_id': user_id,
-                        'zodiac_sign': zodiac_sign,
-                        'moon_sign': moon_sign,
-                        'ascendant': ascendant_sign
-                    })
-                }
-            
-            elif action == 'update_birth_data':
-                user_id = body_data.get('user_id')
-                birth_date = body_data.get('birth_date')
-                birth_time = body_data.get('birth_time')
-                birth_city = body_data.get('birth_city')
-                gender = body_data.get('gender')
-                
-                zodiac_sign = calculate_zodiac_sign(birth_date)
-                
-                cursor.execute(
-                    "UPDATE users SET birth_date = %s, birth_time = %s, birth_city = %s, zodiac_sign = %s, gender = %s "
-                    "WHERE id = %s",
-                    (birth_date, birth_time, birth_city, zodiac_sign, gender, user_id)
-                )
-                
-                cursor.execute(
-                    "INSERT INTO natal_charts (user_id, sun_sign, moon_sign, ascendant) "
-                    "VALUES (%s, %s, %s, %s) "
-                    "ON CONFLICT DO NOTHING",
-                    (user_id, zodiac_sign, zodiac_sign, zodiac_sign)
-                )
-                
-                conn.commit()
-                
-                return {
-                    'statusCode': 200,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'isBase64Encoded': False,
-                    'body': json.dumps({
-                        'success': True,
-                        'zodiac_sign': zodiac_sign
-                    })
-                }
-            
-            elif action == 'calculate_compatibility':
-                user1_id = body_data.get('user1_id')
-                user2_id = body_data.get('user2_id')
-                
-                cursor.execute("SELECT zodiac_sign FROM users WHERE id = %s", (user1_id,))
-                user1 = cursor.fetchone()
-                cursor.execute("SELECT zodiac_sign FROM users WHERE id = %s", (user2_id,))
-                user2 = cursor.fetchone()
-                
-                if not user1 or not user2:
-                    return {
-                        'statusCode': 404,
-                        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                        'isBase64Encoded': False,
-                        'body': json.dumps({'error': 'User not found'})
-                    }
-                
-                compatibility_score = calculate_compatibility(user1['zodiac_sign'], user2['zodiac_sign'])
-                
-                cursor.execute(
-                    "INSERT INTO compatibility_cache (user1_id, user2_id, compatibility_score) "
-                    "VALUES (%s, %s, %s) ON CONFLICT (user1_id, user2_id) DO UPDATE SET compatibility_score = %s",
-                    (user1_id, user2_id, compatibility_score, compatibility_score)
-                )
-                conn.commit()
-                
-                return {
-                    'statusCode': 200,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'isBase64Encoded': False,
-                    'body': json.dumps({
-                        'compatibility_score': compatibility_score,
-                        'user1_sign': user1['zodiac_sign'],
-                        'user2_sign': user2['zodiac_sign']
-                    })
-                }
-        
-        finally:
-            cursor.close()
-            conn.close()
+    if len(records) > BULK_MAX_PROFILES:
+        raise HttpError(413, f'At most {BULK_MAX_PROFILES} profiles per request, use import_profiles.py for more')
+    
+    summary = import_profiles(request.conn, records)
+    # Users past the inline limit have no match list yet; backfill_matches.py picks exactly those up
+    summary['matches_refreshed'] = refresh_imported_matches(request, summary['user_ids'])
+    summary['matches_pending'] = summary['created'] - summary['matches_refreshed']
+    return summary
+
+def cached_details(result: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    # Rows from before compatibility_details was filled in have NULL details: treated as a cache miss
+    return (result or {}).get('details') or {}
+
+@router.action('calculate_compatibility')
+def compatibility(request: Request) -> Dict[str, Any]:
+    user1_id = request.body.get('user1_id')
+    user2_id = request.body.get('user2_id')
+    if not user1_id or not user2_id:
+        raise HttpError(400, 'user1_id and user2_id required')
+    user1_id, user2_id = parse_int(user1_id, 'user1_id', 1), parse_int(user2_id, 'user2_id', 1)
+    key = pair_key(user1_id, user2_id)
     
-    if method == 'GET':
-        params = event.get('queryStringParameters', {})
-        user_id = params.get('user_id')
+    cached = get_many(request, [key]).get(key)
+    details = cached_details(cached)
+    # Rows written before symmetric keys carry no signs and batch rows no aspects; recompute those once
+    if 'aspects' not in details or 'signs' not in details:
+        cursor = request.cursor
+        cursor.execute(
+            "SELECT u.id, u.zodiac_sign, nc.chart_data FROM users u "
+            "LEFT JOIN natal_charts nc ON u.id = nc.user_id WHERE u.id = ANY(%s)",
+            (list(key),)
+        )
+        users = {row['id']: row for row in cursor.fetchall()}
         
-        if not user_id:
-            return {
-                'statusCode': 400,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'isBase64Encoded': False,
-                'body': json.dumps({'error': 'user_id required'})
-            }
+        if key[0] not in users or key[1] not in users:
+            raise HttpError(404, 'User not found')
         
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        first, second = users[key[0]], users[key[1]]
+        result = synastry(first['zodiac_sign'], second['zodiac_sign'], first['chart_data'], second['chart_data'])
+        cached = {
+            'score': result['score'],
+            'details': {
+                'signs': [first['zodiac_sign'], second['zodiac_sign']],
+                'sign_score': result['sign_score'],
+                'aspect_score': result['aspect_score'],
+                'aspects': result['aspects']
+            }
+        }
+        put_many(cursor, {key: cached})
+        request.conn.commit()
+    
+    # Results are stored in key order; present them in the order they were asked for
+    details = cached['details']
+    user1_sign, user2_sign = details['signs']
+    aspects = details['aspects']
+    if key[0] != user1_id:
+        user1_sign, user2_sign = user2_sign, user1_sign
+        aspects = [{**aspect, 'body1': aspect['body2'], 'body2': aspect['body1']} for aspect in aspects]
+    
+    return {
+        'compatibility_score': cached['score'],
+        'user1_sign': user1_sign,
+        'user2_sign': user2_sign,
+        'sign_score': details['sign_score'],
+        'aspect_score': details['aspect_score'],
+        'aspects': aspects
+    }
+
+# Scores only: aspect lists are left to calculate_compatibility, which fills them in on first request
+@router.action('calculate_compatibility_batch')
+def compatibility_batch(request: Request) -> Dict[str, Any]:
+    user_id = request.body.get('user_id')
+    partner_ids = request.body.get('partner_ids')
+    if not user_id or not isinstance(partner_ids, list):
+        raise HttpError(400, 'user_id and partner_ids required')
+    if len(partner_ids) > COMPATIBILITY_BATCH_MAX:
+        raise HttpError(400, f'At most {COMPATIBILITY_BATCH_MAX} partner_ids per request')
+    user_id = parse_int(user_id, 'user_id', 1)
+    partner_ids = [parse_int(partner_id, 'partner_ids', 1) for partner_id in partner_ids]
+    partner_ids = [partner_id for partner_id in dict.fromkeys(partner_ids) if partner_id != user_id]
+    
+    cached = get_many(request, [(user_id, partner_id) for partner_id in partner_ids]) if partner_ids else {}
+    missing = [partner_id for partner_id in partner_ids
+               if 'signs' not in cached_details(cached.get(pair_key(user_id, partner_id)))]
+    
+    if missing:
+        cursor = request.cursor
+        cursor.execute(
+            "SELECT u.id, u.zodiac_sign, nc.chart_data FROM users u "
+            "LEFT JOIN natal_charts nc ON u.id = nc.user_id WHERE u.id = ANY(%s)",
+            ([user_id] + missing,)
+        )
+        users = {row['id']: row for row in cursor.fetchall()}
+        user = users.get(user_id)
+        if user is None:
+            raise HttpError(404, 'User not found')
         
-        try:
-            cursor.execute(
-                "SELECT u.*, nc.sun_sign, nc.moon_sign, nc.ascendant "
-                "FROM users u LEFT JOIN natal_charts nc ON u.id = nc.user_id WHERE u.id = %s",
-                (user_id,)
-            )
-            user = cursor.fetchone()
-            
-            if not user:
-                return {
-                    'statusCode': 404,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'isBase64Encoded': False,
-                    'body': json.dumps({'error': 'User not found'})
+        partners = [users[partner_id] for partner_id in missing if partner_id in users]
+        chart = user['chart_data']
+        raws = raw_synastry_batch(chart, [partner['chart_data'] for partner in partners]) if chart else []
+        sign_scores = score_batch(sign_code(user['zodiac_sign']),
+                                  encode_signs(partner['zodiac_sign'] for partner in partners))
+        computed = {}
+        for index, partner in enumerate(partners):
+            raw = raws[index] if raws else None
+            sign_score = sign_scores[index]
+            key = pair_key(user_id, partner['id'])
+            signs = [user['zodiac_sign'], partner['zodiac_sign']]
+            computed[key] = {
+                'score': combine_scores(sign_score, raw),
+                'details': {
+                    'signs': signs if key[0] == user_id else signs[::-1],
+                    'sign_score': sign_score,
+                    'aspect_score': round(aspect_score(raw), 1) if raw is not None else None
                 }
-            
-            user_data = dict(user)
-            if 'birth_date' in user_data and user_data['birth_date']:
-                user_data['birth_date'] = str(user_data['birth_date'])
-            if 'birth_time' in user_data and user_data['birth_time']:
-                user_data['birth_time'] = str(user_data['birth_time'])
-            if 'created_at' in user_data and user_data['created_at']:
-                user_data['created_at'] = str(user_data['created_at'])
-            if 'updated_at' in user_data and user_data['updated_at']:
-                user_data['updated_at'] = str(user_data['updated_at'])
-            
-            return {
-                'statusCode': 200,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'isBase64Encoded': False,
-                'body': json.dumps(user_data)
             }
-        
-        finally:
-            cursor.close()
-            conn.close()
+        put_many(cursor, computed)
+        request.conn.commit()
+        cached.update(computed)
     
-    return {
-        'statusCode': 405,
-        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-        'isBase64Encoded': False,
-        'body': json.dumps({'error': 'Method not allowed'})
-    }
\ No newline at end of file
+    results = []
+    not_found = []
+    for partner_id in partner_ids:
+        key = pair_key(user_id, partner_id)
+        result = cached.get(key)
+        details = cached_details(result)
+        if 'signs' not in details:
+            not_found.append(partner_id)
+            continue
+        results.append({
+            'user_id': partner_id,
+            'compatibility_score': result['score'],
+            'partner_sign': details['signs'][1] if key[0] == user_id else details['signs'][0],
+            'sign_score': details['sign_score'],
+            'aspect_score': details['aspect_score']
+        })
+    
+    return {'results': results, 'not_found': not_found}
+
+@router.get()
+def get_profile(request: Request) -> Dict[str, Any]:
+    user_id = request.params.get('user_id')
+    
+    if not user_id:
+        raise HttpError(400, 'user_id required')
+    
+    cursor = request.cursor
+    # Columns listed so the current location (latitude, longitude, geo_cell) stays private
+    cursor.execute(
+        "SELECT u.id, u.name, u.email, u.birth_date, u.birth_time, u.birth_city, u.birth_latitude, "
+        "u.birth_longitude, u.birth_timezone, u.gender, u.zodiac_sign, u.moon_sign, u.ascendant_sign, "
+        "u.created_at, u.updated_at, nc.sun_sign, nc.moon_sign, nc.ascendant, nc.mercury, nc.venus, nc.mars, "
+        "nc.jupiter, nc.saturn, nc.chart_data "
+        "FROM users u LEFT JOIN natal_charts nc ON u.id = nc.user_id WHERE u.id = %s",
+        (user_id,)
+    )
+    user = cursor.fetchone()
+    
+    if not user:
+        raise HttpError(404, 'User not found')
+    
+    # Dates, times and coordinates (Decimal) are serialized by the runtime encoder
+    return user
+
+def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    return router.handle(event, context)
@@ -0,0 +1,93 @@
+'''
+Materialized match lists (user_matches): the top MATCH_LIST_SIZE candidates
+per user by synastry score. A user's list is refreshed incrementally when
+the user is created or their birth data changes: only that user's
+candidate pool is scored, the user's entries in the pool members' lists
+are rescored and it is offered to the lists it now beats, instead of
+recomputing every list. Lists outside the pool are left as they are.
+'''
+
+from typing import Any, Dict, List, Optional
+
+from synastry import synastry_batch
+
+MATCH_LIST_SIZE = 100
+CANDIDATE_POOL_SIZE = 1000
+
+# Best sign-compatible users first, newest first within a sign; charts are joined
+# after the LIMIT so only the pool itself is read from natal_charts
+POOL_QUERY = (
+    "SELECT pool.id, pool.zodiac_sign, nc.chart_data FROM ("
+    "SELECT u.id, u.zodiac_sign, sc.score FROM sign_compatibility sc "
+    "CROSS JOIN LATERAL ("
+    "SELECT u.id, u.zodiac_sign FROM users u "
+    "WHERE u.zodiac_sign = sc.sign2 AND u.id != %(user_id)s "
+    "ORDER BY u.id DESC LIMIT %(pool_size)s"
+    ") u "
+    "WHERE sc.sign1 = %(sign)s "
+    "ORDER BY sc.score DESC, u.id DESC LIMIT %(pool_size)s"
+    ") pool "
+    "LEFT JOIN natal_charts nc ON nc.user_id = pool.id"
+)
+
+# Lists in the pool that already hold the refreshed user take its new score
+UPDATE_REVERSE_QUERY = (
+    "UPDATE user_matches um SET score = v.score, updated_at = CURRENT_TIMESTAMP "
+    "FROM (VALUES %s) AS v(user_id, candidate_id, score) "
+    "WHERE um.user_id = v.user_id AND um.candidate_id = v.candidate_id"
+)
+
+# Offer the refreshed user to existing lists where it beats the current last entry
+OFFER_QUERY = (
+    "INSERT INTO user_matches (user_id, candidate_id, score) "
+    "SELECT v.user_id, v.candidate_id, v.score FROM (VALUES %s) AS v(user_id, candidate_id, score) "
+    "WHERE EXISTS (SELECT 1 FROM user_matches um WHERE um.user_id = v.user_id) "
+    "AND v.score >= COALESCE(("
+    "SELECT um.score FROM user_matches um WHERE um.user_id = v.user_id "
+    "ORDER BY um.score DESC, um.candidate_id OFFSET {last} LIMIT 1"
+    "), 0) "
+    "ON CONFLICT (user_id, candidate_id) DO UPDATE SET score = EXCLUDED.score, updated_at = CURRENT_TIMESTAMP "
+    "RETURNING user_id"
+).format(last=MATCH_LIST_SIZE - 1)
+
+TRIM_QUERY = (
+    "DELETE FROM user_matches um USING ("
+    "SELECT user_id, candidate_id, "
+    "ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY score DESC, candidate_id) AS position "
+    "FROM user_matches WHERE user_id = ANY(%s)"
+    ") ranked "
+    "WHERE um.user_id = ranked.user_id AND um.candidate_id = ranked.candidate_id "
+    "AND ranked.position > %s"
+)
+
+
+def refresh_user_matches(cursor, user_id: int, sign: str, chart_data: Optional[Dict[str, Any]]) -> int:
+    '''
+    Rebuilds user_id's own list, rescores it in the pool members' lists and
+    offers it to those it now beats.
+    Runs inside the caller's transaction; returns the new list length.
+    '''
+    from psycopg2.extras import execute_values
+
+    cursor.execute(POOL_QUERY, {'user_id': user_id, 'sign': sign, 'pool_size': CANDIDATE_POOL_SIZE})
+    pool = cursor.fetchall()
+    scores = synastry_batch(
+        sign, chart_data, [row['zodiac_sign'] for row in pool], [row['chart_data'] for row in pool]
+    )
+    scored = sorted(zip(scores, (row['id'] for row in pool)), key=lambda item: (-item[0], item[1]))
+
+    # Only the user's own list is rebuilt: lists of users outside the pool keep their entry for this user
+    cursor.execute("DELETE FROM user_matches WHERE user_id = %s", (user_id,))
+    own_list = [(user_id, candidate_id, score) for score, candidate_id in scored[:MATCH_LIST_SIZE]]
+    if own_list:
+        execute_values(cursor, "INSERT INTO user_matches (user_id, candidate_id, score) VALUES %s", own_list)
+
+    offers = [(candidate_id, user_id, score) for score, candidate_id in scored]
+    if offers:
+        execute_values(cursor, UPDATE_REVERSE_QUERY, offers, page_size=len(offers))
+        offered_to: List[int] = [row['user_id'] for row in execute_values(
+            cursor, OFFER_QUERY, offers, page_size=len(offers), fetch=True
+        )]
+        if offered_to:
+            cursor.execute(TRIM_QUERY, (offered_to, MATCH_LIST_SIZE))
+    return len(own_list)
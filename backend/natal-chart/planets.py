@@ -0,0 +1,82 @@
+'''
+Geocentric ecliptic longitudes of the Sun and Mercury..Saturn from Keplerian
+elements (JPL approximate elements, valid 1800-2050, accuracy well under a
+degree). Positions are computed for a whole batch of Julian days at once:
+Earth's orbit is solved once per date and shared by every planet.
+'''
+
+import math
+from typing import Dict, List, Sequence, Tuple
+
+J2000 = 2451545.0
+PRECESSION_PER_CENTURY = 1.396971
+
+# a (au), e, I, L, long. perihelion, long. node (degrees) and their rates per century
+ELEMENTS = {
+    'mercury': ((0.38709927, 0.20563593, 7.00497902, 252.25032350, 77.45779628, 48.33076593),
+                (0.00000037, 0.00001906, -0.00594749, 149472.67411175, 0.16047689, -0.12534081)),
+    'venus': ((0.72333566, 0.00677672, 3.39467605, 181.97909950, 131.60246718, 76.67984255),
+              (0.00000390, -0.00004107, -0.00078890, 58517.81538729, 0.00268329, -0.27769418)),
+    'earth': ((1.00000261, 0.01671123, -0.00001531, 100.46457166, 102.93768193, 0.0),
+              (0.00000562, -0.00004392, -0.01294668, 35999.37244981, 0.32327364, 0.0)),
+    'mars': ((1.52371034, 0.09339410, 1.84969142, -4.55343205, -23.94362959, 49.55953891),
+             (0.00001847, 0.00007882, -0.00813131, 19140.30268499, 0.44441088, -0.29257343)),
+    'jupiter': ((5.20288700, 0.04838624, 1.30439695, 34.39644051, 14.72847983, 100.47390909),
+                (-0.00011607, -0.00013253, -0.00183714, 3034.74612775, 0.21252668, 0.20469106)),
+    'saturn': ((9.53667594, 0.05386179, 2.48599187, 49.95424423, 92.59887831, 113.66242448),
+               (-0.00125060, -0.00050991, 0.00193609, 1222.49362201, -0.41897216, -0.28867794)),
+}
+PLANETS = ('mercury', 'venus', 'mars', 'jupiter', 'saturn')
+
+
+def _heliocentric(name: str, centuries: Sequence[float]) -> List[Tuple[float, float, float]]:
+    (a0, e0, i0, l0, w0, n0), (da, de, di, dl, dw, dn) = ELEMENTS[name]
+    positions = []
+    for t in centuries:
+        a = a0 + da * t
+        e = e0 + de * t
+        inclination = math.radians(i0 + di * t)
+        perihelion = w0 + dw * t
+        node = n0 + dn * t
+        mean_anomaly = math.radians((l0 + dl * t - perihelion + 180.0) % 360.0 - 180.0)
+
+        eccentric = mean_anomaly + e * math.sin(mean_anomaly)
+        for _ in range(6):
+            delta = (eccentric - e * math.sin(eccentric) - mean_anomaly) / (1.0 - e * math.cos(eccentric))
+            eccentric -= delta
+            if abs(delta) < 1e-9:
+                break
+
+        x_orbit = a * (math.cos(eccentric) - e)
+        y_orbit = a * math.sqrt(1.0 - e * e) * math.sin(eccentric)
+        argument = math.radians(perihelion - node)
+        node = math.radians(node)
+        cos_w, sin_w = math.cos(argument), math.sin(argument)
+        cos_n, sin_n = math.cos(node), math.sin(node)
+        cos_i, sin_i = math.cos(inclination), math.sin(inclination)
+        positions.append((
+            (cos_w * cos_n - sin_w * sin_n * cos_i) * x_orbit + (-sin_w * cos_n - cos_w * sin_n * cos_i) * y_orbit,
+            (cos_w * sin_n + sin_w * cos_n * cos_i) * x_orbit + (-sin_w * sin_n + cos_w * cos_n * cos_i) * y_orbit,
+            (sin_w * sin_i) * x_orbit + (cos_w * sin_i) * y_orbit,
+        ))
+    return positions
+
+
+def planet_longitudes(jds: Sequence[float]) -> Dict[str, List[float]]:
+    '''
+    Returns {'sun': [...], 'mercury': [...], ...}: tropical geocentric
+    longitudes in degrees, one per Julian day, in input order.
+    '''
+    centuries = [(jd - J2000) / 36525.0 for jd in jds]
+    precession = [PRECESSION_PER_CENTURY * t for t in centuries]
+    earth = _heliocentric('earth', centuries)
+
+    longitudes = {
+        'sun': [(math.degrees(math.atan2(-y, -x)) + p) % 360.0 for (x, y, _), p in zip(earth, precession)]
+    }
+    for name in PLANETS:
+        longitudes[name] = [
+            (math.degrees(math.atan2(y - ey, x - ex)) + p) % 360.0
+            for (x, y, _), (ex, ey, _), p in zip(_heliocentric(name, centuries), earth, precession)
+        ]
+    return longitudes
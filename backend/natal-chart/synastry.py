@@ -0,0 +1,163 @@
+'''
+Synastry: inter-chart aspects between two natal charts and an aspect-based
+compatibility score. Longitudes are quantized to half-degree steps and all
+weights are integers, so the batched scorer (one user against many
+candidates via per-body lookup tables) returns exactly the pairwise score.
+'''
+
+import math
+from operator import add
+from typing import Any, Dict, List, Optional, Sequence
+
+from compatibility import score_pair
+
+BODIES = ('sun', 'moon', 'mercury', 'venus', 'mars', 'jupiter', 'saturn', 'ascendant')
+STEPS_PER_DEGREE = 2
+STEPS = 360 * STEPS_PER_DEGREE
+SCORE_SCALE = 1500.0
+# Below this many candidates building the lookup tables costs more than direct pair sums
+BATCH_TABLE_THRESHOLD = 64
+
+# name, exact angle, orb (degrees), integer weight
+ASPECTS = (
+    ('conjunction', 0, 8, 3),
+    ('sextile', 60, 4, 2),
+    ('square', 90, 6, -2),
+    ('trine', 120, 8, 3),
+    ('opposition', 180, 8, -1),
+)
+
+_PAIR_WEIGHTS = {
+    ('sun', 'moon'): 3, ('venus', 'mars'): 3, ('sun', 'sun'): 2, ('moon', 'moon'): 2,
+    ('venus', 'venus'): 2, ('sun', 'venus'): 2, ('moon', 'venus'): 2, ('sun', 'ascendant'): 2,
+    ('moon', 'ascendant'): 2, ('mars', 'mars'): 2,
+}
+
+
+def pair_weight(body1: str, body2: str) -> int:
+    return _PAIR_WEIGHTS.get((body1, body2)) or _PAIR_WEIGHTS.get((body2, body1)) or 1
+
+
+def _build_kernel() -> List[int]:
+    # kernel[step] = weighted aspect strength (x100) for an angular separation of step/2 degrees
+    kernel = [0] * STEPS
+    for step in range(STEPS):
+        separation = min(step, STEPS - step) / STEPS_PER_DEGREE
+        for _, angle, orb, weight in ASPECTS:
+            distance = abs(separation - angle)
+            if distance <= orb:
+                kernel[step] = int(round(100 * weight * (1 - distance / orb)))
+                break
+    return kernel
+
+
+KERNEL = _build_kernel()
+
+
+def quantize(longitude: Optional[float]) -> Optional[int]:
+    if longitude is None:
+        return None
+    return int(round(float(longitude) * STEPS_PER_DEGREE)) % STEPS
+
+
+def aspect_score(raw: int) -> float:
+    return 50.0 + 50.0 * math.tanh(raw / SCORE_SCALE)
+
+
+def combine_scores(sign_score: int, raw: Optional[int]) -> int:
+    if raw is None:
+        return sign_score
+    return int(round((sign_score + aspect_score(raw)) / 2))
+
+
+def find_aspects(chart1: Dict[str, float], chart2: Dict[str, float]) -> List[Dict[str, Any]]:
+    aspects = []
+    for body1 in BODIES:
+        if chart1.get(body1) is None:
+            continue
+        for body2 in BODIES:
+            if chart2.get(body2) is None:
+                continue
+            separation = abs(float(chart1[body1]) - float(chart2[body2])) % 360.0
+            separation = min(separation, 360.0 - separation)
+            for name, angle, orb, weight in ASPECTS:
+                if abs(separation - angle) <= orb:
+                    aspects.append({
+                        'body1': body1,
+                        'body2': body2,
+                        'aspect': name,
+                        'orb': round(abs(separation - angle), 2),
+                        'weight': weight * pair_weight(body1, body2)
+                    })
+                    break
+    return aspects
+
+
+def raw_synastry(chart1: Dict[str, float], chart2: Dict[str, float]) -> int:
+    total = 0
+    for body1 in BODIES:
+        step1 = quantize(chart1.get(body1))
+        if step1 is None:
+            continue
+        for body2 in BODIES:
+            step2 = quantize(chart2.get(body2))
+            if step2 is not None:
+                total += pair_weight(body1, body2) * KERNEL[(step2 - step1) % STEPS]
+    return total
+
+
+def synastry(sign1: str, sign2: str, chart1: Optional[Dict[str, float]],
+             chart2: Optional[Dict[str, float]]) -> Dict[str, Any]:
+    sign_score = score_pair(sign1, sign2)
+    if not chart1 or not chart2:
+        return {'score': sign_score, 'sign_score': sign_score, 'aspect_score': None, 'aspects': []}
+    raw = raw_synastry(chart1, chart2)
+    return {
+        'score': combine_scores(sign_score, raw),
+        'sign_score': sign_score,
+        'aspect_score': round(aspect_score(raw), 1),
+        'aspects': find_aspects(chart1, chart2)
+    }
+
+
+def candidate_tables(chart: Dict[str, float]) -> Dict[str, List[int]]:
+    '''
+    For every candidate body, table[step] is the weighted strength of all
+    aspects a candidate body at that step makes to this chart, so scoring
+    one candidate costs one lookup per body instead of one per body pair.
+    '''
+    tables = {}
+    own = [(body, quantize(chart.get(body))) for body in BODIES]
+    own = [(body, step) for body, step in own if step is not None]
+    for body2 in BODIES:
+        table = [0] * STEPS
+        for body1, step1 in own:
+            weight = pair_weight(body1, body2)
+            shifted = KERNEL[-step1:] + KERNEL[:-step1] if step1 else KERNEL
+            table = list(map(add, table, [weight * value for value in shifted]))
+        tables[body2] = table
+    return tables
+
+
+def raw_synastry_batch(chart: Dict[str, float], candidates: Sequence[Optional[Dict[str, float]]]) -> List[Optional[int]]:
+    if len(candidates) < BATCH_TABLE_THRESHOLD:
+        return [raw_synastry(chart, candidate) if candidate else None for candidate in candidates]
+    tables = candidate_tables(chart)
+    totals = [0] * len(candidates)
+    for body in BODIES:
+        steps = [quantize(candidate.get(body)) if candidate else None for candidate in candidates]
+        table = tables[body]
+        totals = list(map(add, totals, [table[step] if step is not None else 0 for step in steps]))
+    return [total if candidate else None for total, candidate in zip(totals, candidates)]
+
+
+def synastry_batch(sign: str, chart: Optional[Dict[str, float]], candidate_signs: Sequence[str],
+                   candidate_charts: Sequence[Optional[Dict[str, float]]]) -> List[int]:
+    if chart:
+        raws = raw_synastry_batch(chart, candidate_charts)
+    else:
+        raws = [None] * len(candidate_signs)
+    return [
+        combine_scores(score_pair(sign, candidate_sign), raw)
+        for candidate_sign, raw in zip(candidate_signs, raws)
+    ]
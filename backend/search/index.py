@@ -1,19 +1,74 @@
 '''
-Business: Search users with compatibility filtering and sorting
-Args: event - dict with httpMethod, queryStringParameters (current_user_id, min_compatibility)
+Business: Search users with compatibility filtering and sorting; record views and likes
+Args: event - dict with httpMethod, queryStringParameters (current_user_id, min_compatibility,
+             limit, gender, min_age, max_age, cursor, exclude_seen, near, latitude, longitude, fields, format),
+             body (interaction actions)
       context - object with attributes: request_id, function_name
 Returns: HTTP response with list of users and their compatibility scores
 '''
 
-import json
-import os
-from typing import Dict, Any, List
-import psycopg2
-from psycopg2.extras import RealDictCursor
+from datetime import date
+from typing import Dict, Any, List, Optional, Tuple
 
-def get_db_connection():
-    database_url = os.environ.get('DATABASE_URL')
-    return psycopg2.connect(database_url, cursor_factory=RealDictCursor)
+from astro_dates import calculate_ages
+from compat_cache import get_many, pair_key
+from geo import neighbourhood, parse_location
+from interactions import flush_views, like, load_seen_filter, view_buffer
+from runtime import HttpError, Request, Router, list_view, parse_int
+
+MAX_PAGE_SIZE = 100
+MAX_AGE = 150
+# Selectable with fields=...; format=columns returns one array per field
+USER_FIELDS = ('id', 'name', 'age', 'sign', 'zodiac_sign', 'compatibility', 'synastry_score', 'initials')
+MAX_VIEWS_PER_REQUEST = 100
+# With exclude_seen, pages mostly made of seen profiles are refilled from up to this many batches
+MAX_SEEN_ROUNDS = 5
+
+router = Router('Content-Type, X-User-Id')
+
+# Ranked by sign compatibility. Within a score, the viewer's stored match list (user_matches, maintained by
+# the natal-chart function) comes first in synastry order, then everyone else in id order, so filtered and
+# paged searches carry on past the list. Each compatible sign reads at most a page of list entries and walks
+# idx_users_zodiac_id for a page of the rest, so the cost does not grow with users.
+SEARCH_QUERY = (
+    "WITH listed AS MATERIALIZED ("
+    "SELECT u.id, u.name, u.birth_date, u.zodiac_sign, um.score AS synastry "
+    "FROM user_matches um JOIN users u ON u.id = um.candidate_id "
+    "WHERE um.user_id = %(current_user_id)s{filters}"
+    ") "
+    "SELECT u.id, u.name, u.birth_date, u.zodiac_sign, sc.score AS compatibility, u.synastry "
+    "FROM sign_compatibility sc "
+    "CROSS JOIN LATERAL ("
+    "(SELECT u.id, u.name, u.birth_date, u.zodiac_sign, u.synastry FROM listed u "
+    "WHERE u.zodiac_sign = sc.sign2{listed_cursor} "
+    "ORDER BY u.synastry DESC, u.id LIMIT %(limit)s) "
+    "UNION ALL "
+    "(SELECT u.id, u.name, u.birth_date, u.zodiac_sign, NULL FROM users u "
+    "WHERE u.zodiac_sign = sc.sign2 AND u.id != %(current_user_id)s{filters}{cursor} "
+    "AND NOT EXISTS (SELECT 1 FROM user_matches um WHERE um.user_id = %(current_user_id)s AND um.candidate_id = u.id) "
+    "ORDER BY u.id LIMIT %(limit)s)"
+    ") u "
+    "WHERE sc.sign1 = %(sign)s AND sc.score >= %(min_compatibility)s{cursor_filter} "
+    "ORDER BY sc.score DESC, u.synastry DESC NULLS LAST, u.id LIMIT %(limit)s"
+)
+
+# near=1: per compatible sign, an index-only read of the (cell, sign[, gender]) buckets of the neighbouring
+# cells in idx_users_candidates, the age filter a birth_date range inside each bucket, so the cost follows
+# the size of the neighbourhood rather than of users. Only the page's rows are then read from users.
+NEARBY_QUERY = (
+    "SELECT u.id, u.name, u.birth_date, u.zodiac_sign, b.score AS compatibility FROM ("
+    "SELECT sc.score, u.id FROM sign_compatibility sc "
+    "CROSS JOIN LATERAL ("
+    "SELECT u.id FROM users u "
+    "WHERE u.geo_cell = ANY(%(geo_cells)s) AND u.zodiac_sign = sc.sign2 "
+    "AND u.id != %(current_user_id)s{filters}{cursor} "
+    "ORDER BY u.id LIMIT %(limit)s"
+    ") u "
+    "WHERE sc.sign1 = %(sign)s AND sc.score >= %(min_compatibility)s{cursor_filter} "
+    "ORDER BY sc.score DESC, u.id LIMIT %(limit)s"
+    ") b JOIN users u ON u.id = b.id "
+    "ORDER BY b.score DESC, u.id"
+)
 
 def get_zodiac_symbol(sign: str) -> str:
     symbols = {
@@ -23,106 +78,203 @@ def get_zodiac_symbol(sign: str) -> str:
     }
     return symbols.get(sign, '✨')
 
-def calculate_age(birth_date_str: str) -> int:
-    from datetime import datetime
-    birth_date = datetime.strptime(str(birth_date_str), '%Y-%m-%d')
-    today = datetime.today()
-    age = today.year - birth_date.year - ((today.month, today.day) < (birth_date.month, birth_date.day))
-    return age
+def years_ago(today: date, years: int) -> date:
+    try:
+        return today.replace(year=today.year - years)
+    except ValueError:
+        return today.replace(year=today.year - years, day=28)
 
-def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
-    method: str = event.get('httpMethod', 'GET')
-    
-    if method == 'OPTIONS':
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type, X-User-Id',
-                'Access-Control-Max-Age': '86400'
-            },
-            'body': '',
-            'isBase64Encoded': False
-        }
-    
-    if method == 'GET':
-        params = event.get('queryStringParameters', {})
-        current_user_id = params.get('current_user_id')
-        min_compatibility = int(params.get('min_compatibility', 60))
-        limit = int(params.get('limit', 20))
-        
-        if not current_user_id:
-            return {
-                'statusCode': 400,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'isBase64Encoded': False,
-                'body': json.dumps({'error': 'current_user_id required'})
-            }
-        
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        try:
-            cursor.execute(
-                "SELECT zodiac_sign FROM users WHERE id = %s",
-                (current_user_id,)
-            )
-            current_user = cursor.fetchone()
-            
-            if not current_user:
-                return {
-                    'statusCode': 404,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'isBase64Encoded': False,
-                    'body': json.dumps({'error': 'Current user not found'})
-                }
-            
-            cursor.execute(
-                "SELECT u.id, u.name, u.birth_date, u.zodiac_sign, nc.moon_sign, nc.ascendant "
-                "FROM users u LEFT JOIN natal_charts nc ON u.id = nc.user_id "
-                "WHERE u.id != %s LIMIT %s",
-                (current_user_id, limit)
-            )
-            users = cursor.fetchall()
-            
-            from backend.natal_chart.index import calculate_compatibility
-            
-            results = []
-            for user in users:
-                compatibility_score = calculate_compatibility(
-                    current_user['zodiac_sign'],
-                    user['zodiac_sign']
-                )
-                
-                if compatibility_score >= min_compatibility:
-                    age = calculate_age(user['birth_date'])
-                    results.append({
-                        'id': user['id'],
-                        'name': user['name'],
-                        'age': age,
-                        'sign': get_zodiac_symbol(user['zodiac_sign']),
-                        'zodiac_sign': user['zodiac_sign'],
-                        'compatibility': compatibility_score,
-                        'initials': ''.join([c[0] for c in user['name'].split()[:2]]).upper()
-                    })
-            
-            results.sort(key=lambda x: x['compatibility'], reverse=True)
-            
-            return {
-                'statusCode': 200,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'isBase64Encoded': False,
-                'body': json.dumps({'users': results})
-            }
-        
-        finally:
-            cursor.close()
-            conn.close()
-    
-    return {
-        'statusCode': 405,
-        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-        'isBase64Encoded': False,
-        'body': json.dumps({'error': 'Method not allowed'})
+def parse_cursor(cursor: Optional[str]) -> Optional[Tuple[int, Optional[int], int]]:
+    '''(score, synastry, id): <score>:<id> after an unlisted row, <score>:<synastry>:<id> after a match list row.'''
+    if not cursor:
+        return None
+    try:
+        parts = [int(part) for part in cursor.split(':')]
+    except ValueError:
+        raise HttpError(400, 'Invalid cursor')
+    if len(parts) == 2:
+        return parts[0], None, parts[1]
+    if len(parts) == 3:
+        return parts[0], parts[1], parts[2]
+    raise HttpError(400, 'Invalid cursor')
+
+def format_cursor(user: Dict[str, Any]) -> str:
+    if user.get('synastry') is None:
+        return f"{user['compatibility']}:{user['id']}"
+    return f"{user['compatibility']}:{user['synastry']}:{user['id']}"
+
+def build_search_query(template: str, params: Dict[str, Any], query_params: Dict[str, Any]) -> str:
+    filters = ''
+    if params.get('gender'):
+        filters += ' AND u.gender = %(gender)s'
+        query_params['gender'] = params['gender']
+    today = date.today()
+    if params.get('min_age'):
+        filters += ' AND u.birth_date <= %(latest_birth_date)s'
+        query_params['latest_birth_date'] = years_ago(today, parse_int(params['min_age'], 'min_age', 0, MAX_AGE))
+    if params.get('max_age'):
+        filters += ' AND u.birth_date > %(earliest_birth_date)s'
+        query_params['earliest_birth_date'] = years_ago(today, parse_int(params['max_age'], 'max_age', 0, MAX_AGE) + 1)
+    
+    cursor_filter = listed_cursor = cursor_after = ''
+    cursor = parse_cursor(params.get('cursor'))
+    if cursor:
+        query_params['cursor_score'], query_params['cursor_synastry'], query_params['cursor_id'] = cursor
+        cursor_filter = ' AND sc.score <= %(cursor_score)s'
+        # A NULL cursor_synastry (resuming after an unlisted row) leaves no list rows at that score
+        listed_cursor = (
+            ' AND (sc.score < %(cursor_score)s OR u.synastry < %(cursor_synastry)s'
+            ' OR (u.synastry = %(cursor_synastry)s AND u.id > %(cursor_id)s))'
+        )
+        cursor_after = (
+            ' AND (sc.score < %(cursor_score)s OR %(cursor_synastry)s::int IS NOT NULL OR u.id > %(cursor_id)s)'
+        )
+    return template.format(filters=filters, cursor=cursor_after, listed_cursor=listed_cursor,
+                           cursor_filter=cursor_filter)
+
+def fetch_candidates(cursor, params: Dict[str, Any], query_params: Dict[str, Any]) -> List[Dict[str, Any]]:
+    # Match lists are ranked over everyone, so a nearby search goes straight to the location buckets
+    template = NEARBY_QUERY if 'geo_cells' in query_params else SEARCH_QUERY
+    cursor.execute(build_search_query(template, params, query_params), query_params)
+    return cursor.fetchall()
+
+def exclude_seen_users(request: Request, users: List[Dict[str, Any]], params: Dict[str, Any],
+                       query_params: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    '''Drops users the viewer has seen, refilling the page; returns the page and the row to resume after.'''
+    limit = query_params['limit']
+    viewer_id = int(query_params['current_user_id'])
+    seen = load_seen_filter(request.cursor, viewer_id)
+    # Views still sitting in this instance's buffer are not in the stored filter yet
+    pending = view_buffer.pending_for(viewer_id)
+    if seen is None and not pending:
+        return users, users[-1] if len(users) == limit else None
+    
+    page: List[Dict[str, Any]] = []
+    batch = users
+    for round_number in range(MAX_SEEN_ROUNDS):
+        for user in batch:
+            if user['id'] in pending or (seen is not None and user['id'] in seen):
+                continue
+            page.append(user)
+            if len(page) == limit:
+                return page, user
+        if len(batch) < limit:
+            return page, None
+        if round_number + 1 < MAX_SEEN_ROUNDS:
+            batch = fetch_candidates(request.cursor, {**params, 'cursor': format_cursor(batch[-1])}, query_params)
+    return page, batch[-1]
+
+# exclude_seen may refill the page from further candidate batches, one query each
+@router.get(budget_queries=4 + MAX_SEEN_ROUNDS)
+def search_users(request: Request) -> Dict[str, Any]:
+    params = request.params
+    current_user_id = params.get('current_user_id')
+    
+    if not current_user_id:
+        raise HttpError(400, 'current_user_id required')
+    
+    current_user_id = parse_int(current_user_id, 'current_user_id', 1)
+    min_compatibility = parse_int(params.get('min_compatibility', 60), 'min_compatibility', 0, 100)
+    limit = min(parse_int(params.get('limit', 20), 'limit', 1), MAX_PAGE_SIZE)
+    
+    cursor = request.cursor
+    cursor.execute(
+        "SELECT zodiac_sign, latitude, longitude FROM users WHERE id = %s",
+        (current_user_id,)
+    )
+    current_user = cursor.fetchone()
+    
+    if not current_user:
+        raise HttpError(404, 'Current user not found')
+    
+    query_params = {
+        'current_user_id': current_user_id,
+        'sign': current_user['zodiac_sign'],
+        'min_compatibility': min_compatibility,
+        'limit': limit
     }
+    if params.get('near') in ('1', 'true'):
+        try:
+            location = parse_location(params.get('latitude'), params.get('longitude'))
+        except ValueError as error:
+            raise HttpError(400, str(error))
+        if location is None and current_user['latitude'] is None:
+            raise HttpError(400, 'latitude and longitude required: no location on file')
+        query_params['geo_cells'] = neighbourhood(*(location or (current_user['latitude'],
+                                                                 current_user['longitude'])))
+    
+    users = fetch_candidates(cursor, params, query_params)
+    if params.get('exclude_seen') in ('1', 'true'):
+        users, last = exclude_seen_users(request, users, params, query_params)
+    else:
+        last = users[-1] if len(users) == limit else None
+    
+    # compatibility is the ranking score that orders the page, min_compatibility filters and the cursor
+    # resumes from; synastry_score is the pair's chart score when known: the exact one stored by
+    # calculate_compatibility, else the one from the viewer's match list, else null
+    cached = get_many(request, [(current_user_id, user['id']) for user in users]) if users else {}
+    
+    results = []
+    ages = calculate_ages([user['birth_date'] for user in users])
+    for user, age in zip(users, ages):
+        result = cached.get(pair_key(current_user_id, user['id']))
+        results.append({
+            'id': user['id'],
+            'name': user['name'],
+            'age': age,
+            'sign': get_zodiac_symbol(user['zodiac_sign']),
+            'zodiac_sign': user['zodiac_sign'],
+            'compatibility': user['compatibility'],
+            'synastry_score': result['score'] if result else user.get('synastry'),
+            'initials': ''.join([c[0] for c in user['name'].split()[:2]]).upper()
+        })
+    
+    next_cursor = format_cursor(last) if last else None
+    
+    return {'users': list_view(results, params, USER_FIELDS), 'next_cursor': next_cursor}
+
+def parse_user_ids(values: Any) -> List[int]:
+    try:
+        return [int(value) for value in values]
+    except (TypeError, ValueError):
+        raise HttpError(400, 'user ids must be integers')
+
+# Views are buffered in this instance and written in batches; unflushed views are lost if it is recycled
+@router.action('record_views')
+def record_views(request: Request) -> Dict[str, Any]:
+    viewer_id = request.body.get('viewer_id')
+    viewed_user_ids = request.body.get('viewed_user_ids')
+    
+    if not viewer_id or not isinstance(viewed_user_ids, list):
+        raise HttpError(400, 'viewer_id and viewed_user_ids required')
+    if len(viewed_user_ids) > MAX_VIEWS_PER_REQUEST:
+        raise HttpError(400, f'At most {MAX_VIEWS_PER_REQUEST} viewed_user_ids per request')
+    
+    viewer_id, = parse_user_ids([viewer_id])
+    view_buffer.add(viewer_id, parse_user_ids(viewed_user_ids))
+    flushed = flush_views(request.conn, request.cursor) if view_buffer.due() else 0
+    
+    return {'status': 'recorded', 'flushed': flushed}
+
+@router.action('like')
+def like_user(request: Request) -> Dict[str, Any]:
+    from_user_id = request.body.get('from_user_id')
+    to_user_id = request.body.get('to_user_id')
+    
+    if not from_user_id or not to_user_id:
+        raise HttpError(400, 'from_user_id and to_user_id required')
+    from_user_id, to_user_id = parse_user_ids([from_user_id, to_user_id])
+    if from_user_id == to_user_id:
+        raise HttpError(400, 'Cannot like yourself')
+    
+    request.cursor.execute("SELECT count(*) AS found FROM users WHERE id IN (%s, %s)", (from_user_id, to_user_id))
+    if request.cursor.fetchone()['found'] < 2:
+        raise HttpError(404, 'User not found')
+    
+    result = like(request.cursor, from_user_id, to_user_id)
+    request.conn.commit()
+    
+    return {'status': 'liked', **result}
+
+def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    return router.handle(event, context)
@@ -0,0 +1,222 @@
+'''
+User interactions (user_interactions: view, like, match). Views are the
+highest-volume write: they are buffered per instance and flushed as one
+multi-row insert once VIEW_FLUSH_SIZE are pending or VIEW_FLUSH_SECONDS have
+passed, at the cost of losing the unflushed tail if the instance is recycled.
+Likes are written immediately; a like that completes a mutual pair creates
+the two match rows and the pair's chat in the same transaction, serialized
+per pair with an advisory lock. Every viewed or liked user is also added to
+the viewer's seen filter (user_seen_filters), a Bloom filter search uses to
+skip profiles the user has already seen.
+'''
+
+import os
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from chats import get_or_create_chat
+
+VIEW_FLUSH_SIZE = int(os.environ.get('VIEW_FLUSH_SIZE', '200'))
+VIEW_FLUSH_SECONDS = float(os.environ.get('VIEW_FLUSH_SECONDS', '5'))
+
+# ~10 bits and 7 probes per item keep false positives near 1% up to capacity
+BITS_PER_ITEM = 10
+HASH_COUNT = 7
+INITIAL_CAPACITY = 1024
+
+MASK64 = (1 << 64) - 1
+
+INSERT_INTERACTIONS = (
+    "INSERT INTO user_interactions (from_user_id, to_user_id, interaction_type) VALUES %s "
+    "ON CONFLICT (from_user_id, to_user_id, interaction_type) DO NOTHING"
+)
+UPDATE_FILTERS = (
+    "UPDATE user_seen_filters f SET bits = v.bits, items = v.items, updated_at = CURRENT_TIMESTAMP "
+    "FROM (VALUES %s) AS v(user_id, bits, items) WHERE f.user_id = v.user_id"
+)
+
+
+def _mix(value: int) -> int:
+    # splitmix64 finalizer: stable across processes, unlike hash()
+    value = (value + 0x9E3779B97F4A7C15) & MASK64
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & MASK64
+    return value ^ (value >> 31)
+
+
+class SeenFilter:
+    __slots__ = ('bits', 'items', 'size')
+
+    def __init__(self, bits: Optional[bytes] = None, items: int = 0):
+        self.bits = bytearray(bits or bytes(INITIAL_CAPACITY * BITS_PER_ITEM // 8))
+        self.items = items
+        self.size = len(self.bits) * 8
+
+    @property
+    def capacity(self) -> int:
+        return self.size // BITS_PER_ITEM
+
+    def _positions(self, user_id: int) -> List[int]:
+        first = _mix(user_id)
+        step = _mix(first) | 1
+        return [(first + i * step) % self.size for i in range(HASH_COUNT)]
+
+    def __contains__(self, user_id: int) -> bool:
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(user_id))
+
+    def add(self, user_id: int) -> bool:
+        '''Adds user_id; returns False if it was (probably) present already.'''
+        if user_id in self:
+            return False
+        for position in self._positions(user_id):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.items += 1
+        return True
+
+    @classmethod
+    def rebuilt(cls, user_ids: Iterable[int], capacity: int) -> 'SeenFilter':
+        seen = cls(bytes(capacity * BITS_PER_ITEM // 8))
+        for user_id in user_ids:
+            seen.add(user_id)
+        return seen
+
+
+class ViewBuffer:
+    def __init__(self, flush_size: int, flush_seconds: float):
+        self.flush_size = flush_size
+        self.flush_seconds = flush_seconds
+        self._pending: Dict[Tuple[int, int], None] = {}
+        self._oldest = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, viewer_id: int, viewed_ids: Iterable[int]) -> None:
+        with self._lock:
+            if not self._pending:
+                self._oldest = time.monotonic()
+            for viewed_id in viewed_ids:
+                if viewed_id != viewer_id:
+                    self._pending[(viewer_id, viewed_id)] = None
+
+    def due(self) -> bool:
+        with self._lock:
+            return bool(self._pending) and (
+                len(self._pending) >= self.flush_size or time.monotonic() - self._oldest >= self.flush_seconds
+            )
+
+    def pending_for(self, viewer_id: int) -> Set[int]:
+        with self._lock:
+            return {viewed_id for viewer, viewed_id in self._pending if viewer == viewer_id}
+
+    def drain(self) -> List[Tuple[int, int]]:
+        with self._lock:
+            pending = list(self._pending)
+            self._pending.clear()
+            return pending
+
+    def restore(self, pairs: List[Tuple[int, int]]) -> None:
+        with self._lock:
+            for pair in pairs:
+                self._pending.setdefault(pair, None)
+
+
+view_buffer = ViewBuffer(VIEW_FLUSH_SIZE, VIEW_FLUSH_SECONDS)
+
+
+def load_seen_filter(cursor, user_id: Any) -> Optional[SeenFilter]:
+    cursor.execute("SELECT bits, items FROM user_seen_filters WHERE user_id = %s", (user_id,))
+    row = cursor.fetchone()
+    return SeenFilter(bytes(row['bits']), row['items']) if row else None
+
+
+def update_seen_filters(cursor, pairs: List[Tuple[int, int]]) -> None:
+    '''Adds (viewer, seen user) pairs to the viewers' filters, rebuilding any that outgrow their capacity.'''
+    from psycopg2 import Binary
+    from psycopg2.extras import execute_values
+
+    viewers = sorted({viewer_id for viewer_id, _ in pairs})
+    # Create missing rows first so concurrent flushes serialize on the row locks below
+    cursor.execute(
+        "INSERT INTO user_seen_filters (user_id, bits, items) SELECT unnest(%s::int[]), %s, 0 "
+        "ON CONFLICT (user_id) DO NOTHING",
+        (viewers, Binary(SeenFilter().bits))
+    )
+    cursor.execute(
+        "SELECT user_id, bits, items FROM user_seen_filters WHERE user_id = ANY(%s) ORDER BY user_id FOR UPDATE",
+        (viewers,)
+    )
+    filters = {row['user_id']: SeenFilter(bytes(row['bits']), row['items']) for row in cursor.fetchall()}
+    for viewer_id, seen_id in pairs:
+        filters[viewer_id].add(seen_id)
+
+    for viewer_id, seen in filters.items():
+        if seen.items > seen.capacity:
+            cursor.execute(
+                "SELECT to_user_id FROM user_interactions WHERE from_user_id = %s AND interaction_type != 'match'",
+                (viewer_id,)
+            )
+            seen_ids = {row['to_user_id'] for row in cursor.fetchall()}
+            seen_ids.update(seen_id for viewer, seen_id in pairs if viewer == viewer_id)
+            filters[viewer_id] = SeenFilter.rebuilt(seen_ids, max(seen.capacity, len(seen_ids)) * 2)
+
+    execute_values(cursor, UPDATE_FILTERS, [
+        (viewer_id, Binary(bytes(seen.bits)), seen.items) for viewer_id, seen in filters.items()
+    ], template='(%s, %s::bytea, %s)', page_size=len(filters))
+
+
+def flush_views(conn, cursor) -> int:
+    '''Writes all buffered views and commits; returns how many were written.'''
+    from psycopg2 import Error
+    from psycopg2.extras import execute_values
+
+    drained = view_buffer.drain()
+    if not drained:
+        return 0
+    try:
+        # Ids are only checked for being integers on the way in; drop pairs naming deleted or unknown users
+        user_ids = list({user_id for pair in drained for user_id in pair})
+        cursor.execute("SELECT id FROM users WHERE id = ANY(%s)", (user_ids,))
+        existing = {row['id'] for row in cursor.fetchall()}
+        pairs = [pair for pair in drained if pair[0] in existing and pair[1] in existing]
+        if not pairs:
+            conn.commit()
+            return 0
+        execute_values(cursor, INSERT_INTERACTIONS, [(viewer, viewed, 'view') for viewer, viewed in pairs],
+                       page_size=len(pairs))
+        update_seen_filters(cursor, pairs)
+        conn.commit()
+    except Error:
+        conn.rollback()
+        view_buffer.restore(drained)
+        raise
+    return len(pairs)
+
+
+def like(cursor, from_user_id: int, to_user_id: int) -> Dict[str, Any]:
+    '''
+    Records a like; when to_user_id already likes from_user_id, also the two
+    match rows and the pair's chat. Runs in the caller's transaction.
+    '''
+    user1_id, user2_id = min(from_user_id, to_user_id), max(from_user_id, to_user_id)
+    # Both sides liking at once must not each miss the other's uncommitted like
+    cursor.execute("SELECT pg_advisory_xact_lock(%s, %s)", (user1_id, user2_id))
+    cursor.execute(
+        "INSERT INTO user_interactions (from_user_id, to_user_id, interaction_type) VALUES (%s, %s, 'like') "
+        "ON CONFLICT (from_user_id, to_user_id, interaction_type) DO NOTHING",
+        (from_user_id, to_user_id)
+    )
+    update_seen_filters(cursor, [(from_user_id, to_user_id)])
+    cursor.execute(
+        "SELECT 1 FROM user_interactions WHERE from_user_id = %s AND to_user_id = %s AND interaction_type = 'like'",
+        (to_user_id, from_user_id)
+    )
+    if not cursor.fetchone():
+        return {'match': False, 'chat_id': None}
+
+    from psycopg2.extras import execute_values
+
+    execute_values(cursor, INSERT_INTERACTIONS, [
+        (from_user_id, to_user_id, 'match'), (to_user_id, from_user_id, 'match')
+    ])
+    return {'match': True, 'chat_id': get_or_create_chat(cursor, user1_id, user2_id)}
@@ -0,0 +1,6 @@
+'''
+Canonical copies of the modules the functions carry (db, runtime, compat_cache,
+chats, geo, astro_dates). Functions are deployed one directory at a time and
+cannot import from here at runtime; edit these files and run sync.py to update
+the per-function copies.
+'''
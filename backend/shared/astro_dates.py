@@ -0,0 +1,84 @@
+'''
+Sun sign and age from a birth date, on the profile, bulk import and search
+paths. The sign comes from a 366-entry day-of-year table (leap-year
+numbering, so 29 February has its own slot and every other day keeps the
+same index in any year). Accepts date objects as psycopg2 returns them, or
+ISO strings; the list variants hoist the lookups out of the loop.
+'''
+
+from datetime import date, datetime
+from typing import Iterable, List, Optional, Union
+
+DateLike = Union[date, str]
+
+# First day of each sign; the year starts (and ends) in Capricorn. Aquarius starts on 1 February rather
+# than 20 January because that is what every stored users.zodiac_sign (and the match lists and scores
+# built from it) was computed with; moving it needs a data migration, not just a new table.
+SIGN_STARTS = (
+    (2, 1, 'Водолей'), (2, 19, 'Рыбы'), (3, 21, 'Овен'), (4, 20, 'Телец'),
+    (5, 21, 'Близнецы'), (6, 21, 'Рак'), (7, 23, 'Лев'), (8, 23, 'Дева'),
+    (9, 23, 'Весы'), (10, 23, 'Скорпион'), (11, 22, 'Стрелец'), (12, 22, 'Козерог'),
+)
+
+# Index of the 1st of each month in a leap year; slot 0 is unused
+MONTH_OFFSETS = (0, 0, 31, 60, 91, 121, 152, 182, 213, 244, 274, 305, 335)
+MONTH_LENGTHS = (0, 31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+
+
+def _build_table() -> tuple:
+    table = []
+    sign = 'Козерог'
+    starts = {(month, day): name for month, day, name in SIGN_STARTS}
+    for month in range(1, 13):
+        for day in range(1, MONTH_LENGTHS[month] + 1):
+            sign = starts.get((month, day), sign)
+            table.append(sign)
+    return tuple(table)
+
+
+SIGN_BY_DAY = _build_table()
+
+
+def to_date(value: DateLike) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        # Unpadded dates such as 1990-3-5 were always accepted
+        return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+def calculate_zodiac_sign(birth_date: DateLike) -> str:
+    birth_date = to_date(birth_date)
+    return SIGN_BY_DAY[MONTH_OFFSETS[birth_date.month] + birth_date.day - 1]
+
+
+def calculate_zodiac_signs(birth_dates: Iterable[DateLike]) -> List[str]:
+    table, offsets, convert = SIGN_BY_DAY, MONTH_OFFSETS, to_date
+    signs = []
+    for birth_date in birth_dates:
+        if type(birth_date) is not date:
+            birth_date = convert(birth_date)
+        signs.append(table[offsets[birth_date.month] + birth_date.day - 1])
+    return signs
+
+
+def calculate_age(birth_date: DateLike, today: Optional[date] = None) -> int:
+    birth_date = to_date(birth_date)
+    today = today or date.today()
+    return today.year - birth_date.year - ((today.month, today.day) < (birth_date.month, birth_date.day))
+
+
+def calculate_ages(birth_dates: Iterable[DateLike], today: Optional[date] = None) -> List[int]:
+    today = today or date.today()
+    # month * 32 + day orders (month, day) pairs without building tuples
+    year, today_key, convert = today.year, today.month * 32 + today.day, to_date
+    ages = []
+    for birth_date in birth_dates:
+        if type(birth_date) is not date:
+            birth_date = convert(birth_date)
+        ages.append(year - birth_date.year - (birth_date.month * 32 + birth_date.day > today_key))
+    return ages
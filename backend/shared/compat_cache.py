@@ -0,0 +1,124 @@
+'''
+Read-through cache of pair compatibility results (compatibility_cache). A
+pair is stored once under the symmetric key (smaller id, larger id). Lookups
+go to a bounded in-process LRU/TTL tier first and to the table second, many
+pairs at a time with one query, so a warm instance serves repeated screens
+without recomputing synastry or touching the database.
+'''
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from runtime import Request, encode_json
+
+CACHE_SIZE = int(os.environ.get('COMPATIBILITY_CACHE_SIZE', '50000'))
+# Upper bound on how long a chart change made on another instance can go unnoticed here
+CACHE_TTL = float(os.environ.get('COMPATIBILITY_CACHE_TTL', '300'))
+
+PairKey = Tuple[int, int]
+
+SELECT_PAIRS = (
+    "SELECT c.user1_id, c.user2_id, c.compatibility_score, c.compatibility_details "
+    "FROM compatibility_cache c "
+    "JOIN unnest(%s::int[], %s::int[]) AS k(user1_id, user2_id) "
+    "ON c.user1_id = k.user1_id AND c.user2_id = k.user2_id"
+)
+UPSERT_PAIRS = (
+    "INSERT INTO compatibility_cache (user1_id, user2_id, compatibility_score, compatibility_details) "
+    "VALUES %s ON CONFLICT (user1_id, user2_id) DO UPDATE SET "
+    "compatibility_score = EXCLUDED.compatibility_score, "
+    "compatibility_details = EXCLUDED.compatibility_details, created_at = CURRENT_TIMESTAMP"
+)
+
+
+def pair_key(user1_id: Any, user2_id: Any) -> PairKey:
+    user1_id, user2_id = int(user1_id), int(user2_id)
+    return (user1_id, user2_id) if user1_id <= user2_id else (user2_id, user1_id)
+
+
+class PairCache:
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: 'OrderedDict[PairKey, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: PairKey) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            result, valid_until = entry
+            if time.monotonic() >= valid_until:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return result
+
+    def put(self, key: PairKey, result: Dict[str, Any]) -> None:
+        with self._lock:
+            self._entries[key] = (result, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def discard_user(self, user_id: int) -> None:
+        with self._lock:
+            for key in [key for key in self._entries if user_id in key]:
+                del self._entries[key]
+
+
+local_cache = PairCache(CACHE_SIZE, CACHE_TTL)
+
+
+def get_many(request: Request, pairs: Iterable[Tuple[Any, Any]]) -> Dict[PairKey, Dict[str, Any]]:
+    '''
+    Cached results by pair key, each {'score', 'details'}; pairs that were
+    never computed are absent. The database is queried (once) only for keys
+    the local tier does not have.
+    '''
+    found: Dict[PairKey, Dict[str, Any]] = {}
+    missing = []
+    for key in {pair_key(*pair) for pair in pairs}:
+        result = local_cache.get(key)
+        if result is None:
+            missing.append(key)
+        else:
+            found[key] = result
+    if missing:
+        cursor = request.cursor
+        cursor.execute(SELECT_PAIRS, ([key[0] for key in missing], [key[1] for key in missing]))
+        for row in cursor.fetchall():
+            key = (row['user1_id'], row['user2_id'])
+            found[key] = {'score': row['compatibility_score'], 'details': row['compatibility_details']}
+            local_cache.put(key, found[key])
+    return found
+
+
+def get(request: Request, user1_id: Any, user2_id: Any) -> Optional[Dict[str, Any]]:
+    return get_many(request, [(user1_id, user2_id)]).get(pair_key(user1_id, user2_id))
+
+
+def put_many(cursor, results: Dict[PairKey, Dict[str, Any]]) -> None:
+    '''Writes results (keyed by pair_key) through to the table and the local tier.'''
+    from psycopg2.extras import execute_values
+
+    if not results:
+        return
+    execute_values(cursor, UPSERT_PAIRS, [
+        (key[0], key[1], result['score'], encode_json(result['details'])) for key, result in results.items()
+    ], page_size=len(results))
+    for key, result in results.items():
+        local_cache.put(key, result)
+
+
+def invalidate_user(cursor, user_id: Any) -> None:
+    '''Drops every cached pair of user_id, e.g. after their chart changed.'''
+    cursor.execute(
+        "DELETE FROM compatibility_cache WHERE user1_id = %s OR user2_id = %s",
+        (user_id, user_id)
+    )
+    local_cache.discard_user(int(user_id))
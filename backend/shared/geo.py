@@ -0,0 +1,67 @@
+'''
+Coarse location cells for search prefiltering. A user's current location is
+stored with its geohash at GEO_PRECISION characters (about 156 x 156 km at
+the equator, narrower towards the poles); "nearby" means the cell and its
+eight neighbours, so anyone within one cell width is always included.
+'''
+
+from typing import Any, List, Optional, Tuple
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+GEO_PRECISION = 3
+
+
+def _bits(precision: int) -> Tuple[int, int]:
+    # Longitude takes the first bit of every pair, so it gets the odd one out
+    total = precision * 5
+    return (total + 1) // 2, total // 2
+
+
+def geohash(latitude: float, longitude: float, precision: int = GEO_PRECISION) -> str:
+    # Stored coordinates come back from NUMERIC columns as Decimal
+    latitude, longitude = float(latitude), float(longitude)
+    lon_bits, lat_bits = _bits(precision)
+    lon = min(int((longitude + 180.0) / 360.0 * (1 << lon_bits)), (1 << lon_bits) - 1)
+    lat = min(int((latitude + 90.0) / 180.0 * (1 << lat_bits)), (1 << lat_bits) - 1)
+    code = 0
+    for i in range(precision * 5):
+        # Bits alternate longitude, latitude, starting from the most significant of each
+        if i % 2 == 0:
+            lon_bits -= 1
+            code = (code << 1) | ((lon >> lon_bits) & 1)
+        else:
+            lat_bits -= 1
+            code = (code << 1) | ((lat >> lat_bits) & 1)
+    return ''.join(BASE32[(code >> shift) & 31] for shift in range(precision * 5 - 5, -1, -5))
+
+
+def neighbourhood(latitude: float, longitude: float, precision: int = GEO_PRECISION) -> List[str]:
+    '''The cell containing the point and the (up to) eight cells around it.'''
+    latitude, longitude = float(latitude), float(longitude)
+    lon_bits, lat_bits = _bits(precision)
+    width = 360.0 / (1 << lon_bits)
+    height = 180.0 / (1 << lat_bits)
+    cells = []
+    for d_lat in (-height, 0.0, height):
+        lat = latitude + d_lat
+        if not -90.0 <= lat <= 90.0:
+            continue
+        for d_lon in (-width, 0.0, width):
+            lon = (longitude + d_lon + 180.0) % 360.0 - 180.0
+            cell = geohash(lat, lon, precision)
+            if cell not in cells:
+                cells.append(cell)
+    return cells
+
+
+def parse_location(latitude: Any, longitude: Any) -> Optional[Tuple[float, float]]:
+    '''(latitude, longitude) from request values, None if both are missing; ValueError if invalid.'''
+    if latitude in (None, '') and longitude in (None, ''):
+        return None
+    try:
+        latitude, longitude = float(latitude), float(longitude)
+    except TypeError:
+        raise ValueError('latitude and longitude go together')
+    if not (-90.0 <= latitude <= 90.0 and -180.0 <= longitude <= 180.0):
+        raise ValueError('latitude must be within ±90 and longitude within ±180')
+    return latitude, longitude
@@ -0,0 +1,57 @@
+'''
+Business: Copy the shared modules into the function directories that use them (each function is deployed on its own and carries its own copy)
+Args: --check to only report copies that differ from backend/shared, exiting with 1 if any do
+Returns: Prints each copy that was updated or differs; run as: python backend/shared/sync.py [--check]
+'''
+
+import argparse
+import filecmp
+import os
+import shutil
+import sys
+from typing import Dict, List, Optional, Tuple
+
+SHARED_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(SHARED_DIR)
+# Module -> functions that carry it (None: every function)
+SHARED_MODULES: Dict[str, Optional[Tuple[str, ...]]] = {
+    'db.py': None,
+    'runtime.py': None,
+    'compat_cache.py': ('natal-chart', 'search'),
+    'chats.py': ('chat', 'search'),
+    'geo.py': ('natal-chart', 'search'),
+    'astro_dates.py': ('natal-chart', 'search'),
+}
+
+
+def function_dirs() -> List[str]:
+    return sorted(
+        os.path.join(BACKEND_DIR, name) for name in os.listdir(BACKEND_DIR)
+        if os.path.isfile(os.path.join(BACKEND_DIR, name, 'index.py'))
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--check', action='store_true')
+    args = parser.parse_args()
+
+    stale = []
+    for function_dir in function_dirs():
+        for module, functions in SHARED_MODULES.items():
+            if functions is not None and os.path.basename(function_dir) not in functions:
+                continue
+            source = os.path.join(SHARED_DIR, module)
+            target = os.path.join(function_dir, module)
+            if os.path.exists(target) and filecmp.cmp(source, target, shallow=False):
+                continue
+            stale.append(os.path.relpath(target, BACKEND_DIR))
+            if not args.check:
+                shutil.copyfile(source, target)
+    for path in stale:
+        print(('differs: ' if args.check else 'updated: ') + path)
+    return 1 if args.check and stale else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,87 @@
+'''
+Sun sign and age throughput for 1M birth dates: the previous per-call
+strptime + linear scan against the day-of-year table, per call and batched,
+for date objects (as psycopg2 returns them) and ISO strings
+Run: python benchmarks/astro_dates_throughput.py [--count N]
+'''
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend', 'shared'))
+
+from astro_dates import (  # noqa: E402
+    calculate_age, calculate_ages, calculate_zodiac_sign, calculate_zodiac_signs
+)
+
+
+def legacy_zodiac_sign(birth_date: str) -> str:
+    # The implementation the table replaced, kept here as the baseline
+    parsed = datetime.strptime(birth_date, '%Y-%m-%d')
+    month = parsed.month
+    day = parsed.day
+    zodiac_signs = [
+        ('Козерог', 1, 1, 1, 19), ('Водолей', 1, 20, 2, 18),
+        ('Рыбы', 2, 19, 3, 20), ('Овен', 3, 21, 4, 19),
+        ('Телец', 4, 20, 5, 20), ('Близнецы', 5, 21, 6, 20),
+        ('Рак', 6, 21, 7, 22), ('Лев', 7, 23, 8, 22),
+        ('Дева', 8, 23, 9, 22), ('Весы', 9, 23, 10, 22),
+        ('Скорпион', 10, 23, 11, 21), ('Стрелец', 11, 22, 12, 21),
+        ('Козерог', 12, 22, 12, 31)
+    ]
+    for sign, start_month, start_day, end_month, end_day in zodiac_signs:
+        if (month == start_month and day >= start_day) or (month == end_month and day <= end_day):
+            return sign
+    return 'Козерог'
+
+
+def legacy_age(birth_date_str: str) -> int:
+    birth_date = datetime.strptime(str(birth_date_str), '%Y-%m-%d')
+    today = datetime.today()
+    return today.year - birth_date.year - ((today.month, today.day) < (birth_date.month, birth_date.day))
+
+
+def measure(label: str, fn, count: int) -> float:
+    started = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - started
+    print(f'{label:<34}{elapsed * 1000:10.1f} ms {count / elapsed:14,.0f}/s')
+    return elapsed
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--count', type=int, default=1000000)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    start = date(1940, 1, 1)
+    dates = [start + timedelta(days=rng.randrange(365 * 70)) for _ in range(args.count)]
+    strings = [value.isoformat() for value in dates]
+
+    if calculate_zodiac_signs(strings[:100000]) != [legacy_zodiac_sign(value) for value in strings[:100000]]:
+        print('sign mismatch against the previous implementation')
+        return 1
+
+    count = args.count
+    baseline = measure('sign, legacy (str)', lambda: [legacy_zodiac_sign(value) for value in strings], count)
+    measure('sign, per call (str)', lambda: [calculate_zodiac_sign(value) for value in strings], count)
+    measure('sign, per call (date)', lambda: [calculate_zodiac_sign(value) for value in dates], count)
+    measure('sign, batched (str)', lambda: calculate_zodiac_signs(strings), count)
+    batched = measure('sign, batched (date)', lambda: calculate_zodiac_signs(dates), count)
+    print(f'sign speedup, batched dates over legacy: {baseline / batched:.0f}x')
+
+    today = date.today()
+    baseline = measure('age, legacy (str)', lambda: [legacy_age(value) for value in strings], count)
+    measure('age, per call (date)', lambda: [calculate_age(value, today) for value in dates], count)
+    batched = measure('age, batched (date)', lambda: calculate_ages(dates, today), count)
+    print(f'age speedup, batched dates over legacy: {baseline / batched:.0f}x')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
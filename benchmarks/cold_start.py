@@ -0,0 +1,66 @@
+'''
+Cold start per function: `python -X importtime -c "import index"` in each
+backend function directory, best of several fresh interpreters, checked
+against a per-function import budget. The slowest modules of each function
+are printed and, with --output, written to a file kept as a test artifact.
+Run: python benchmarks/cold_start.py [--output import_profile.txt]
+'''
+
+import argparse
+import os
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend')
+
+# Milliseconds for `import index`; psycopg2 must not be imported at module load at all
+BUDGETS_MS = {'auth': 45, 'chat': 40, 'search': 40, 'natal-chart': 50}
+TOP_MODULES = 12
+
+
+def profile(function: str) -> Tuple[float, List[Tuple[int, str]]]:
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import index; import sys; '
+         'sys.exit("psycopg2" in sys.modules)'],
+        cwd=os.path.join(BACKEND_DIR, function), capture_output=True, text=True
+    )
+    if result.returncode:
+        raise SystemExit(f'{function}: psycopg2 is imported at module load\n{result.stderr[-2000:]}')
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative_us, name = line.split('|')
+        modules.append((int(cumulative_us), name.rstrip()))
+    total = next(cumulative for cumulative, name in reversed(modules) if name.strip() == 'index')
+    return total / 1000, sorted(modules, reverse=True)[:TOP_MODULES]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--output')
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    report: List[str] = []
+    over_budget: Dict[str, float] = {}
+    for function, budget in BUDGETS_MS.items():
+        runs = [profile(function) for _ in range(args.runs)]
+        total, modules = min(runs)
+        report.append(f'{function}: import {total:.1f} ms (budget {budget} ms)')
+        report.extend(f'    {cumulative / 1000:7.1f} ms  {name.strip()}' for cumulative, name in modules)
+        if total > budget:
+            over_budget[function] = total
+
+    print('\n'.join(report))
+    if args.output:
+        with open(args.output, 'w') as output:
+            output.write('\n'.join(report) + '\n')
+    for function, total in over_budget.items():
+        print(f'OVER BUDGET: {function} {total:.1f} ms > {BUDGETS_MS[function]} ms', file=sys.stderr)
+    return 1 if over_budget else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
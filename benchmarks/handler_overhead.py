@@ -0,0 +1,90 @@
+'''
+Handler overhead per invocation, excluding database work: the previous
+inline style (json.loads, if/elif action chain, header dicts and json.dumps
+built per request) vs the shared runtime Router, for a preflight request
+and a POST whose action is last in a five-action chain
+Run: python benchmarks/handler_overhead.py
+'''
+
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend', 'auth'))
+
+import runtime  # noqa: E402
+from runtime import Router  # noqa: E402
+
+ACTIONS = ('register', 'login', 'verify_token', 'logout', 'ping')
+CREATED_AT = datetime(2024, 5, 1, 12, 30)
+PAYLOAD = {'user_id': 42, 'name': 'Тестовый Пользователь', 'email': 'test@example.com', 'created_at': CREATED_AT}
+
+
+def legacy_handler(event, context):
+    method = event.get('httpMethod', 'GET')
+    if method == 'OPTIONS':
+        return {
+            'statusCode': 200,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',
+                'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
+                'Access-Control-Allow-Headers': 'Content-Type, X-User-Id',
+                'Access-Control-Max-Age': '86400'
+            },
+            'body': '',
+            'isBase64Encoded': False
+        }
+    if method == 'POST':
+        body_data = json.loads(event.get('body', '{}'))
+        action = body_data.get('action')
+        for name in ACTIONS:
+            if action == name and name == 'ping':
+                return {
+                    'statusCode': 200,
+                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                    'isBase64Encoded': False,
+                    'body': json.dumps({**PAYLOAD, 'created_at': str(PAYLOAD['created_at'])})
+                }
+    return {
+        'statusCode': 405,
+        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+        'isBase64Encoded': False,
+        'body': json.dumps({'error': 'Method not allowed'})
+    }
+
+
+# Request tracing stays on; only the log line's stdout write is left out of the measurement
+runtime.trace_sink = lambda record: None
+router = Router('Content-Type, X-User-Id')
+for action_name in ACTIONS:
+    router.action(action_name)(lambda request: PAYLOAD)
+
+
+def per_call(fn, event, count: int = 100000, repeat: int = 5) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(count):
+            fn(event, None)
+        best = min(best, time.perf_counter() - started)
+    return best / count * 1e6
+
+
+def main() -> None:
+    events = {
+        'OPTIONS': {'httpMethod': 'OPTIONS'},
+        'POST ping': {'httpMethod': 'POST', 'body': json.dumps({'action': 'ping', 'user_id': 42})},
+    }
+    for label, event in events.items():
+        before = per_call(legacy_handler, event)
+        after = per_call(router.handle, event)
+        size_before = len(legacy_handler(event, None)['body'].encode())
+        size_after = len(router.handle(event, None)['body'].encode())
+        print(f'{label:<10} before={before:6.2f} us  after={after:6.2f} us  ({before / after:4.1f}x)  '
+              f'body {size_before} -> {size_after} bytes')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,382 @@
+'''
+Load test: seeds a local Postgres with a synthetic dataset (users with real
+natal charts, match lists, credentials, chats and messages), replays a
+weighted mix of events through each function's handler(event, context)
+in-process and reports throughput, p50/p95/p99 latency and queries per
+request (from the runtime's request traces) for every action. With --baseline it exits 1 when an action got
+slower or runs more queries than in a saved --output report.
+Run: DATABASE_URL=postgresql://localhost/natal_load python benchmarks/load_test.py --users 100000
+     (against a disposable database with db_migrations applied; seeding runs once)
+'''
+
+import argparse
+import importlib.util
+import json
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend')
+FUNCTIONS = ('auth', 'chat', 'natal-chart', 'search')
+for function_name in FUNCTIONS:
+    sys.path.insert(0, os.path.join(BACKEND_DIR, function_name))
+
+import runtime  # noqa: E402
+
+EMAIL_DOMAIN = 'load.test'
+PASSWORD = 'load-test-password'
+FIRST_NAMES = ('Анна', 'Мария', 'Елена', 'Ольга', 'Дарья', 'Алексей', 'Иван', 'Дмитрий', 'Сергей', 'Максим',
+               'Anna', 'Maria', 'Alex', 'Ivan', 'Daniel')
+LAST_NAMES = ('Иванова', 'Смирнов', 'Кузнецова', 'Попов', 'Соколова', 'Лебедев', 'Новикова', 'Морозов',
+              'Petrova', 'Volkov')
+CITIES = ('Москва', 'Санкт-Петербург', 'Новосибирск', 'Екатеринбург', 'Казань', 'Нижний Новгород',
+          'Самара', 'Омск', 'Ростов-на-Дону', 'Уфа', 'Краснодар', 'Minsk', 'Kyiv', 'Almaty', 'Unknown')
+# (latitude, longitude) of a few of the cities above, for nearby searches
+NEARBY_POINTS = ((55.7558, 37.6173), (59.9386, 30.3141), (55.0415, 82.9346), (53.9, 27.5667), (43.25, 76.9167))
+MESSAGES = ('Привет!', 'Как дела?', 'Посмотри мою натальную карту', 'Мы так совместимы ✨',
+            'Встретимся в субботу?', 'Hi there', 'Луна в Рыбах, всё понятно')
+
+# Sub-millisecond actions jitter by more than any relative tolerance
+MIN_P95_SLOWDOWN_MS = 2.0
+
+# action -> relative weight within its function's mix
+MIXES = {
+    'search': {'search': 60, 'search_filtered': 15, 'search_nearby': 15, 'search_next_page': 10},
+    'chat': {'list_chats': 40, 'get_messages': 30, 'send_message': 15, 'mark_read': 10, 'create_chat': 5},
+    'natal-chart': {
+        'get_profile': 45, 'calculate_compatibility': 30, 'calculate_compatibility_batch': 10,
+        'update_birth_data': 10, 'create_profile': 5
+    },
+    'auth': {'verify_token': 80, 'login': 15, 'login_failed': 5},
+}
+
+
+class Context:
+    def __init__(self, function_name: str, request_id: str):
+        self.function_name = function_name
+        self.request_id = request_id
+
+
+def load_handler(function_name: str) -> Callable[[Dict[str, Any], Any], Dict[str, Any]]:
+    # Every function's entry point is index.py: load each under its own module name
+    path = os.path.join(BACKEND_DIR, function_name, 'index.py')
+    spec = importlib.util.spec_from_file_location(f'{function_name.replace("-", "_")}_index', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.handler
+
+
+def get(params: Dict[str, Any]) -> Dict[str, Any]:
+    return {'httpMethod': 'GET', 'queryStringParameters': {key: str(value) for key, value in params.items()}}
+
+
+def post(body: Dict[str, Any], source_ip: str = '10.0.0.1') -> Dict[str, Any]:
+    return {
+        'httpMethod': 'POST',
+        'body': json.dumps(body, ensure_ascii=False),
+        'requestContext': {'identity': {'sourceIp': source_ip}}
+    }
+
+
+def profile_record(rng: random.Random, index: int) -> Dict[str, Any]:
+    birth_date = date(1960, 1, 1) + timedelta(days=rng.randrange(365 * 45))
+    return {
+        'name': f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}',
+        'email': f'user{index}@{EMAIL_DOMAIN}',
+        'birth_date': birth_date.isoformat(),
+        'birth_time': f'{rng.randrange(24):02d}:{rng.randrange(60):02d}:00',
+        'birth_city': rng.choice(CITIES),
+        'gender': rng.choice(('male', 'female', 'other', None)),
+    }
+
+
+def seed(conn, args: argparse.Namespace) -> None:
+    from psycopg2.extras import execute_values
+
+    from bulk_import import import_profiles
+    from matches import refresh_user_matches
+    from passwords import hash_password
+
+    rng = random.Random(args.seed)
+    started = time.monotonic()
+    records = ((index, profile_record(rng, index), None) for index in range(args.users))
+    summary = import_profiles(conn, records, on_chunk=lambda processed, created, failed: print(
+        f'  users {created}/{args.users} {time.monotonic() - started:.0f}s', end='\r', flush=True
+    ))
+    user_ids = summary['user_ids']
+    print(f'  users {len(user_ids)} in {time.monotonic() - started:.1f}s')
+
+    cursor = conn.cursor()
+    active = user_ids[:args.active]
+    # Most active users have a match list; the rest exercise search's sign-based fallback
+    for user_id in active[:int(len(active) * 0.8)]:
+        cursor.execute(
+            "SELECT u.zodiac_sign, nc.chart_data FROM users u "
+            "JOIN natal_charts nc ON nc.user_id = u.id WHERE u.id = %s",
+            (user_id,)
+        )
+        row = cursor.fetchone()
+        refresh_user_matches(cursor, user_id, row['zodiac_sign'], row['chart_data'])
+    conn.commit()
+    print(f'  match lists {int(len(active) * 0.8)} in {time.monotonic() - started:.1f}s')
+
+    password_hash, salt, hash_version = hash_password(PASSWORD)
+    execute_values(cursor, "INSERT INTO user_credentials (user_id, password_hash, salt, hash_version) VALUES %s",
+                   [(user_id, password_hash, salt, hash_version) for user_id in active], page_size=1000)
+
+    pairs = set()
+    while len(pairs) < args.chats:
+        user1_id = rng.choice(active) if rng.random() < 0.5 else rng.choice(user_ids)
+        user2_id = rng.choice(user_ids)
+        if user1_id != user2_id:
+            pairs.add((min(user1_id, user2_id), max(user1_id, user2_id)))
+    chat_rows = execute_values(
+        cursor, "INSERT INTO chats (user1_id, user2_id) VALUES %s RETURNING id, user1_id, user2_id",
+        sorted(pairs), page_size=1000, fetch=True
+    )
+    conn.commit()
+
+    now = time.time()
+    for chunk_start in range(0, args.messages, 10000):
+        message_rows = []
+        for _ in range(min(10000, args.messages - chunk_start)):
+            chat = rng.choice(chat_rows)
+            sender_id = chat['user1_id'] if rng.random() < 0.5 else chat['user2_id']
+            sent_at = now - rng.randrange(90 * 86400)
+            message_rows.append((chat['id'], sender_id, rng.choice(MESSAGES), rng.random() < 0.8,
+                                 time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(sent_at))))
+        execute_values(cursor, "INSERT INTO messages (chat_id, sender_id, message_text, is_read, created_at) "
+                               "VALUES %s", message_rows, page_size=1000)
+        conn.commit()
+    # Same summary fill as migration V0005
+    cursor.execute(
+        "UPDATE chats c SET last_message_id = m.id, last_message_text = m.message_text, "
+        "last_message_at = m.created_at, last_sender_id = m.sender_id FROM ("
+        "SELECT DISTINCT ON (chat_id) id, chat_id, sender_id, message_text, created_at FROM messages "
+        "ORDER BY chat_id, created_at DESC, id DESC) m WHERE m.chat_id = c.id"
+    )
+    cursor.execute(
+        "UPDATE chats c SET user1_unread = u.user1_unread, user2_unread = u.user2_unread FROM ("
+        "SELECT m.chat_id, COUNT(*) FILTER (WHERE m.sender_id = ch.user2_id) AS user1_unread, "
+        "COUNT(*) FILTER (WHERE m.sender_id = ch.user1_id) AS user2_unread "
+        "FROM messages m JOIN chats ch ON ch.id = m.chat_id WHERE m.is_read = FALSE GROUP BY m.chat_id"
+        ") u WHERE u.chat_id = c.id"
+    )
+    cursor.execute('ANALYZE')
+    conn.commit()
+    cursor.close()
+    print(f'  chats {len(chat_rows)}, messages {args.messages} in {time.monotonic() - started:.1f}s')
+
+
+class Dataset:
+    def __init__(self, conn, active: int):
+        cursor = conn.cursor()
+        cursor.execute("SELECT id FROM users WHERE email LIKE %s ORDER BY id", (f'%@{EMAIL_DOMAIN}',))
+        self.user_ids = [row['id'] for row in cursor.fetchall()]
+        self.active = self.user_ids[:active]
+        cursor.execute("SELECT id, user1_id, user2_id FROM chats ORDER BY id")
+        self.chats = [(row['id'], row['user1_id'], row['user2_id']) for row in cursor.fetchall()]
+        cursor.execute("SELECT u.id, u.email FROM users u JOIN user_credentials uc ON uc.user_id = u.id")
+        self.emails = {row['id']: row['email'] for row in cursor.fetchall()}
+        cursor.close()
+        self.tokens: List[str] = []
+        self.cursors: Dict[int, str] = {}
+
+
+def make_event(function_name: str, action: str, data: Dataset, rng: random.Random,
+               sequence: int) -> Tuple[Dict[str, Any], Optional[Callable[[Dict[str, Any]], None]]]:
+    '''(event, optional callback on the parsed response body) for one request of the mix.'''
+    user_id = rng.choice(data.active)
+    if function_name == 'search':
+        params: Dict[str, Any] = {'current_user_id': user_id, 'min_compatibility': rng.choice((0, 50, 60, 70))}
+        if action == 'search_filtered':
+            params.update(gender=rng.choice(('male', 'female')), min_age=rng.randrange(20, 35),
+                          max_age=rng.randrange(35, 60))
+        if action == 'search_nearby':
+            latitude, longitude = rng.choice(NEARBY_POINTS)
+            params.update(near=1, latitude=latitude, longitude=longitude, min_age=rng.randrange(20, 35),
+                          max_age=rng.randrange(35, 60))
+        if action == 'search_next_page' and data.cursors:
+            user_id, params['cursor'] = rng.choice(list(data.cursors.items()))
+            params['current_user_id'] = user_id
+
+        def remember_cursor(body: Dict[str, Any], user_id: int = user_id) -> None:
+            if body.get('next_cursor'):
+                data.cursors[user_id] = body['next_cursor']
+        return get(params), remember_cursor
+
+    if function_name == 'chat':
+        chat_id, user1_id, user2_id = rng.choice(data.chats)
+        if action == 'list_chats':
+            return get({'user_id': user1_id}), None
+        if action == 'get_messages':
+            return post({'action': 'get_messages', 'chat_id': chat_id, 'limit': 50}), None
+        if action == 'send_message':
+            return post({'action': 'send_message', 'chat_id': chat_id, 'sender_id': user1_id,
+                         'message_text': rng.choice(MESSAGES)}), None
+        if action == 'mark_read':
+            return post({'action': 'mark_read', 'chat_id': chat_id, 'user_id': user2_id}), None
+        other_id = rng.choice(data.user_ids)
+        return post({'action': 'create_chat', 'user1_id': min(user_id, other_id),
+                     'user2_id': max(user_id, other_id)}), None
+
+    if function_name == 'natal-chart':
+        if action == 'get_profile':
+            return get({'user_id': rng.choice(data.user_ids)}), None
+        if action == 'calculate_compatibility':
+            return post({'action': action, 'user1_id': user_id, 'user2_id': rng.choice(data.user_ids)}), None
+        if action == 'calculate_compatibility_batch':
+            # One results grid worth of partners
+            return post({'action': action, 'user_id': user_id, 'partner_ids': rng.sample(data.user_ids, 60)}), None
+        record = profile_record(rng, sequence)
+        if action == 'update_birth_data':
+            return post({'action': action, 'user_id': user_id, **record}), None
+        record['email'] = f'new{sequence}-{time.time_ns()}@{EMAIL_DOMAIN}'
+        return post({'action': action, **record}), None
+
+    if action == 'verify_token' and data.tokens:
+        return post({'action': 'verify_token', 'session_token': rng.choice(data.tokens)}), None
+    password = PASSWORD if action != 'login_failed' else 'wrong-password'
+    credentials_id = rng.choice(list(data.emails))
+
+    def remember_token(body: Dict[str, Any]) -> None:
+        if body.get('session_token'):
+            data.tokens.append(body['session_token'])
+    # One client address per account, as from real devices, so the per-IP login budget is not the bottleneck
+    source_ip = f'10.{credentials_id >> 16 & 255}.{credentials_id >> 8 & 255}.{credentials_id & 255}'
+    return post({'action': 'login', 'email': data.emails[credentials_id], 'password': password},
+                source_ip), remember_token
+
+
+class TraceCollector:
+    '''Takes the runtime's per-invocation trace records instead of printing them.'''
+    def __init__(self):
+        self.last: Dict[str, Any] = {}
+
+    def __call__(self, record: Dict[str, Any]) -> None:
+        self.last = record
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def run(function_name: str, requests: int, data: Dataset, rng: random.Random,
+        collector: TraceCollector) -> Dict[str, Dict[str, float]]:
+    handler = load_handler(function_name)
+    actions = list(MIXES[function_name])
+    weights = [MIXES[function_name][action] for action in actions]
+    samples: Dict[str, List[Tuple[float, int, float]]] = {action: [] for action in actions}
+    errors = {action: 0 for action in actions}
+
+    for sequence in range(requests):
+        action = rng.choices(actions, weights)[0]
+        event, on_response = make_event(function_name, action, data, rng, sequence)
+        started = time.perf_counter()
+        response = handler(event, Context(function_name, f'load-{sequence}'))
+        elapsed = time.perf_counter() - started
+        samples[action].append((elapsed, collector.last['queries'], collector.last['db_ms']))
+        expected_error = action == 'login_failed' and response['statusCode'] == 401
+        if response['statusCode'] != 200 and not expected_error:
+            errors[action] += 1
+        elif on_response and response['statusCode'] == 200:
+            on_response(json.loads(response['body']))
+
+    report = {}
+    for action, action_samples in samples.items():
+        if not action_samples:
+            continue
+        latencies = sorted(sample[0] for sample in action_samples)
+        total = sum(latencies)
+        report[action] = {
+            'requests': len(action_samples),
+            'errors': errors[action],
+            'rps': round(len(latencies) / total, 1) if total else 0.0,
+            'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+            'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+            'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+            'queries': round(sum(sample[1] for sample in action_samples) / len(action_samples), 2),
+            'db_ms': round(sum(sample[2] for sample in action_samples) / len(action_samples), 2),
+        }
+    return report
+
+
+def regressions(report: Dict[str, Dict[str, Dict[str, float]]], baseline: Dict[str, Dict[str, Dict[str, float]]],
+                tolerance: float) -> List[str]:
+    found = []
+    for function_name, actions in report.items():
+        for action, stats in actions.items():
+            before = baseline.get(function_name, {}).get(action)
+            if not before:
+                continue
+            slower = stats['p95_ms'] - before['p95_ms']
+            if stats['p95_ms'] > before['p95_ms'] * (1 + tolerance) and slower > MIN_P95_SLOWDOWN_MS:
+                found.append(f'{function_name}.{action}: p95 {before["p95_ms"]} -> {stats["p95_ms"]} ms')
+            if stats['queries'] > before['queries'] + 0.5:
+                found.append(f'{function_name}.{action}: queries {before["queries"]} -> {stats["queries"]}')
+    return found
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--active', type=int, default=500, help='users that send requests')
+    parser.add_argument('--chats', type=int, default=20000)
+    parser.add_argument('--messages', type=int, default=200000)
+    parser.add_argument('--requests', type=int, default=2000, help='per function')
+    parser.add_argument('--functions', default='search,chat,natal-chart,auth')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output')
+    parser.add_argument('--baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed p95 growth over the baseline')
+    args = parser.parse_args()
+
+    if not os.environ.get('DATABASE_URL'):
+        parser.error('DATABASE_URL must point to a disposable database with the migrations applied')
+
+    import psycopg2
+    from psycopg2.extras import RealDictCursor
+
+    conn = psycopg2.connect(os.environ['DATABASE_URL'], cursor_factory=RealDictCursor)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT count(*) AS seeded FROM users WHERE email LIKE %s", (f'%@{EMAIL_DOMAIN}',))
+            seeded = cursor.fetchone()['seeded']
+        if not seeded:
+            print(f'seeding {args.users} users, {args.chats} chats, {args.messages} messages')
+            seed(conn, args)
+        data = Dataset(conn, args.active)
+    finally:
+        conn.close()
+
+    collector = TraceCollector()
+    runtime.trace_sink = collector
+    report = {}
+    print(f'{"action":<42}{"req":>6}{"err":>5}{"rps":>9}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}'
+          f'{"queries":>9}{"db ms":>8}')
+    for function_name in args.functions.split(','):
+        report[function_name] = run(function_name, args.requests, data, random.Random(args.seed), collector)
+        for action, stats in report[function_name].items():
+            print(f'{function_name + "." + action:<42}{stats["requests"]:>6}{stats["errors"]:>5}{stats["rps"]:>9}'
+                  f'{stats["p50_ms"]:>9}{stats["p95_ms"]:>9}{stats["p99_ms"]:>9}{stats["queries"]:>9}'
+                  f'{stats["db_ms"]:>8}')
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(report, output, indent=2)
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            found = regressions(report, json.load(baseline_file), args.tolerance)
+        for line in found:
+            print(f'REGRESSION {line}')
+        return 1 if found else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,46 @@
+'''
+Login hashing throughput: password verifications/sec for each hash version,
+on one thread (per core) and through the bounded KDF pool with HASH_WORKERS
+concurrent callers, plus the unknown-email (dummy hash) path
+Run: python benchmarks/login_throughput.py
+'''
+
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend', 'auth'))
+
+from passwords import HASH_PARAMS, HASH_WORKERS, derive, verify_dummy, verify_password  # noqa: E402
+
+SALT = 'a1b2c3d4e5f60718293a4b5c6d7e8f90'
+
+
+def rate(fn, count: int, callers: int = 1) -> float:
+    started = time.perf_counter()
+    if callers == 1:
+        for _ in range(count):
+            fn()
+    else:
+        with ThreadPoolExecutor(max_workers=callers) as callers_pool:
+            for future in [callers_pool.submit(fn) for _ in range(count)]:
+                future.result()
+    return count / (time.perf_counter() - started)
+
+
+def main() -> None:
+    print(f'cores={os.cpu_count()}  hash_workers={HASH_WORKERS}')
+    for version in sorted(HASH_PARAMS):
+        stored = derive('correct horse', SALT, version)
+        count = 40 if version == 1 else 25
+        single = rate(lambda: verify_password('correct horse', stored, SALT, version), count)
+        pooled = rate(lambda: verify_password('correct horse', stored, SALT, version),
+                      count * HASH_WORKERS, HASH_WORKERS)
+        print(f'v{version} {HASH_PARAMS[version]["algorithm"]:<14} single={single:7.1f}/s  '
+              f'pool={pooled:7.1f}/s  per_core={pooled / HASH_WORKERS:7.1f}/s')
+    print(f'unknown email (dummy hash) single={rate(lambda: verify_dummy("x"), 25):7.1f}/s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+'''
+Synastry throughput: one user scored against 1 and 10k candidates,
+pairwise (synastry per candidate) vs batched (synastry_batch)
+Run: python benchmarks/synastry_throughput.py
+'''
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend', 'natal-chart'))
+
+from compatibility import SIGNS  # noqa: E402
+from synastry import BODIES, synastry, synastry_batch  # noqa: E402
+
+
+def random_chart(rng: random.Random) -> dict:
+    return {body: rng.uniform(0, 360) for body in BODIES}
+
+
+def measure(fn, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main() -> None:
+    rng = random.Random(42)
+    chart = random_chart(rng)
+    for count in (1, 10000):
+        charts = [random_chart(rng) for _ in range(count)]
+        signs = [rng.choice(SIGNS) for _ in range(count)]
+        repeat = 200 if count == 1 else 3
+
+        pairwise = measure(lambda: [synastry('Овен', sign, chart, other)['score']
+                                    for sign, other in zip(signs, charts)], repeat)
+        batched = measure(lambda: synastry_batch('Овен', chart, signs, charts), repeat)
+        print(f'candidates={count:>6}  pairwise={pairwise * 1000:9.3f} ms ({count / pairwise:12.0f}/s)  '
+              f'batched={batched * 1000:9.3f} ms ({count / batched:12.0f}/s)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,7 @@
+-- Keep only the latest natal chart per user so charts can be upserted by user_id
+DELETE FROM natal_charts nc
+USING natal_charts newer
+WHERE nc.user_id = newer.user_id AND nc.id < newer.id;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_natal_charts_user_id_unique ON natal_charts(user_id);
+DROP INDEX IF EXISTS idx_natal_charts_user_id;
@@ -0,0 +1,39 @@
+-- Denormalized per-chat summary so the chat list is served from one query
+ALTER TABLE chats ADD COLUMN last_message_id INTEGER;
+ALTER TABLE chats ADD COLUMN last_message_text TEXT;
+ALTER TABLE chats ADD COLUMN last_message_at TIMESTAMP;
+ALTER TABLE chats ADD COLUMN last_sender_id INTEGER;
+ALTER TABLE chats ADD COLUMN user1_unread INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE chats ADD COLUMN user2_unread INTEGER NOT NULL DEFAULT 0;
+
+-- Fill the summary for existing chats
+UPDATE chats c
+SET last_message_id = m.id,
+    last_message_text = m.message_text,
+    last_message_at = m.created_at,
+    last_sender_id = m.sender_id
+FROM (
+    SELECT DISTINCT ON (chat_id) id, chat_id, sender_id, message_text, created_at
+    FROM messages
+    ORDER BY chat_id, created_at DESC, id DESC
+) m
+WHERE m.chat_id = c.id;
+
+UPDATE chats c
+SET user1_unread = u.user1_unread,
+    user2_unread = u.user2_unread
+FROM (
+    SELECT m.chat_id,
+           COUNT(*) FILTER (WHERE m.sender_id = ch.user2_id) AS user1_unread,
+           COUNT(*) FILTER (WHERE m.sender_id = ch.user1_id) AS user2_unread
+    FROM messages m
+    JOIN chats ch ON ch.id = m.chat_id
+    WHERE m.is_read = FALSE
+    GROUP BY m.chat_id
+) u
+WHERE u.chat_id = c.id;
+
+-- Message history per chat in (created_at, id) order and unread lookups
+CREATE INDEX IF NOT EXISTS idx_messages_chat_created ON messages(chat_id, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_messages_chat_unread ON messages(chat_id, sender_id) WHERE is_read = FALSE;
+DROP INDEX IF EXISTS idx_messages_chat;
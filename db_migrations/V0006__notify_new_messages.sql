@@ -0,0 +1,11 @@
+-- Wake up long-polling chat readers: NOTIFY chat_<chat_id> with the new message id
+CREATE OR REPLACE FUNCTION notify_new_message() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('chat_' || NEW.chat_id, NEW.id::text);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER messages_notify_insert
+AFTER INSERT ON messages
+FOR EACH ROW EXECUTE FUNCTION notify_new_message();
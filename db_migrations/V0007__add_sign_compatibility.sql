@@ -0,0 +1,25 @@
+-- Sun-sign pair compatibility scores (same matrix as the natal-chart function) for SQL-side ranking
+CREATE TABLE IF NOT EXISTS sign_compatibility (
+    sign1 VARCHAR(20) NOT NULL,
+    sign2 VARCHAR(20) NOT NULL,
+    score INTEGER NOT NULL CHECK (score >= 0 AND score <= 100),
+    PRIMARY KEY (sign1, sign2)
+);
+
+INSERT INTO sign_compatibility (sign1, sign2, score) VALUES
+    ('Овен', 'Овен', 75), ('Овен', 'Телец', 65), ('Овен', 'Близнецы', 85), ('Овен', 'Рак', 60), ('Овен', 'Лев', 90), ('Овен', 'Дева', 70), ('Овен', 'Весы', 80), ('Овен', 'Скорпион', 65), ('Овен', 'Стрелец', 95), ('Овен', 'Козерог', 60), ('Овен', 'Водолей', 85), ('Овен', 'Рыбы', 70),
+    ('Телец', 'Овен', 65), ('Телец', 'Телец', 80), ('Телец', 'Близнецы', 70), ('Телец', 'Рак', 90), ('Телец', 'Лев', 75), ('Телец', 'Дева', 95), ('Телец', 'Весы', 85), ('Телец', 'Скорпион', 88), ('Телец', 'Стрелец', 65), ('Телец', 'Козерог', 92), ('Телец', 'Водолей', 70), ('Телец', 'Рыбы', 85),
+    ('Близнецы', 'Овен', 85), ('Близнецы', 'Телец', 70), ('Близнецы', 'Близнецы', 82), ('Близнецы', 'Рак', 68), ('Близнецы', 'Лев', 88), ('Близнецы', 'Дева', 78), ('Близнецы', 'Весы', 94), ('Близнецы', 'Скорпион', 72), ('Близнецы', 'Стрелец', 90), ('Близнецы', 'Козерог', 65), ('Близнецы', 'Водолей', 92), ('Близнецы', 'Рыбы', 75),
+    ('Рак', 'Овен', 60), ('Рак', 'Телец', 90), ('Рак', 'Близнецы', 68), ('Рак', 'Рак', 85), ('Рак', 'Лев', 70), ('Рак', 'Дева', 88), ('Рак', 'Весы', 75), ('Рак', 'Скорпион', 94), ('Рак', 'Стрелец', 62), ('Рак', 'Козерог', 85), ('Рак', 'Водолей', 68), ('Рак', 'Рыбы', 95),
+    ('Лев', 'Овен', 90), ('Лев', 'Телец', 75), ('Лев', 'Близнецы', 88), ('Лев', 'Рак', 70), ('Лев', 'Лев', 82), ('Лев', 'Дева', 72), ('Лев', 'Весы', 85), ('Лев', 'Скорпион', 75), ('Лев', 'Стрелец', 93), ('Лев', 'Козерог', 68), ('Лев', 'Водолей', 88), ('Лев', 'Рыбы', 73),
+    ('Дева', 'Овен', 70), ('Дева', 'Телец', 95), ('Дева', 'Близнецы', 78), ('Дева', 'Рак', 88), ('Дева', 'Лев', 72), ('Дева', 'Дева', 85), ('Дева', 'Весы', 80), ('Дева', 'Скорпион', 90), ('Дева', 'Стрелец', 68), ('Дева', 'Козерог', 94), ('Дева', 'Водолей', 75), ('Дева', 'Рыбы', 82),
+    ('Весы', 'Овен', 80), ('Весы', 'Телец', 85), ('Весы', 'Близнецы', 94), ('Весы', 'Рак', 75), ('Весы', 'Лев', 85), ('Весы', 'Дева', 80), ('Весы', 'Весы', 83), ('Весы', 'Скорпион', 78), ('Весы', 'Стрелец', 88), ('Весы', 'Козерог', 72), ('Весы', 'Водолей', 95), ('Весы', 'Рыбы', 78),
+    ('Скорпион', 'Овен', 65), ('Скорпион', 'Телец', 88), ('Скорпион', 'Близнецы', 72), ('Скорпион', 'Рак', 94), ('Скорпион', 'Лев', 75), ('Скорпион', 'Дева', 90), ('Скорпион', 'Весы', 78), ('Скорпион', 'Скорпион', 86), ('Скорпион', 'Стрелец', 70), ('Скорпион', 'Козерог', 92), ('Скорпион', 'Водолей', 73), ('Скорпион', 'Рыбы', 93),
+    ('Стрелец', 'Овен', 95), ('Стрелец', 'Телец', 65), ('Стрелец', 'Близнецы', 90), ('Стрелец', 'Рак', 62), ('Стрелец', 'Лев', 93), ('Стрелец', 'Дева', 68), ('Стрелец', 'Весы', 88), ('Стрелец', 'Скорпион', 70), ('Стрелец', 'Стрелец', 84), ('Стрелец', 'Козерог', 67), ('Стрелец', 'Водолей', 91), ('Стрелец', 'Рыбы', 72),
+    ('Козерог', 'Овен', 60), ('Козерог', 'Телец', 92), ('Козерог', 'Близнецы', 65), ('Козерог', 'Рак', 85), ('Козерог', 'Лев', 68), ('Козерог', 'Дева', 94), ('Козерог', 'Весы', 72), ('Козерог', 'Скорпион', 92), ('Козерог', 'Стрелец', 67), ('Козерог', 'Козерог', 87), ('Козерог', 'Водолей', 70), ('Козерог', 'Рыбы', 83),
+    ('Водолей', 'Овен', 85), ('Водолей', 'Телец', 70), ('Водолей', 'Близнецы', 92), ('Водолей', 'Рак', 68), ('Водолей', 'Лев', 88), ('Водолей', 'Дева', 75), ('Водолей', 'Весы', 95), ('Водолей', 'Скорпион', 73), ('Водолей', 'Стрелец', 91), ('Водолей', 'Козерог', 70), ('Водолей', 'Водолей', 84), ('Водолей', 'Рыбы', 77),
+    ('Рыбы', 'Овен', 70), ('Рыбы', 'Телец', 85), ('Рыбы', 'Близнецы', 75), ('Рыбы', 'Рак', 95), ('Рыбы', 'Лев', 73), ('Рыбы', 'Дева', 82), ('Рыбы', 'Весы', 78), ('Рыбы', 'Скорпион', 93), ('Рыбы', 'Стрелец', 72), ('Рыбы', 'Козерог', 83), ('Рыбы', 'Водолей', 77), ('Рыбы', 'Рыбы', 88)
+ON CONFLICT (sign1, sign2) DO UPDATE SET score = EXCLUDED.score;
+
+-- Search walks each compatible sign's users in id order
+CREATE INDEX IF NOT EXISTS idx_users_zodiac_id ON users(zodiac_sign, id);
@@ -0,0 +1,11 @@
+-- Materialized top candidates per user, refreshed incrementally by the natal-chart function
+CREATE TABLE IF NOT EXISTS user_matches (
+    user_id INTEGER NOT NULL REFERENCES users(id),
+    candidate_id INTEGER NOT NULL REFERENCES users(id),
+    score INTEGER NOT NULL CHECK (score >= 0 AND score <= 100),
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (user_id, candidate_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_user_matches_rank ON user_matches(user_id, score DESC, candidate_id);
+CREATE INDEX IF NOT EXISTS idx_user_matches_candidate ON user_matches(candidate_id);
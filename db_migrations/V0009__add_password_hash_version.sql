@@ -0,0 +1,3 @@
+-- KDF parameter version per credential; version 1 is the original PBKDF2-SHA256 (100k iterations)
+-- and is upgraded transparently on the next successful login
+ALTER TABLE user_credentials ADD COLUMN IF NOT EXISTS hash_version SMALLINT NOT NULL DEFAULT 1;
@@ -0,0 +1,45 @@
+-- Range-partition user_sessions by expires_at (one partition per month) so expired
+-- sessions go away with a partition drop instead of row deletes and index bloat;
+-- the (expires_at, id) primary key doubles as the index for batched expiry deletes
+DROP INDEX IF EXISTS idx_user_sessions_token;
+DROP INDEX IF EXISTS idx_user_sessions_user_id;
+ALTER TABLE user_sessions RENAME TO user_sessions_legacy;
+ALTER TABLE user_sessions_legacy RENAME CONSTRAINT user_sessions_pkey TO user_sessions_legacy_pkey;
+ALTER TABLE user_sessions_legacy RENAME CONSTRAINT user_sessions_session_token_key TO user_sessions_legacy_session_token_key;
+ALTER SEQUENCE user_sessions_id_seq RENAME TO user_sessions_legacy_id_seq;
+
+CREATE TABLE user_sessions (
+    id BIGSERIAL,
+    user_id INTEGER REFERENCES users(id),
+    session_token VARCHAR(255) NOT NULL,
+    expires_at TIMESTAMP NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (expires_at, id)
+) PARTITION BY RANGE (expires_at);
+
+CREATE INDEX IF NOT EXISTS idx_user_sessions_token ON user_sessions(session_token);
+CREATE INDEX IF NOT EXISTS idx_user_sessions_user_created ON user_sessions(user_id, created_at DESC);
+
+-- Idempotent; called by the session sweeper for the months ahead
+CREATE OR REPLACE FUNCTION create_user_sessions_partition(month_start DATE) RETURNS TEXT AS $$
+DECLARE
+    start_date DATE := date_trunc('month', month_start)::date;
+    partition_name TEXT := 'user_sessions_' || to_char(start_date, 'YYYY_MM');
+BEGIN
+    EXECUTE format(
+        'CREATE TABLE IF NOT EXISTS %I PARTITION OF user_sessions FOR VALUES FROM (%L) TO (%L)',
+        partition_name, start_date, (start_date + INTERVAL '1 month')::date
+    );
+    RETURN partition_name;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT create_user_sessions_partition((CURRENT_DATE + make_interval(months => m))::date)
+FROM generate_series(0, 2) AS m;
+
+INSERT INTO user_sessions (user_id, session_token, expires_at, created_at)
+SELECT user_id, session_token, expires_at, created_at
+FROM user_sessions_legacy
+WHERE expires_at > CURRENT_TIMESTAMP;
+
+DROP TABLE user_sessions_legacy;
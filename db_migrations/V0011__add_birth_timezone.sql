@@ -0,0 +1,3 @@
+-- IANA timezone of the birth place, resolved together with the coordinates from birth_city by the
+-- offline gazetteer; charts use its UTC offset at the birth moment instead of local mean time
+ALTER TABLE users ADD COLUMN IF NOT EXISTS birth_timezone VARCHAR(64);
@@ -0,0 +1,11 @@
+-- A pair's compatibility is symmetric: store it once, keyed (smaller user id, larger user id)
+-- Rows from the original calculate_compatibility carry only a sun-sign score and no details; drop them so
+-- the pair is recomputed (the function also treats NULL details as a miss)
+DELETE FROM compatibility_cache WHERE compatibility_details IS NULL;
+
+DELETE FROM compatibility_cache c USING compatibility_cache m
+WHERE c.user1_id > c.user2_id AND m.user1_id = c.user2_id AND m.user2_id = c.user1_id;
+
+UPDATE compatibility_cache SET user1_id = user2_id, user2_id = user1_id WHERE user1_id > user2_id;
+
+ALTER TABLE compatibility_cache ADD CONSTRAINT compatibility_cache_ordered_pair CHECK (user1_id <= user2_id);
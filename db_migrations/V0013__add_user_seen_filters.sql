@@ -0,0 +1,9 @@
+-- Per-user Bloom filter over the users they have viewed or liked, so search can skip
+-- already-seen profiles without a NOT IN subquery over user_interactions
+CREATE TABLE IF NOT EXISTS user_seen_filters (
+    user_id INTEGER PRIMARY KEY REFERENCES users(id),
+    bits BYTEA NOT NULL,
+    items INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
@@ -0,0 +1,9 @@
+-- Current location (defaults to the birth place) and its coarse geohash cell, see backend/shared/geo.py;
+-- existing users get theirs from backend/natal-chart/backfill_locations.py
+ALTER TABLE users ADD COLUMN IF NOT EXISTS latitude DOUBLE PRECISION;
+ALTER TABLE users ADD COLUMN IF NOT EXISTS longitude DOUBLE PRECISION;
+ALTER TABLE users ADD COLUMN IF NOT EXISTS geo_cell VARCHAR(12);
+
+-- Search buckets: (cell, sun sign, gender) equality, then age as a birth_date range; id is included
+-- so nearby search picks a page's candidates from the index alone
+CREATE INDEX IF NOT EXISTS idx_users_candidates ON users(geo_cell, zodiac_sign, gender, birth_date) INCLUDE (id);
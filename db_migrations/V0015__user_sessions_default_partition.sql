@@ -0,0 +1,28 @@
+-- Catch-all for sessions outside the monthly partitions, so logins keep working when the
+-- session sweeper has not created the month ahead; its expired rows go with the batched deletes
+CREATE TABLE IF NOT EXISTS user_sessions_default PARTITION OF user_sessions DEFAULT;
+
+-- A month's partition cannot be created while the default holds rows for that month: build it
+-- detached, move those rows over and attach it (the attach adds the primary key and indexes)
+CREATE OR REPLACE FUNCTION create_user_sessions_partition(month_start DATE) RETURNS TEXT AS $$
+DECLARE
+    start_date DATE := date_trunc('month', month_start)::date;
+    end_date DATE := (start_date + INTERVAL '1 month')::date;
+    partition_name TEXT := 'user_sessions_' || to_char(start_date, 'YYYY_MM');
+BEGIN
+    IF to_regclass(partition_name) IS NOT NULL THEN
+        RETURN partition_name;
+    END IF;
+    EXECUTE format('CREATE TABLE %I (LIKE user_sessions INCLUDING DEFAULTS INCLUDING CONSTRAINTS)', partition_name);
+    EXECUTE format(
+        'WITH moved AS (DELETE FROM user_sessions_default WHERE expires_at >= %L AND expires_at < %L RETURNING *) '
+        'INSERT INTO %I SELECT * FROM moved',
+        start_date, end_date, partition_name
+    );
+    EXECUTE format(
+        'ALTER TABLE user_sessions ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+        partition_name, start_date, end_date
+    );
+    RETURN partition_name;
+END;
+$$ LANGUAGE plpgsql;
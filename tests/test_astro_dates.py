@@ -0,0 +1,62 @@
+'''
+astro_dates (shared): the day-of-year sign table and the age arithmetic
+reproduce the per-call implementations they replaced, kept as the baseline
+in benchmarks/astro_dates_throughput.py.
+'''
+
+import os
+import sys
+import unittest
+from datetime import date, timedelta
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'backend', 'shared'))
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+from astro_dates import (  # noqa: E402
+    calculate_age, calculate_ages, calculate_zodiac_sign, calculate_zodiac_signs
+)
+from astro_dates_throughput import legacy_age, legacy_zodiac_sign  # noqa: E402
+
+
+def days_of(year):
+    day = date(year, 1, 1)
+    while day.year == year:
+        yield day
+        day += timedelta(days=1)
+
+
+class ZodiacSignTest(unittest.TestCase):
+    def test_matches_legacy_scan(self):
+        # 1900 is not a leap year, 2000 is, 2001 is an ordinary one
+        for year in (1900, 2000, 2001):
+            days = list(days_of(year))
+            expected = [legacy_zodiac_sign(day.isoformat()) for day in days]
+            self.assertEqual([calculate_zodiac_sign(day) for day in days], expected, year)
+            self.assertEqual(calculate_zodiac_signs(days), expected, year)
+            self.assertEqual(calculate_zodiac_signs([day.isoformat() for day in days]), expected, year)
+
+    def test_string_inputs(self):
+        self.assertEqual(calculate_zodiac_sign('2000-02-29'), 'Рыбы')
+        self.assertEqual(calculate_zodiac_sign('1990-3-5'), 'Рыбы')
+        self.assertEqual(calculate_zodiac_sign('1990-12-31'), 'Козерог')
+
+
+class AgeTest(unittest.TestCase):
+    def test_matches_legacy_age(self):
+        today = date.today()
+        birth_dates = [date(1990, 1, 1), date(2000, 2, 29), today - timedelta(days=1),
+                       today - timedelta(days=365 * 30 + 7), today - timedelta(days=365 * 30 + 8)]
+        expected = [legacy_age(day.isoformat()) for day in birth_dates]
+        self.assertEqual([calculate_age(day) for day in birth_dates], expected)
+        self.assertEqual(calculate_ages(birth_dates), expected)
+
+    def test_birthday_boundary(self):
+        today = date(2026, 3, 1)
+        self.assertEqual(calculate_ages([date(2000, 2, 29), date(2000, 3, 1), date(2000, 3, 2)], today),
+                         [26, 26, 25])
+        self.assertEqual(calculate_age('2000-03-02', today), 25)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+'''
+bulk_create_profiles against a real Postgres: request validation and the
+duplicate email check, which matches emails exactly on both the input and
+the users table side.
+Skipped unless TEST_DATABASE_URL points at a disposable database with
+db_migrations applied (see test_chat_long_poll.py).
+'''
+
+import importlib.util
+import json
+import os
+import sys
+import unittest
+import uuid
+
+NATAL_CHART_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend', 'natal-chart')
+DATABASE_URL = os.environ.get('TEST_DATABASE_URL')
+SECRET = 'bulk-import-test-secret'
+
+
+def load_natal_chart_module():
+    os.environ['DATABASE_URL'] = DATABASE_URL
+    os.environ['BULK_IMPORT_SECRET'] = SECRET
+    sys.path.insert(0, NATAL_CHART_DIR)
+    spec = importlib.util.spec_from_file_location('natal_chart_bulk', os.path.join(NATAL_CHART_DIR, 'index.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    sys.modules['runtime'].trace_sink = lambda record: None
+    return module
+
+
+@unittest.skipUnless(DATABASE_URL, 'TEST_DATABASE_URL is not set')
+class BulkCreateProfilesTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        import psycopg2
+        from psycopg2.extras import RealDictCursor
+
+        cls.natal_chart = load_natal_chart_module()
+        cls.conn = psycopg2.connect(DATABASE_URL, cursor_factory=RealDictCursor)
+        cls.conn.autocommit = True
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.conn.close()
+
+    def setUp(self):
+        self.suffix = uuid.uuid4().hex[:12]
+
+    def tearDown(self):
+        with self.conn.cursor() as cursor:
+            cursor.execute("SELECT array_agg(id) AS ids FROM users WHERE email ILIKE %s", (f'%{self.suffix}@test',))
+            ids = cursor.fetchone()['ids'] or []
+            cursor.execute("DELETE FROM user_matches WHERE user_id = ANY(%s) OR candidate_id = ANY(%s)", (ids, ids))
+            cursor.execute("DELETE FROM natal_charts WHERE user_id = ANY(%s)", (ids,))
+            cursor.execute("DELETE FROM users WHERE id = ANY(%s)", (ids,))
+
+    def call(self, body):
+        response = self.natal_chart.handler({
+            'httpMethod': 'POST', 'headers': {'X-Admin-Secret': SECRET},
+            'body': json.dumps(dict(body, action='bulk_create_profiles'))
+        }, None)
+        return response['statusCode'], json.loads(response['body'])
+
+    def profile(self, email):
+        return {'name': 'Bulk', 'email': email, 'birth_date': '1990-05-05', 'birth_city': 'Москва'}
+
+    def test_invalid_requests(self):
+        for body in ({'data': ['{}'], 'format': 'ndjson'}, {'data': {'a': 1}}, {'data': '', 'format': 'xml'},
+                     {'data': '', 'format': ['csv']}):
+            self.assertEqual(self.call(body)[0], 400, body)
+
+    def test_emails_are_matched_exactly(self):
+        existing = f'Existing-{self.suffix}@test'
+        with self.conn.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO users (name, email, birth_date, birth_time, birth_city, zodiac_sign) "
+                "VALUES ('Existing', %s, '1990-01-01', '12:00', 'Unknown', 'Козерог')", (existing,)
+            )
+        emails = [f'new-{self.suffix}@test', f'NEW-{self.suffix}@test', f'new-{self.suffix}@test',
+                  existing, existing.lower()]
+        status, body = self.call({'profiles': [self.profile(email) for email in emails]})
+
+        self.assertEqual(status, 200)
+        self.assertEqual(body['created'], 3)
+        self.assertEqual([(error['line'], error['error']) for error in body['errors']],
+                         [(3, 'duplicate email in input'), (4, 'email already registered')])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,178 @@
+'''
+Long-poll (wait_for_messages) against a real Postgres: the LISTEN/NOTIFY
+wake-up from the messages insert trigger, the no-cursor start and the timeout,
+plus parameter checks of the chat actions.
+Skipped unless TEST_DATABASE_URL points at a disposable database with
+db_migrations applied, e.g. a local container:
+    docker run --rm -d -p 5432:5432 -e POSTGRES_HOST_AUTH_METHOD=trust postgres:16
+    for f in db_migrations/*.sql; do psql -h localhost -U postgres -f "$f"; done
+Run: TEST_DATABASE_URL=postgresql://postgres@localhost/postgres python -m unittest discover tests
+'''
+
+import importlib.util
+import json
+import os
+import sys
+import threading
+import time
+import unittest
+import uuid
+
+CHAT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend', 'chat')
+DATABASE_URL = os.environ.get('TEST_DATABASE_URL')
+
+
+def load_chat_module():
+    os.environ['DATABASE_URL'] = DATABASE_URL
+    sys.path.insert(0, CHAT_DIR)
+    spec = importlib.util.spec_from_file_location('chat_index', os.path.join(CHAT_DIR, 'index.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    # Keep the test output to results, not one trace line per request
+    sys.modules['runtime'].trace_sink = lambda record: None
+    return module
+
+
+@unittest.skipUnless(DATABASE_URL, 'TEST_DATABASE_URL is not set')
+class WaitForMessagesTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        import psycopg2
+        from psycopg2.extras import RealDictCursor
+
+        cls.chat = load_chat_module()
+        cls.handler = staticmethod(cls.chat.handler)
+        cls.conn = psycopg2.connect(DATABASE_URL, cursor_factory=RealDictCursor)
+        cls.conn.autocommit = True
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.conn.close()
+
+    def setUp(self):
+        suffix = uuid.uuid4().hex[:12]
+        with self.conn.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO users (name, email, birth_date, birth_time, birth_city) VALUES "
+                "('Poll A', %s, '1990-01-01', '12:00', 'Unknown'), "
+                "('Poll B', %s, '1991-01-01', '12:00', 'Unknown') RETURNING id",
+                (f'poll-a-{suffix}@test', f'poll-b-{suffix}@test')
+            )
+            self.user1_id, self.user2_id = sorted(row['id'] for row in cursor.fetchall())
+            cursor.execute("INSERT INTO chats (user1_id, user2_id) VALUES (%s, %s) RETURNING id",
+                           (self.user1_id, self.user2_id))
+            self.chat_id = cursor.fetchone()['id']
+
+    def tearDown(self):
+        with self.conn.cursor() as cursor:
+            cursor.execute("UPDATE chats SET last_message_id = NULL WHERE id = %s", (self.chat_id,))
+            cursor.execute("DELETE FROM messages WHERE chat_id = %s", (self.chat_id,))
+            cursor.execute("DELETE FROM chats WHERE id = %s", (self.chat_id,))
+            cursor.execute("DELETE FROM users WHERE id IN (%s, %s)", (self.user1_id, self.user2_id))
+
+    def call(self, body):
+        response = self.handler({'httpMethod': 'POST', 'body': json.dumps(body)}, None)
+        return response['statusCode'], json.loads(response['body'])
+
+    def send(self, text):
+        status, body = self.call({'action': 'send_message', 'chat_id': self.chat_id,
+                                  'sender_id': self.user2_id, 'message_text': text})
+        self.assertEqual(status, 200)
+        return body['message_id']
+
+    def send_later(self, text, delay):
+        sender = threading.Timer(delay, self.send, (text,))
+        sender.start()
+        self.addCleanup(sender.join)
+
+    def wait(self, timeout, after_id=None):
+        body = {'action': 'wait_for_messages', 'chat_id': self.chat_id, 'timeout': timeout}
+        if after_id is not None:
+            body['after_id'] = after_id
+        started = time.monotonic()
+        status, result = self.call(body)
+        self.assertEqual(status, 200)
+        return result, time.monotonic() - started
+
+    def test_wakes_up_on_insert_after_cursor(self):
+        first_id = self.send('first')
+        self.send_later('second', 0.3)
+
+        result, elapsed = self.wait(10, first_id)
+
+        self.assertEqual([m['message_text'] for m in result['messages']], ['second'])
+        self.assertEqual(result['after_id'], result['messages'][-1]['id'])
+        self.assertGreaterEqual(elapsed, 0.25)
+        self.assertLess(elapsed, 5)
+
+    def test_without_cursor_waits_for_new_messages_only(self):
+        self.send('already there')
+        self.send_later('new', 0.3)
+
+        result, elapsed = self.wait(10)
+
+        self.assertEqual([m['message_text'] for m in result['messages']], ['new'])
+        self.assertGreaterEqual(elapsed, 0.25)
+
+    def test_without_cursor_in_empty_chat(self):
+        self.send_later('hello', 0.3)
+
+        result, _ = self.wait(10)
+
+        self.assertEqual([m['message_text'] for m in result['messages']], ['hello'])
+
+    def test_times_out_with_cursor_to_resume_from(self):
+        last_id = self.send('only')
+
+        result, elapsed = self.wait(0.5)
+
+        self.assertEqual(result['messages'], [])
+        self.assertEqual(result['after_id'], last_id)
+        self.assertGreaterEqual(elapsed, 0.45)
+
+    def test_message_sent_during_read_is_not_missed(self):
+        first_id = self.send('first')
+        fetch_messages = self.chat.fetch_messages
+        calls = []
+
+        def fetch_then_send(*args, **kwargs):
+            result = fetch_messages(*args, **kwargs)
+            if not calls:
+                # Lands after the read but before the wait: its notification arrives with the commit
+                self.send('during read')
+            calls.append(1)
+            return result
+
+        self.chat.fetch_messages = fetch_then_send
+        self.addCleanup(setattr, self.chat, 'fetch_messages', fetch_messages)
+
+        result, elapsed = self.wait(5, first_id)
+
+        self.assertEqual([m['message_text'] for m in result['messages']], ['during read'])
+        self.assertLess(elapsed, 2)
+
+    def test_invalid_parameters(self):
+        for body in ({}, {'chat_id': 'x'}, {'chat_id': self.chat_id, 'timeout': 'soon'},
+                     {'chat_id': self.chat_id, 'timeout': 'nan'}, {'chat_id': self.chat_id, 'after_id': [1]}):
+            status, _ = self.call({'action': 'wait_for_messages', **body})
+            self.assertEqual(status, 400, body)
+
+    def test_negative_timeout_returns_at_once(self):
+        result, elapsed = self.wait(-5)
+
+        self.assertEqual(result['messages'], [])
+        self.assertLess(elapsed, 1)
+
+    def test_get_messages_invalid_parameters(self):
+        for body in ({}, {'chat_id': self.chat_id, 'limit': 'all'}, {'chat_id': self.chat_id, 'limit': -1},
+                     {'chat_id': self.chat_id, 'limit': 0}, {'chat_id': self.chat_id, 'before_id': 'x'}):
+            status, _ = self.call({'action': 'get_messages', **body})
+            self.assertEqual(status, 400, body)
+
+    def test_unknown_chat(self):
+        status, _ = self.call({'action': 'wait_for_messages', 'chat_id': 2 ** 31 - 1, 'timeout': 0.1})
+        self.assertEqual(status, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+'''
+calculate_compatibility and calculate_compatibility_batch against a real
+Postgres: pairs cached by the original function (compatibility_details NULL)
+are recomputed instead of failing.
+Skipped unless TEST_DATABASE_URL points at a disposable database with
+db_migrations applied (see test_chat_long_poll.py).
+'''
+
+import importlib.util
+import json
+import os
+import sys
+import unittest
+import uuid
+
+NATAL_CHART_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend', 'natal-chart')
+DATABASE_URL = os.environ.get('TEST_DATABASE_URL')
+
+
+def load_natal_chart_handler():
+    os.environ['DATABASE_URL'] = DATABASE_URL
+    sys.path.insert(0, NATAL_CHART_DIR)
+    spec = importlib.util.spec_from_file_location('natal_chart_index', os.path.join(NATAL_CHART_DIR, 'index.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    sys.modules['runtime'].trace_sink = lambda record: None
+    return module.handler
+
+
+@unittest.skipUnless(DATABASE_URL, 'TEST_DATABASE_URL is not set')
+class LegacyCacheRowTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        import psycopg2
+        from psycopg2.extras import RealDictCursor
+
+        cls.handler = staticmethod(load_natal_chart_handler())
+        cls.conn = psycopg2.connect(DATABASE_URL, cursor_factory=RealDictCursor)
+        cls.conn.autocommit = True
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.conn.close()
+
+    def setUp(self):
+        suffix = uuid.uuid4().hex[:12]
+        with self.conn.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO users (name, email, birth_date, birth_time, birth_city, zodiac_sign) VALUES "
+                "('Cache A', %s, '1990-04-01', '12:00', 'Unknown', 'Овен'), "
+                "('Cache B', %s, '1991-08-01', '12:00', 'Unknown', 'Лев') RETURNING id",
+                (f'cache-a-{suffix}@test', f'cache-b-{suffix}@test')
+            )
+            self.user1_id, self.user2_id = sorted(row['id'] for row in cursor.fetchall())
+            # As written by the original calculate_compatibility: a score and no details
+            cursor.execute(
+                "INSERT INTO compatibility_cache (user1_id, user2_id, compatibility_score) VALUES (%s, %s, 55)",
+                (self.user1_id, self.user2_id)
+            )
+
+    def tearDown(self):
+        with self.conn.cursor() as cursor:
+            cursor.execute("DELETE FROM compatibility_cache WHERE user1_id = %s", (self.user1_id,))
+            cursor.execute("DELETE FROM users WHERE id IN (%s, %s)", (self.user1_id, self.user2_id))
+
+    def call(self, body):
+        response = self.handler({'httpMethod': 'POST', 'body': json.dumps(body)}, None)
+        return response['statusCode'], json.loads(response['body'])
+
+    def stored_details(self):
+        with self.conn.cursor() as cursor:
+            cursor.execute(
+                "SELECT compatibility_details FROM compatibility_cache WHERE user1_id = %s AND user2_id = %s",
+                (self.user1_id, self.user2_id)
+            )
+            return cursor.fetchone()['compatibility_details']
+
+    def test_pair_is_recomputed(self):
+        status, body = self.call({'action': 'calculate_compatibility',
+                                  'user1_id': self.user2_id, 'user2_id': self.user1_id})
+
+        self.assertEqual(status, 200)
+        self.assertEqual((body['user1_sign'], body['user2_sign']), ('Лев', 'Овен'))
+        self.assertEqual(self.stored_details()['signs'], ['Овен', 'Лев'])
+
+    def test_batch_recomputes_pair(self):
+        status, body = self.call({'action': 'calculate_compatibility_batch',
+                                  'user_id': self.user2_id, 'partner_ids': [self.user1_id]})
+
+        self.assertEqual(status, 200)
+        self.assertEqual(body['not_found'], [])
+        self.assertEqual([(r['user_id'], r['partner_sign']) for r in body['results']], [(self.user1_id, 'Овен')])
+        self.assertEqual(self.stored_details()['signs'], ['Овен', 'Лев'])
+
+    def test_non_integer_ids_are_rejected(self):
+        for body in ({'action': 'calculate_compatibility', 'user1_id': 'x', 'user2_id': self.user2_id},
+                     {'action': 'calculate_compatibility', 'user1_id': [self.user1_id], 'user2_id': self.user2_id},
+                     {'action': 'calculate_compatibility_batch', 'user_id': self.user1_id, 'partner_ids': [{}]}):
+            self.assertEqual(self.call(body)[0], 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
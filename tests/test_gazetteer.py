@@ -0,0 +1,64 @@
+'''
+Offline gazetteer lookups against the bundled cities.bin: exact names in
+either script, typos, unambiguous prefixes, and keys too short or too vague
+to resolve (those fall back to local mean time).
+Run: python -m unittest discover tests
+'''
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend', 'natal-chart'))
+
+from gazetteer import edit_distance, get_gazetteer, query_key  # noqa: E402
+
+
+class LookupTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.gazetteer = get_gazetteer()
+
+    def assertResolves(self, name, city, country, timezone):
+        place = self.gazetteer.lookup(name)
+        self.assertIsNotNone(place, name)
+        self.assertEqual((place.name, place.country, place.timezone), (city, country, timezone), name)
+
+    def test_latin_alternate_of_large_city(self):
+        # Not Niu-York, Ukraine, which shares the key
+        self.assertResolves('New York', 'New York City', 'US', 'America/New_York')
+        self.assertResolves('Frankfurt', 'Frankfurt am Main', 'DE', 'Europe/Berlin')
+        self.assertResolves('Munich', 'Munich', 'DE', 'Europe/Berlin')
+
+    def test_cyrillic_and_transliterated_names(self):
+        self.assertResolves('Москва', 'Moscow', 'RU', 'Europe/Moscow')
+        self.assertResolves('г. Москва', 'Moscow', 'RU', 'Europe/Moscow')
+        self.assertResolves('Moskva, Russia', 'Moscow', 'RU', 'Europe/Moscow')
+        self.assertResolves('Нью-Йорк', 'New York City', 'US', 'America/New_York')
+
+    def test_typo_prefers_closest_name(self):
+        # A prefix of Samraong, Cambodia, but one letter short of Samara
+        self.assertResolves('Самра', 'Samara', 'RU', 'Europe/Samara')
+        self.assertResolves('Krasnodarr', 'Krasnodar', 'RU', 'Europe/Moscow')
+
+    def test_unambiguous_prefix(self):
+        self.assertResolves('Екатеринбу', 'Yekaterinburg', 'RU', 'Asia/Yekaterinburg')
+
+    def test_unresolved(self):
+        for name in ('А', 'zz', 'Ново', '', '!!!', 'Qwxzvbnmkj'):
+            self.assertIsNone(self.gazetteer.lookup(name), name)
+
+
+class HelpersTest(unittest.TestCase):
+    def test_query_key(self):
+        self.assertEqual(query_key('  город Санкт-Петербург, Россия'), 'санкт петербург')
+        self.assertEqual(query_key('São Paulo'), 'sao paulo')
+
+    def test_edit_distance(self):
+        self.assertEqual(edit_distance('самра', 'самара', 2), 1)
+        self.assertEqual(edit_distance('kitten', 'sitting', 5), 3)
+        self.assertEqual(edit_distance('abc', 'xyzxyz', 1), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+'''
+Location cells (shared geo.py): geohash encoding, the nine-cell
+neighbourhood used by nearby search and request coordinate parsing.
+'''
+
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend', 'shared'))
+
+from geo import GEO_PRECISION, geohash, neighbourhood, parse_location  # noqa: E402
+
+
+class GeohashTest(unittest.TestCase):
+    def test_known_cells(self):
+        self.assertEqual(geohash(57.64911, 10.40744, 11), 'u4pruydqqvj')
+        self.assertEqual(geohash(55.7558, 37.6173), 'ucf')
+        self.assertEqual(geohash(-90, -180), '000')
+        self.assertEqual(geohash(90, 180), 'zzz')
+
+    def test_cell_is_prefix_of_finer_cell(self):
+        self.assertTrue(geohash(40.7128, -74.006, 6).startswith(geohash(40.7128, -74.006)))
+
+
+class NeighbourhoodTest(unittest.TestCase):
+    def test_nearby_points_share_a_cell(self):
+        # Anyone within one cell width of a user falls in the user's neighbourhood
+        rng = random.Random(3)
+        width, height = 360.0 / (1 << 8), 180.0 / (1 << 7)
+        for _ in range(500):
+            latitude, longitude = rng.uniform(-80, 80), rng.uniform(-180, 180)
+            other = (latitude + rng.uniform(-height, height), longitude + rng.uniform(-width, width))
+            other_cell = geohash(other[0], (other[1] + 180.0) % 360.0 - 180.0)
+            self.assertIn(other_cell, neighbourhood(latitude, longitude))
+
+    def test_size(self):
+        self.assertEqual(len(neighbourhood(55.75, 37.62)), 9)
+        self.assertEqual(len(set(neighbourhood(55.75, 37.62))), 9)
+        self.assertEqual(len(neighbourhood(89.9, 0.0)), 6)
+        self.assertIn(geohash(0.0, 179.9), neighbourhood(0.0, -179.9))
+        self.assertTrue(all(len(cell) == GEO_PRECISION for cell in neighbourhood(0.0, 0.0)))
+
+
+class ParseLocationTest(unittest.TestCase):
+    def test_values(self):
+        self.assertIsNone(parse_location(None, ''))
+        self.assertEqual(parse_location('55.75', 37.62), (55.75, 37.62))
+        for latitude, longitude in ((91, 0), (0, -181), (10, None), ('north', 0)):
+            with self.assertRaises(ValueError):
+                parse_location(latitude, longitude)
+
+
+if __name__ == '__main__':
+    unittest.main()
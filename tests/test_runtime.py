@@ -0,0 +1,43 @@
+'''
+Router dispatch in the shared request runtime, without a database: POST
+bodies are routed on their action, malformed actions are rejected with 400.
+'''
+
+import json
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend', 'shared'))
+
+import runtime  # noqa: E402
+
+
+class RouterDispatchTest(unittest.TestCase):
+    def setUp(self):
+        self.sink = runtime.trace_sink
+        runtime.trace_sink = lambda record: None
+        self.router = runtime.Router('Content-Type', default_method='POST')
+        self.router.action('ping')(lambda request: {'pong': True})
+
+    def tearDown(self):
+        runtime.trace_sink = self.sink
+
+    def call(self, body):
+        response = self.router.handle({'httpMethod': 'POST', 'body': json.dumps(body)}, None)
+        return response['statusCode'], json.loads(response['body'])
+
+    def test_routes_on_action(self):
+        self.assertEqual(self.call({'action': 'ping'}), (200, {'pong': True}))
+
+    def test_unknown_or_missing_action(self):
+        self.assertEqual(self.call({'action': 'pong'})[0], 405)
+        self.assertEqual(self.call({})[0], 405)
+
+    def test_non_string_action_is_rejected(self):
+        for action in (['ping'], {'name': 'ping'}, 1):
+            self.assertEqual(self.call({'action': action}), (400, {'error': 'action must be a string'}))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+'''
+The per-user seen filter and the view buffer (search interactions.py),
+without a database.
+'''
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend', 'search'))
+
+from interactions import INITIAL_CAPACITY, SeenFilter, ViewBuffer  # noqa: E402
+
+
+class SeenFilterTest(unittest.TestCase):
+    def test_no_false_negatives(self):
+        seen = SeenFilter()
+        added = range(1, INITIAL_CAPACITY + 1)
+        self.assertTrue(all(seen.add(user_id) for user_id in added[:10]))
+        for user_id in added[10:]:
+            seen.add(user_id)
+        self.assertTrue(all(user_id in seen for user_id in added))
+        self.assertFalse(seen.add(1))
+
+    def test_false_positive_rate_at_capacity(self):
+        seen = SeenFilter.rebuilt(range(0, 2 * INITIAL_CAPACITY, 2), INITIAL_CAPACITY)
+        # An add that hits a false positive is not counted
+        self.assertGreater(seen.items, INITIAL_CAPACITY * 0.98)
+        false_positives = sum(user_id in seen for user_id in range(1, 200001, 2))
+        self.assertLess(false_positives / 100000, 0.02)
+
+    def test_survives_a_round_trip(self):
+        # As stored in user_seen_filters (bytea bits, item count) and loaded back
+        seen = SeenFilter.rebuilt([5, 50, 500], 4096)
+        loaded = SeenFilter(bytes(seen.bits), seen.items)
+        self.assertEqual((loaded.capacity, loaded.items), (4096, 3))
+        self.assertTrue(all(user_id in loaded for user_id in (5, 50, 500)))
+
+
+class ViewBufferTest(unittest.TestCase):
+    def test_due_by_size_and_drain(self):
+        buffer = ViewBuffer(flush_size=3, flush_seconds=3600)
+        buffer.add(1, [1, 2, 3])
+        buffer.add(1, [2])
+        self.assertFalse(buffer.due())
+        self.assertEqual(buffer.pending_for(1), {2, 3})
+        buffer.add(4, [1])
+        self.assertTrue(buffer.due())
+
+        pairs = buffer.drain()
+        self.assertEqual(sorted(pairs), [(1, 2), (1, 3), (4, 1)])
+        self.assertFalse(buffer.due())
+        buffer.restore(pairs)
+        self.assertEqual(buffer.pending_for(4), {1})
+
+    def test_due_by_age(self):
+        buffer = ViewBuffer(flush_size=100, flush_seconds=0)
+        self.assertFalse(buffer.due())
+        buffer.add(1, [2])
+        self.assertTrue(buffer.due())
+
+
+if __name__ == '__main__':
+    unittest.main()
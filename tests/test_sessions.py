@@ -0,0 +1,86 @@
+'''
+Session tokens (auth sessions.py), without a database: signed stateless
+tokens, their revocation and the in-process session cache.
+'''
+
+import os
+import sys
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend', 'auth'))
+
+import sessions  # noqa: E402
+
+
+class SignedTokenTest(unittest.TestCase):
+    def setUp(self):
+        for name, value in (('SIGNING_KEY', b'test-signing-key'),
+                            ('revoked_tokens', sessions.SessionCache(100, sessions.SESSION_LIFETIME.total_seconds()))):
+            patcher = mock.patch.object(sessions, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.expires_at = (datetime.now() + timedelta(days=1)).replace(microsecond=0)
+
+    def token(self, expires_at=None):
+        return sessions.create_session_token(7, 'Анна', 'anna@test', expires_at or self.expires_at)
+
+    def test_round_trip(self):
+        token = self.token()
+        self.assertTrue(sessions.is_signed_token(token))
+        self.assertEqual(sessions.verify_signed_token(token),
+                         {'id': 7, 'name': 'Анна', 'email': 'anna@test', 'expires_at': self.expires_at})
+        self.assertEqual(sessions.session_key(token), token.rsplit('.', 1)[1])
+
+    def test_tampered_or_foreign_tokens_are_rejected(self):
+        prefix, payload, signature = self.token().split('.')
+        other = sessions.create_session_token(8, 'Иван', 'ivan@test', self.expires_at).split('.')[1]
+        for token in (f'{prefix}.{other}.{signature}', f'{prefix}.{payload}.{signature[:-2]}',
+                      f'{prefix}.{payload}', 'v1.@@@.@@@', 'opaque-token'):
+            self.assertIsNone(sessions.verify_signed_token(token), token)
+        with mock.patch.object(sessions, 'SIGNING_KEY', b'rotated-key'):
+            self.assertIsNone(sessions.verify_signed_token(f'{prefix}.{payload}.{signature}'))
+
+    def test_expired_token(self):
+        self.assertIsNone(sessions.verify_signed_token(self.token(datetime.now() - timedelta(seconds=1))))
+
+    def test_revoked_token(self):
+        token = self.token()
+        sessions.revoke(token)
+        self.assertIsNone(sessions.verify_signed_token(token))
+
+    def test_opaque_tokens_without_key(self):
+        with mock.patch.object(sessions, 'SIGNING_KEY', b''):
+            token = self.token()
+            self.assertFalse(sessions.is_signed_token(token))
+            self.assertEqual(sessions.session_key(token), token)
+            self.assertIsNone(sessions.verify_signed_token(token))
+
+
+class SessionCacheTest(unittest.TestCase):
+    def session(self, **delta):
+        return {'id': 1, 'expires_at': datetime.now() + timedelta(**delta)}
+
+    def test_lru_eviction_and_invalidate(self):
+        cache = sessions.SessionCache(max_size=2, ttl=60)
+        for token in ('a', 'b'):
+            cache.put(token, self.session(hours=1))
+        cache.get('a')
+        cache.put('c', self.session(hours=1))
+        self.assertIsNone(cache.get('b'))
+        self.assertIsNotNone(cache.get('a'))
+        cache.invalidate('a')
+        self.assertIsNone(cache.get('a'))
+
+    def test_expired_sessions_are_not_served(self):
+        cache = sessions.SessionCache(max_size=10, ttl=60)
+        cache.put('past', self.session(seconds=-1))
+        self.assertIsNone(cache.get('past'))
+        cache = sessions.SessionCache(max_size=10, ttl=0)
+        cache.put('stale', self.session(hours=1))
+        self.assertIsNone(cache.get('stale'))
+
+
+if __name__ == '__main__':
+    unittest.main()
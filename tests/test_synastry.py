@@ -0,0 +1,68 @@
+'''
+Synastry scoring (natal-chart synastry.py): the aspect kernel and the
+batched lookup-table scorer, which must return exactly the pairwise score.
+'''
+
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend', 'natal-chart'))
+
+from compatibility import SIGNS, score_pair  # noqa: E402
+from synastry import (  # noqa: E402
+    BATCH_TABLE_THRESHOLD, BODIES, KERNEL, STEPS, STEPS_PER_DEGREE, find_aspects, raw_synastry,
+    raw_synastry_batch, synastry, synastry_batch
+)
+
+
+def random_chart(rng, missing=()):
+    return {body: None if body in missing else rng.uniform(0, 360) for body in BODIES}
+
+
+class KernelTest(unittest.TestCase):
+    def at(self, degrees):
+        return KERNEL[int(degrees * STEPS_PER_DEGREE) % STEPS]
+
+    def test_exact_aspects(self):
+        self.assertEqual([self.at(d) for d in (0, 60, 90, 120, 180)], [300, 200, -200, 300, -100])
+
+    def test_symmetric_and_fades_with_orb(self):
+        for step in range(STEPS):
+            self.assertEqual(KERNEL[step], KERNEL[-step % STEPS])
+        self.assertEqual(self.at(4), 150)
+        self.assertEqual(self.at(8), 0)
+        self.assertEqual(self.at(30), 0)
+
+
+class SynastryTest(unittest.TestCase):
+    def test_identical_charts_are_all_conjunctions(self):
+        chart = {'sun': 10.0, 'moon': 200.0}
+        aspects = find_aspects(chart, chart)
+        self.assertEqual([(a['body1'], a['body2'], a['aspect']) for a in aspects],
+                         [('sun', 'sun', 'conjunction'), ('moon', 'moon', 'conjunction')])
+        self.assertEqual(raw_synastry(chart, chart), 2 * 300 + 2 * 300)
+
+    def test_without_charts_only_signs_count(self):
+        result = synastry(SIGNS[0], SIGNS[4], None, {'sun': 1.0})
+        self.assertEqual(result['score'], score_pair(SIGNS[0], SIGNS[4]))
+        self.assertIsNone(result['aspect_score'])
+
+    def test_batch_matches_pairwise(self):
+        rng = random.Random(7)
+        chart = random_chart(rng, missing=('ascendant',))
+        for count in (BATCH_TABLE_THRESHOLD - 1, BATCH_TABLE_THRESHOLD * 2):
+            candidates = [None if i % 10 == 0 else random_chart(rng, missing=('moon',) if i % 3 else ())
+                          for i in range(count)]
+            expected = [raw_synastry(chart, candidate) if candidate else None for candidate in candidates]
+            self.assertEqual(raw_synastry_batch(chart, candidates), expected)
+
+            signs = [rng.choice(SIGNS) for _ in candidates]
+            self.assertEqual(synastry_batch(SIGNS[2], chart, signs, candidates),
+                             [synastry(SIGNS[2], sign, chart, candidate)['score']
+                              for sign, candidate in zip(signs, candidates)])
+
+
+if __name__ == '__main__':
+    unittest.main()
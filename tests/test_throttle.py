@@ -0,0 +1,63 @@
+'''
+Login attempt budgets (auth throttle.py): token buckets per key, refilled
+over time, with a bounded number of tracked keys.
+'''
+
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend', 'auth'))
+
+from throttle import AttemptBudget, client_ip  # noqa: E402
+
+
+class AttemptBudgetTest(unittest.TestCase):
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch('throttle.time')
+        patcher.start().monotonic.side_effect = lambda: self.now
+        self.addCleanup(patcher.stop)
+
+    def test_bucket_empties_and_refills(self):
+        budget = AttemptBudget(3, 60)
+        self.assertEqual([budget.consume('a') for _ in range(4)], [True, True, True, False])
+        self.assertFalse(budget.allows('a'))
+        self.assertTrue(budget.allows('b'))
+        self.assertEqual(budget.retry_after('a'), 21)
+
+        self.now += 20
+        self.assertTrue(budget.consume('a'))
+        self.assertFalse(budget.consume('a'))
+        self.now += 3600
+        self.assertEqual([budget.consume('a') for _ in range(4)], [True, True, True, False])
+
+    def test_allows_does_not_consume(self):
+        budget = AttemptBudget(1, 60)
+        self.assertTrue(all(budget.allows('a') for _ in range(5)))
+        self.assertTrue(budget.consume('a'))
+
+    def test_least_recently_used_keys_are_dropped(self):
+        budget = AttemptBudget(1, 60, max_keys=2)
+        budget.consume('a')
+        budget.consume('b')
+        budget.consume('c')
+        # 'a' was forgotten and starts over with a full bucket, 'c' is still tracked
+        self.assertTrue(budget.allows('a'))
+        self.assertFalse(budget.allows('c'))
+
+
+class ClientIpTest(unittest.TestCase):
+    def test_gateway_address_wins(self):
+        event = {'requestContext': {'identity': {'sourceIp': '10.0.0.1'}},
+                 'headers': {'X-Forwarded-For': '1.2.3.4'}}
+        self.assertEqual(client_ip(event), '10.0.0.1')
+
+    def test_forwarded_for(self):
+        self.assertEqual(client_ip({'headers': {'x-forwarded-for': '1.2.3.4, 10.0.0.2'}}), '1.2.3.4')
+        self.assertIsNone(client_ip({}))
+
+
+if __name__ == '__main__':
+    unittest.main()
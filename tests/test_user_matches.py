@@ -0,0 +1,72 @@
+'''
+Incremental match list refresh (natal-chart matches.py) against a real
+Postgres: refreshing a user rebuilds their own list, rescores them in the
+lists of their candidate pool and leaves every other list alone.
+Skipped unless TEST_DATABASE_URL points at a disposable database with
+db_migrations applied (see test_chat_long_poll.py).
+'''
+
+import os
+import sys
+import unittest
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend', 'natal-chart'))
+
+from compatibility import MATRIX, SIGNS  # noqa: E402
+from matches import refresh_user_matches  # noqa: E402
+
+DATABASE_URL = os.environ.get('TEST_DATABASE_URL')
+
+
+@unittest.skipUnless(DATABASE_URL, 'TEST_DATABASE_URL is not set')
+class RefreshUserMatchesTest(unittest.TestCase):
+    def setUp(self):
+        import psycopg2
+        from psycopg2.extras import RealDictCursor
+
+        self.conn = psycopg2.connect(DATABASE_URL, cursor_factory=RealDictCursor)
+        self.cursor = self.conn.cursor()
+        self.sign = SIGNS[0]
+        # The newest user of the sign that scores best with self.sign is always in the pool
+        best_sign = SIGNS[max(range(len(SIGNS)), key=MATRIX[0].__getitem__)]
+        suffix = uuid.uuid4().hex[:12]
+        self.cursor.execute(
+            "INSERT INTO users (name, email, birth_date, birth_time, birth_city, zodiac_sign) VALUES "
+            "('Refreshed', %s, '1990-04-01', '12:00', 'Unknown', %s), "
+            "('Pool member', %s, '1990-12-01', '12:00', 'Unknown', %s), "
+            "('Outside pool', %s, '1990-01-01', '12:00', 'Unknown', NULL) RETURNING id",
+            (f'refresh-a-{suffix}@test', self.sign, f'refresh-b-{suffix}@test', best_sign,
+             f'refresh-c-{suffix}@test')
+        )
+        self.user_id, self.pool_member_id, self.outsider_id = [row['id'] for row in self.cursor.fetchall()]
+        # Both already list the refreshed user, with a score from before their birth data changed
+        self.cursor.execute(
+            "INSERT INTO user_matches (user_id, candidate_id, score) VALUES (%s, %s, 1), (%s, %s, 1)",
+            (self.pool_member_id, self.user_id, self.outsider_id, self.user_id)
+        )
+
+    def tearDown(self):
+        self.conn.rollback()
+        self.conn.close()
+
+    def list_score(self, owner_id):
+        self.cursor.execute("SELECT score FROM user_matches WHERE user_id = %s AND candidate_id = %s",
+                            (owner_id, self.user_id))
+        row = self.cursor.fetchone()
+        return row and row['score']
+
+    def test_refresh_keeps_lists_outside_the_pool(self):
+        length = refresh_user_matches(self.cursor, self.user_id, self.sign, None)
+
+        self.assertGreater(length, 0)
+        self.assertEqual(self.list_score(self.outsider_id), 1)
+
+    def test_refresh_rescores_pool_members_lists(self):
+        refresh_user_matches(self.cursor, self.user_id, self.sign, None)
+
+        self.assertEqual(self.list_score(self.pool_member_id), max(MATRIX[0]))
+
+
+if __name__ == '__main__':
+    unittest.main()